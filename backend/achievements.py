@@ -0,0 +1,238 @@
+"""Event-driven achievement engine.
+
+Write routes report what changed (``Event``) through ``record``. Each
+badge is a ``Rule`` that keeps a small JSON state per user in
+``achievement_states`` and updates it per event from the rollups or a
+bounded indexed query, so awarding never rescans a user's history and
+``GET /achievements`` is a plain indexed read. To add a badge, subclass ``Rule`` and decorate it with
+``@register``.
+"""
+from collections import namedtuple
+from datetime import date, timedelta
+
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.attributes import flag_modified
+
+from extensions import db
+from models import Achievement, AchievementState, Transaction
+from budgets import evaluate_user_budgets
+from notifications import outbox
+import rollups
+
+# kind: 'expense' | 'income' | 'goal' | 'budget'
+# day/delta: entry date and signed amount change (minor units); created: a new entry was logged
+Event = namedtuple('Event', ['kind', 'day', 'delta', 'created', 'completed'], defaults=(None, 0, False, False))
+
+RULES = []
+
+
+def register(rule_class):
+    RULES.append(rule_class())
+    return rule_class
+
+
+def expense_event(day, delta, created=False):
+    return Event('expense', day, delta, created)
+
+
+def income_event(day, delta, created=False):
+    return Event('income', day, delta, created)
+
+
+def goal_event(completed):
+    return Event('goal', completed=completed)
+
+
+def budget_event():
+    return Event('budget')
+
+
+def entry_events(kind, before, entry=None):
+    """Events for a create (before=None), update, or delete (entry=None) of an expense/income."""
+    make = expense_event if kind == rollups.EXPENSE else income_event
+    events = []
+    if before is not None:
+        (_, year, month, *_), amount = before
+        events.append(make(date(year, month, 1), -amount))
+    if entry is not None:
+        events.append(make(entry.date, entry.amount, created=before is None))
+    return events
+
+
+class Rule:
+    badge_type = title = description = None
+    events = ()
+
+    def apply(self, user_id, state, event):
+        """Update ``state`` in place for one event. Return True once the badge is earned."""
+        raise NotImplementedError
+
+    def process(self, user_id, state, events):
+        """Apply this rule's events in order; True as soon as one earns the badge."""
+        return any(self.apply(user_id, state, event) for event in events if event.kind in self.events)
+
+
+@register
+class BudgetMaster(Rule):
+    """Awarded when the current month has budgets and every one is kept."""
+    badge_type = 'budget_master'
+    title = 'Budget Master'
+    description = 'Stayed within all budgets for a full month!'
+    events = ('expense', 'income', 'budget', 'goal')
+
+    def process(self, user_id, state, events):
+        # Checked once per write, like the rescan it replaced
+        if not any(event.kind in self.events for event in events):
+            return False
+        today = date.today()
+        evaluations = evaluate_user_budgets(user_id, today.year, today.month)
+        return bool(evaluations) and all(e['spent'] <= e['budget'].amount for e in evaluations)
+
+
+@register
+class GoalAchiever(Rule):
+    badge_type = 'saving_goal_achieved'
+    title = 'Goal Achiever'
+    description = 'Completed your first saving goal!'
+    events = ('goal',)
+
+    def apply(self, user_id, state, event):
+        return event.completed
+
+
+@register
+class PerfectMonth(Rule):
+    """Income exceeds expenses in the current month; totals are kept as running state."""
+    badge_type = 'perfect_month'
+    title = 'Perfect Month'
+    description = 'Your income exceeded your expenses this month!'
+    events = ('expense', 'income')
+
+    def process(self, user_id, state, events):
+        today = date.today()
+        current = [e for e in events if e.kind in self.events and (e.day.year, e.day.month) == (today.year, today.month)]
+        if not current:
+            return False
+        period = f'{today.year}-{today.month:02d}'
+        if state.get('period') != period:
+            # Seed from the rollups, which already include these writes.
+            state.update(period=period,
+                         income=rollups.total(user_id, rollups.INCOME, today.year, today.month),
+                         expenses=rollups.total(user_id, rollups.EXPENSE, today.year, today.month))
+        else:
+            for event in current:
+                state['income' if event.kind == 'income' else 'expenses'] += event.delta
+        return state['income'] > 0 and state['income'] > state['expenses']
+
+
+@register
+class StreakMaster(Rule):
+    """Seven consecutive days with expenses, around any day an expense was written.
+
+    Recomputed from the distinct expense dates near those days (covered by
+    ix_transactions_user_date_totals), so entry order does not matter.
+    """
+    badge_type = 'streak_master'
+    title = 'Streak Master'
+    description = 'Logged transactions for 7 consecutive days!'
+    events = ('expense',)
+    length = 7
+
+    def process(self, user_id, state, events):
+        days = {event.day for event in events if event.kind in self.events and event.delta > 0}
+        if not days:
+            return False  # Removing spending cannot complete a streak
+        reach = timedelta(days=self.length - 1)
+        logged = {row[0] for row in db.session.query(Transaction.date).filter(
+            Transaction.user_id == int(user_id),
+            Transaction.date.between(min(days) - reach, max(days) + reach)
+        ).distinct()}
+        return any(self._run_length(day, logged) >= self.length for day in days if day in logged)
+
+    @staticmethod
+    def _run_length(day, logged):
+        start = end = day
+        while start - timedelta(days=1) in logged:
+            start -= timedelta(days=1)
+        while end + timedelta(days=1) in logged:
+            end += timedelta(days=1)
+        return (end - start).days + 1
+
+
+def _load_states(wanted):
+    """AchievementState rows by (user_id, badge_type) for ``wanted`` = {user_id: rules}."""
+    badge_types = {rule.badge_type for rules in wanted.values() for rule in rules}
+    states = {(s.user_id, s.rule): s for s in AchievementState.query.filter(
+        AchievementState.user_id.in_(list(wanted)),
+        AchievementState.rule.in_(badge_types)
+    )}
+    missing = [(user_id, rule.badge_type) for user_id, rules in wanted.items() for rule in rules
+               if (user_id, rule.badge_type) not in states]
+    if not missing:
+        return states
+
+    # First event for these rules: carry over badges that were awarded before the engine existed.
+    earned = {tuple(row) for row in db.session.query(Achievement.user_id, Achievement.badge_type).filter(
+        Achievement.user_id.in_({user_id for user_id, _ in missing}))}
+    def new_state(key):
+        return AchievementState(user_id=key[0], rule=key[1], state={'earned': key in earned})
+
+    rows = {key: new_state(key) for key in missing}
+    try:
+        with db.session.begin_nested():
+            db.session.add_all(rows.values())
+    except IntegrityError:
+        # Some were created concurrently; add the rest one by one.
+        for key in missing:
+            row = new_state(key)
+            try:
+                with db.session.begin_nested():
+                    db.session.add(row)
+            except IntegrityError:
+                row = AchievementState.query.get(key)
+            rows[key] = row
+    states.update(rows)
+    return states
+
+
+def _award(user_id, rule):
+    db.session.add(Achievement(
+        user_id=user_id,
+        title=rule.title,
+        description=rule.description,
+        badge_type=rule.badge_type
+    ))
+    outbox.add(user_id, f"🏆 Achievement unlocked: {rule.title}!", 'achievement', dedup_key=rule.badge_type)
+
+
+def record(user_id, events):
+    """Feed write events for one user through the rules. Does not commit."""
+    record_many({user_id: events})
+
+
+def record_many(events_by_user):
+    """``record`` for several users, loading their rule states with one query. Does not commit."""
+    wanted = {}
+    for user_id, events in events_by_user.items():
+        kinds = {event.kind for event in events}
+        rules = [rule for rule in RULES if kinds.intersection(rule.events)]
+        if rules:
+            wanted[int(user_id)] = (rules, events)
+    if not wanted:
+        return
+
+    states = _load_states({user_id: rules for user_id, (rules, _) in wanted.items()})
+    db.session.flush()
+    # Rules query budgets and rollups, never these states, so they are flushed once at the end
+    with db.session.no_autoflush:
+        for user_id, (rules, events) in wanted.items():
+            for rule in rules:
+                row = states[(user_id, rule.badge_type)]
+                state = dict(row.state or {})
+                if state.get('earned'):
+                    continue
+                if rule.process(user_id, state, events):
+                    state['earned'] = True
+                    _award(user_id, rule)
+                row.state = state
+                flag_modified(row, 'state')
@@ -0,0 +1,67 @@
+"""Current/previous month aggregates shared by the dashboard sections.
+
+One query over ``monthly_rollups`` loads both months; the summary,
+budget analysis, insights and payment-method sections all read from the
+same object instead of issuing their own SUM queries.
+"""
+from collections import defaultdict
+
+from extensions import db
+from models import Budget, MonthlyRollup
+from periods import previous_month
+from rollups import EXPENSE
+from budgets import evaluate
+
+
+class PeriodAggregates:
+    def __init__(self, user_id, year, month):
+        self.user_id = int(user_id)
+        self.year, self.month = year, month
+        self.previous_year, self.previous_month = previous_month(year, month)
+
+        rows = db.session.query(
+            MonthlyRollup.year, MonthlyRollup.month, MonthlyRollup.kind,
+            MonthlyRollup.category, MonthlyRollup.payment_method,
+            MonthlyRollup.total, MonthlyRollup.count
+        ).filter(
+            MonthlyRollup.user_id == user_id,
+            db.or_(
+                db.and_(MonthlyRollup.year == year, MonthlyRollup.month == month),
+                db.and_(MonthlyRollup.year == self.previous_year, MonthlyRollup.month == self.previous_month)
+            )
+        )
+        self._rows = {False: [], True: []}  # keyed by "is previous month"
+        for y, m, kind, category, payment_method, total, count in rows:
+            if count:
+                self._rows[(y, m) != (year, month)].append((kind, category, payment_method, total, count))
+        self._evaluations = None
+
+    def total(self, kind, previous=False):
+        """Total for the month, in minor units."""
+        return sum(r[3] for r in self._rows[previous] if r[0] == kind)
+
+    def by_category(self, kind, previous=False):
+        """{category (or income source): total in minor units} for the month."""
+        totals = defaultdict(int)
+        for row_kind, category, _, total, _ in self._rows[previous]:
+            if row_kind == kind:
+                totals[category] += total
+        return dict(totals)
+
+    def by_payment_method(self, kind=EXPENSE, previous=False):
+        """{payment method: (total in minor units, count)} for the month."""
+        totals = defaultdict(lambda: [0, 0])
+        for row_kind, _, payment_method, total, count in self._rows[previous]:
+            if row_kind == kind:
+                totals[payment_method][0] += total
+                totals[payment_method][1] += count
+        return {method: (total, count) for method, (total, count) in totals.items()}
+
+    def budget_evaluations(self):
+        """Evaluations of the month's budgets, computed once from the loaded expense rollups."""
+        if self._evaluations is None:
+            spent = self.by_category(EXPENSE)
+            self._evaluations = [evaluate(budget, spent) for budget in Budget.query.filter_by(
+                user_id=self.user_id, year=self.year, month=self.month
+            ).order_by(Budget.id)]
+        return self._evaluations
@@ -3,24 +3,62 @@ from flask_cors import CORS
 from config import Config
 from extensions import db, migrate, bcrypt, jwt
 from routes import api_bp
+from rollups import rollups_cli
+from periods import periods_cli
+from notifications import outbox
+from cache import response_cache
+from insights import insights_cli
+from jobs import queue, worker_command, stats as job_stats
+from replicas import replicas, replicas_cli
+from metrics import metrics
+from passwords import hasher
+from profiles import profiles
+from search import search_cli
+from recurring import recurring_cli
+from balances import balances_cli
+from uploads import media_bp
 # Import models so that they are registered with SQLAlchemy
-from models import User, Transaction, Income, PasswordResetToken, Budget, SavingGoal, Notification, Achievement
+from models import User, Transaction, Income, PasswordResetToken, Budget, SavingGoal, Notification, Achievement, MonthlyRollup, AchievementState, InsightSnapshot, Job, ForecastState, RecurringRule
 
 def create_app():
     app = Flask(__name__)
     app.config.from_object(Config)
 
-    # Initialize Extensions
+    # Metrics first, so its hooks wrap all the others
+    metrics.init_app(app)
+    metrics.add_collector(response_cache.metric_lines)
+    metrics.add_collector(job_stats.metric_lines)
+    metrics.add_collector(hasher.metric_lines)
+    metrics.add_collector(profiles.metric_lines)
+
+    # Initialize Extensions (replica binds must be registered before the engines are created)
+    replicas.init_app(app)
     db.init_app(app)
     migrate.init_app(app, db)
     bcrypt.init_app(app)
+    hasher.init_app(app)
+    profiles.init_app(app)
     jwt.init_app(app)
+    outbox.init_app(app)
+    response_cache.init_app(app)
+    queue.init_app(app)
     
     # Enable CORS
     CORS(app, resources={r"/*": {"origins": "*"}})
 
     # Register Blueprints
     app.register_blueprint(api_bp, url_prefix='/api')
+    app.register_blueprint(media_bp)
+
+    # CLI commands
+    app.cli.add_command(rollups_cli)
+    app.cli.add_command(periods_cli)
+    app.cli.add_command(insights_cli)
+    app.cli.add_command(worker_command)
+    app.cli.add_command(replicas_cli)
+    app.cli.add_command(search_cli)
+    app.cli.add_command(recurring_cli)
+    app.cli.add_command(balances_cli)
 
     return app
 
@@ -0,0 +1,110 @@
+"""Account balance and lifetime totals, kept on the ``users`` row.
+
+``users.total_income``, ``users.total_expenses`` and
+``users.account_balance`` (income minus expenses) are adjusted by
+``rollups.apply_deltas``, which every income and expense write goes
+through, inside the writer's DB transaction. Each user's change is one
+relative ``UPDATE users SET account_balance = account_balance + ...``,
+so concurrent writes serialize on the row lock without reading it first
+and no update is lost. Reading the balance is a primary-key lookup
+instead of a SUM over the user's whole history.
+
+``flask balances reconcile`` recomputes the totals from the transactions
+and incomes tables and repairs any drift (for example rows edited by
+hand in SQL). Amounts are integer minor units (see money.py).
+"""
+from collections import namedtuple
+
+import click
+from flask.cli import AppGroup
+
+from extensions import db
+from models import User, Transaction, Income
+from money import format_major
+
+Balance = namedtuple('Balance', ['balance', 'income', 'expenses'])
+
+_USERS = User.__table__
+_ADJUST = db.update(_USERS).where(_USERS.c.id == db.bindparam('b_id')).values(
+    account_balance=_USERS.c.account_balance + db.bindparam('b_income') - db.bindparam('b_expenses'),
+    total_income=_USERS.c.total_income + db.bindparam('b_income'),
+    total_expenses=_USERS.c.total_expenses + db.bindparam('b_expenses'),
+)
+
+
+def adjust(changes):
+    """Add {user_id: (income, expenses)} changes to the users' totals. Does not commit."""
+    # Sorted by id, so concurrent writers that touch several users lock the rows in the same order
+    params = [{'b_id': user_id, 'b_income': income, 'b_expenses': expenses}
+              for user_id, (income, expenses) in sorted(changes.items()) if income or expenses]
+    if params:
+        db.session.execute(_ADJUST, params)
+
+
+def get(user_id):
+    """The user's ``Balance``, or None if there is no such user."""
+    row = db.session.query(User.account_balance, User.total_income, User.total_expenses).filter(
+        User.id == int(user_id)).first()
+    return Balance(*row) if row is not None else None
+
+
+def _sums(model, user_id=None):
+    query = db.session.query(model.user_id, db.func.sum(model.amount)).group_by(model.user_id)
+    if user_id is not None:
+        query = query.filter(model.user_id == user_id)
+    return {uid: int(total or 0) for uid, total in query}  # MySQL returns SUM() of integers as DECIMAL
+
+
+def _repair(user_id):
+    """Recompute one user's totals while holding their row lock and store them. Commits."""
+    # A no-op write takes the row lock (the write lock on SQLite) before the sums are read, so
+    # writers that have not committed yet block and then apply their deltas on top of ours
+    db.session.execute(db.update(_USERS).where(_USERS.c.id == user_id).values(total_income=_USERS.c.total_income))
+    income = _sums(Income, user_id).get(user_id, 0)
+    expenses = _sums(Transaction, user_id).get(user_id, 0)
+    db.session.execute(db.update(_USERS).where(_USERS.c.id == user_id).values(
+        account_balance=income - expenses, total_income=income, total_expenses=expenses))
+    db.session.commit()
+
+
+def reconcile(user_id=None, repair=True):
+    """Compare stored totals with the transactions and incomes tables, repairing drifted users.
+
+    Returns [(user_id, expected Balance, stored Balance)] for every user that had drifted.
+    """
+    income, expenses = _sums(Income, user_id), _sums(Transaction, user_id)
+    users = db.session.query(User.id, User.account_balance, User.total_income, User.total_expenses)
+    if user_id is not None:
+        users = users.filter(User.id == user_id)
+
+    drifted = []
+    for uid, *stored in users:
+        stored = Balance(*stored)
+        expected = Balance(income.get(uid, 0) - expenses.get(uid, 0), income.get(uid, 0), expenses.get(uid, 0))
+        if stored != expected:
+            drifted.append((uid, expected, stored))
+    db.session.commit()
+
+    if repair:
+        for uid, _, _ in drifted:
+            _repair(uid)
+    return drifted
+
+
+balances_cli = AppGroup('balances', help='Maintain account balances and lifetime totals.')
+
+
+@balances_cli.command('reconcile')
+@click.option('--user-id', type=int, default=None, help='Only check this user.')
+@click.option('--dry-run', is_flag=True, help='Report drift without repairing it.')
+def reconcile_command(user_id, dry_run):
+    """Check balances against transactions and incomes and repair any drift."""
+    drifted = reconcile(user_id, repair=not dry_run)
+    for uid, expected, stored in drifted:
+        click.echo(f'user {uid}: expected balance {format_major(expected.balance)} '
+                   f'(income {format_major(expected.income)}, expenses {format_major(expected.expenses)}), '
+                   f'stored {format_major(stored.balance)} '
+                   f'(income {format_major(stored.income)}, expenses {format_major(stored.expenses)})')
+    if drifted and dry_run:
+        raise click.ClickException(f'{len(drifted)} balances out of sync; run `flask balances reconcile`.')
+    click.echo(f'Repaired {len(drifted)} balances.' if drifted else 'All balances match.')
@@ -0,0 +1,177 @@
+"""Batch create/update/delete of transactions and incomes.
+
+All operations in a batch are validated first, existing rows are loaded
+with one query, and the changes are applied with bulk statements and a
+single commit. Invalid items are reported per item and skipped, unless
+the batch is atomic, in which case nothing is applied.
+"""
+from collections import defaultdict
+from datetime import datetime
+
+from extensions import db
+from models import Transaction, Income
+import rollups
+from rollups import EXPENSE, INCOME
+import achievements
+from money import to_minor
+
+MAX_BATCH_SIZE = 500
+
+_SPECS = {
+    EXPENSE: {'model': Transaction, 'label': 'category', 'default_payment_method': None},
+    INCOME: {'model': Income, 'label': 'source', 'default_payment_method': 'Bank Transfer'},
+}
+
+
+def _values(kind, data, creating):
+    """Validate request fields and map them to column values. Raises ValueError."""
+    spec = _SPECS[kind]
+    label = spec['label']
+    values = {}
+
+    if label in data:
+        values[label] = data[label]
+    if 'amount' in data:
+        values['amount'] = to_minor(data['amount'])
+    if data.get('date'):
+        values['date'] = datetime.strptime(data['date'], '%Y-%m-%d').date()
+    payment_method = data.get('paymentMethod', data.get('payment_method'))
+    if payment_method is not None:
+        values['payment_method'] = payment_method
+    if 'notes' in data:
+        values['notes'] = data['notes']
+    other_source = data.get('otherSource', data.get('other_source'))
+    if other_source is not None:
+        values['other_source'] = other_source
+
+    if creating:
+        values.setdefault('payment_method', spec['default_payment_method'])
+        values.setdefault('notes', '')
+        values.setdefault('other_source', '')
+        missing = [field for field in (label, 'amount', 'date', 'payment_method') if not values.get(field)]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    elif label in values and not values[label]:
+        raise ValueError(f'{label} cannot be empty')
+    return values
+
+
+def _row_values(kind, row):
+    spec = _SPECS[kind]
+    return {
+        'user_id': row.user_id, spec['label']: getattr(row, spec['label']), 'amount': row.amount,
+        'date': row.date, 'payment_method': row.payment_method
+    }
+
+
+def _insert(model, rows):
+    """Insert column dicts with one multi-row INSERT and return their ids, in order.
+
+    RETURNING does not promise the rows' order, so ids are matched back by
+    the inserted values; rows with equal values are interchangeable.
+    Dialects without RETURNING for executemany (MySQL) insert row by row to
+    learn the ids.
+    """
+    table = model.__table__
+    if not db.session.get_bind().dialect.insert_executemany_returning:
+        return [db.session.execute(db.insert(table), row).inserted_primary_key[0] for row in rows]
+
+    columns = list(rows[0])
+    returned = db.session.execute(db.insert(table).returning(table.c.id, *(table.c[c] for c in columns)), rows)
+    ids = defaultdict(list)
+    for row_id, *values in returned:
+        ids[tuple(values)].append(row_id)
+    return [ids[tuple(row[c] for c in columns)].pop(0) for row in rows]
+
+
+def apply_batch(user_id, kind, operations, atomic=False):
+    """Apply a list of operations. Returns (results, applied)."""
+    model = _SPECS[kind]['model']
+    user_id = int(user_id)
+    results = [None] * len(operations)
+    planned = []  # (index, op, id, values)
+
+    # 1. Validate every item
+    seen_ids = set()
+    for index, item in enumerate(operations):
+        op = item.get('op') if isinstance(item, dict) else None
+        result = {'index': index, 'op': op}
+        if 'client_id' in (item if isinstance(item, dict) else {}):
+            result['client_id'] = item['client_id']
+        results[index] = result
+        try:
+            if op not in ('create', 'update', 'delete'):
+                raise ValueError('op must be create, update or delete')
+            row_id = None
+            if op != 'create':
+                row_id = int(item.get('id') or 0)
+                if not row_id:
+                    raise ValueError('id is required')
+                if row_id in seen_ids:
+                    raise ValueError('id appears more than once in the batch')
+                seen_ids.add(row_id)
+            values = _values(kind, item.get('data') or {}, op == 'create') if op != 'delete' else {}
+            planned.append((index, op, row_id, values))
+        except (TypeError, ValueError) as e:
+            result.update(status='error', error=str(e))
+
+    # 2. Load the rows being updated or deleted with one query
+    ids = [row_id for _, op, row_id, _ in planned if op != 'create']
+    existing = {}
+    if ids:
+        existing = {row.id: row for row in model.query.filter(model.user_id == user_id, model.id.in_(ids))}
+    for index, op, row_id, _ in planned:
+        if op != 'create' and row_id not in existing:
+            results[index].update(status='error', error='Not found')
+    planned = [p for p in planned if 'status' not in results[p[0]]]
+
+    if atomic and len(planned) < len(operations):
+        for index, *_ in planned:
+            results[index]['status'] = 'skipped'
+        return results, False
+
+    # 3. Apply everything in one transaction
+    make_event = achievements.expense_event if kind == EXPENSE else achievements.income_event
+    deltas = rollups.new_deltas()
+    events = []
+    creates, updates, deletes = [], [], []
+    for index, op, row_id, values in planned:
+        if op == 'create':
+            row = {'user_id': user_id, **values}
+            rollups.collect_row(deltas, kind, row)
+            events.append(make_event(row['date'], row['amount'], created=True))
+            creates.append((index, row))
+        elif op == 'update':
+            old = _row_values(kind, existing[row_id])
+            new = {**old, **values}
+            rollups.collect_row(deltas, kind, old, sign=-1)
+            rollups.collect_row(deltas, kind, new)
+            events += [make_event(old['date'], -old['amount']), make_event(new['date'], new['amount'])]
+            updates.append((index, {'id': row_id, **values}))
+        else:
+            old = _row_values(kind, existing[row_id])
+            rollups.collect_row(deltas, kind, old, sign=-1)
+            events.append(make_event(old['date'], -old['amount']))
+            deletes.append((index, row_id))
+
+    if creates:
+        ids = _insert(model, [row for _, row in creates])
+        for (index, _), row_id in zip(creates, ids):
+            results[index].update(status='created', id=row_id)
+    changed = [values for _, values in updates if len(values) > 1]
+    if changed:
+        db.session.execute(db.update(model), changed)
+    for index, values in updates:
+        results[index].update(status='updated', id=values['id'])
+    if deletes:
+        db.session.execute(
+            db.delete(model).where(model.user_id == user_id, model.id.in_([row_id for _, row_id in deletes])),
+            execution_options={'synchronize_session': False}
+        )
+        for index, row_id in deletes:
+            results[index].update(status='deleted', id=row_id)
+
+    rollups.apply_deltas(deltas)
+    achievements.record(user_id, events)
+    db.session.commit()
+    return results, True
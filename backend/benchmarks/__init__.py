@@ -0,0 +1 @@
+"""API benchmark suite; see benchmarks/run.py."""
@@ -0,0 +1,57 @@
+"""Compare two benchmark reports.
+
+    python -m benchmarks.compare before.json after.json [--fail-above 20]
+
+Prints p50/p99/throughput/SQL changes per (mode, size, endpoint) and exits
+non-zero if any p99 regressed by more than ``--fail-above`` percent.
+"""
+import argparse
+import json
+import sys
+
+
+def _index(path):
+    with open(path) as f:
+        report = json.load(f)
+    return report['meta'], {(r['mode'], r['size'], r['endpoint'], r['method']): r for r in report['results']}
+
+
+def _change(old, new):
+    return (new - old) / old * 100 if old else 0.0
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Compare two benchmark reports.')
+    parser.add_argument('before')
+    parser.add_argument('after')
+    parser.add_argument('--fail-above', type=float, default=None, help='Fail if any p99 grows by more than this %%.')
+    args = parser.parse_args(argv)
+
+    before_meta, before = _index(args.before)
+    after_meta, after = _index(args.after)
+    print(f'{before_meta.get("commit") or "?"} -> {after_meta.get("commit") or "?"}')
+    print(f'{"mode":6} {"size":6} {"endpoint":32} {"p50 ms":>18} {"p99 ms":>18} {"rps":>8} {"sql/req":>13}')
+
+    regressions = []
+    for key in sorted(before.keys() & after.keys()):
+        old, new = before[key], after[key]
+        p99_change = _change(old['p99_ms'], new['p99_ms'])
+        print(f'{key[0]:6} {key[1]:6} {key[2]:32} '
+              f'{old["p50_ms"]:>8.2f}->{new["p50_ms"]:<8.2f} '
+              f'{old["p99_ms"]:>8.2f}->{new["p99_ms"]:<8.2f} '
+              f'{_change(old["throughput_rps"], new["throughput_rps"]):>+7.1f}% '
+              f'{old["sql_per_request"]:>5.1f}->{new["sql_per_request"]:<5.1f}')
+        if args.fail_above is not None and p99_change > args.fail_above:
+            regressions.append((key, p99_change))
+
+    for key in sorted(before.keys() ^ after.keys()):
+        print(f'only in {"before" if key in before else "after"}: {" ".join(key)}')
+
+    if regressions:
+        for key, change in regressions:
+            print(f'REGRESSION {" ".join(key)}: p99 {change:+.1f}%', file=sys.stderr)
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
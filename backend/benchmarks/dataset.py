@@ -0,0 +1,113 @@
+"""Deterministic benchmark dataset.
+
+One user per size profile. Row contents come from a seeded RNG; dates are
+laid out over the months ending with the current one, so the "this month"
+endpoints always have data.
+"""
+import random
+from datetime import date
+
+from extensions import db
+from models import User, Transaction, Income, Budget, SavingGoal, Notification, RecurringRule
+from periods import month_bounds, previous_month
+import balances
+import rollups
+
+PASSWORD = 'benchmark-password'
+
+SIZES = {
+    'small': {'months': 3, 'expenses_per_month': 40, 'incomes_per_month': 2, 'budgets': 3, 'goals': 2, 'notifications': 20, 'recurring_rules': 3},
+    'medium': {'months': 12, 'expenses_per_month': 400, 'incomes_per_month': 4, 'budgets': 6, 'goals': 5, 'notifications': 50, 'recurring_rules': 6},
+    'huge': {'months': 36, 'expenses_per_month': 3000, 'incomes_per_month': 8, 'budgets': 8, 'goals': 10, 'notifications': 200, 'recurring_rules': 12},
+}
+
+CATEGORIES = ['Food', 'Transport', 'Shopping', 'Bills', 'Entertainment', 'Health', 'Education', 'Other']
+SOURCES = ['Salary', 'Freelance', 'Investments', 'Other']
+PAYMENT_METHODS = ['UPI', 'Cash', 'Credit Card', 'Debit Card', 'Net Banking']
+
+CHUNK_SIZE = 5000
+
+
+def email_for(size):
+    return f'{size}@bench.local'
+
+
+def _months(count):
+    year, month = date.today().year, date.today().month
+    months = []
+    for _ in range(count):
+        months.append((year, month))
+        year, month = previous_month(year, month)
+    return months[::-1]
+
+
+def _random_day(rng, year, month):
+    start, end = month_bounds(year, month)
+    last = min(end.toordinal() - 1, date.today().toordinal())
+    return date.fromordinal(rng.randint(start.toordinal(), max(start.toordinal(), last)))
+
+
+def _insert(model, rows):
+    for start in range(0, len(rows), CHUNK_SIZE):
+        db.session.execute(db.insert(model), rows[start:start + CHUNK_SIZE])
+
+
+def seed_user(size, seed=0):
+    """Create the user for a size profile with its entries, budgets, goals, recurring rules and notifications."""
+    profile = SIZES[size]
+    rng = random.Random(f'{seed}:{size}')
+
+    user = User(username=f'bench-{size}', full_name=f'Benchmark {size.title()}', email=email_for(size))
+    user.set_password(PASSWORD)
+    db.session.add(user)
+    db.session.flush()
+
+    expenses, incomes = [], []
+    for year, month in _months(profile['months']):
+        for _ in range(profile['expenses_per_month']):
+            expenses.append({
+                'user_id': user.id, 'date': _random_day(rng, year, month),
+                'amount': rng.randint(20_00, 2500_00), 'category': rng.choice(CATEGORIES),
+                'payment_method': rng.choice(PAYMENT_METHODS), 'notes': f'bench {rng.randint(0, 10 ** 6)}',
+                'other_source': ''
+            })
+        for _ in range(profile['incomes_per_month']):
+            incomes.append({
+                'user_id': user.id, 'date': _random_day(rng, year, month),
+                'amount': rng.randint(5000_00, 80000_00), 'source': rng.choice(SOURCES),
+                'payment_method': rng.choice(PAYMENT_METHODS), 'notes': '', 'other_source': ''
+            })
+    _insert(Transaction, expenses)
+    _insert(Income, incomes)
+
+    today = date.today()
+    for category in CATEGORIES[:profile['budgets']]:
+        db.session.add(Budget(user_id=user.id, category=category, amount=rng.randint(1000_00, 50000_00),
+                              month=today.month, year=today.year))
+    for i in range(profile['goals']):
+        db.session.add(SavingGoal(user_id=user.id, title=f'Goal {i}', target_amount=100000_00,
+                                  current_amount=rng.randint(0, 90000_00),
+                                  target_date=date(today.year + 1, 1, 1)))
+    # Rules start next month, so seeding does not depend on the materialize job
+    next_start = month_bounds(today.year, today.month)[1]
+    for i in range(profile['recurring_rules']):
+        db.session.add(RecurringRule(user_id=user.id, kind='expense', label=rng.choice(CATEGORIES),
+                                     amount=rng.randint(100_00, 20000_00), payment_method=rng.choice(PAYMENT_METHODS),
+                                     notes=f'Recurring {i}', frequency='monthly', interval=1,
+                                     start_date=next_start, next_date=next_start))
+    _insert(Notification, [{
+        'user_id': user.id, 'message': f'Benchmark notification {i}', 'type': 'info',
+        'read': bool(i % 2), 'dedup_key': f'bench:{i}'
+    } for i in range(profile['notifications'])])
+    db.session.commit()
+
+    rollups.rebuild(user.id)
+    balances.reconcile(user.id)
+    return user.id
+
+
+def seed(sizes, seed=0):
+    """Recreate the schema and seed one user per size. Returns {size: user_id}."""
+    db.drop_all()
+    db.create_all()
+    return {size: seed_user(size, seed) for size in sizes}
@@ -0,0 +1,268 @@
+"""Benchmark every /api endpoint against a seeded database.
+
+Run from the backend directory:
+
+    python -m benchmarks.run --sizes small,medium --iterations 50 --output before.json
+    python -m benchmarks.run --mode http --threads 8 --requests 400
+    python -m benchmarks.compare before.json after.json
+
+``client`` mode drives each scenario sequentially through the Flask test
+client; ``http`` mode serves the app with a threaded WSGI server and
+drives the read-only scenarios with concurrent HTTP requests. SQL
+statements per request come from the app's own /metrics registry. The
+JSON report has stable keys so runs can be diffed across commits.
+"""
+import argparse
+import json
+import logging
+import math
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+HTTP_ITERATION_OFFSET = 1_000_000
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description=__doc__.split('\n\n')[0])
+    parser.add_argument('--database-uri', default=f'sqlite:///{os.path.join(tempfile.gettempdir(), "spendsmart-bench.db")}',
+                        help='Database to (re)create and seed. Its contents are dropped.')
+    parser.add_argument('--sizes', default='small,medium', help='Comma-separated size profiles: small, medium, huge.')
+    parser.add_argument('--mode', choices=('client', 'http', 'both'), default='client')
+    parser.add_argument('--iterations', type=int, default=30, help='Timed requests per scenario in client mode.')
+    parser.add_argument('--warmup', type=int, default=3, help='Untimed requests per scenario before measuring.')
+    parser.add_argument('--threads', type=int, default=8, help='Concurrent clients in http mode.')
+    parser.add_argument('--requests', type=int, default=400, help='Requests per scenario in http mode.')
+    parser.add_argument('--only', default='', help='Comma-separated endpoint names (e.g. api.get_user_expenses).')
+    parser.add_argument('--cache', choices=('none', 'memory'), default='none', help='RESPONSE_CACHE_BACKEND to use.')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write the JSON report here instead of stdout.')
+    return parser.parse_args(argv)
+
+
+def configure_environment(args):
+    """Config is read from the environment when ``config`` is imported, so set it first."""
+    os.environ['SQLALCHEMY_DATABASE_URI'] = args.database_uri
+    os.environ.setdefault('JWT_SECRET_KEY', 'benchmark-only-secret-key-benchmark-only-secret')
+    os.environ['RESPONSE_CACHE_BACKEND'] = args.cache
+    os.environ['UPLOAD_FOLDER'] = os.path.join(tempfile.gettempdir(), 'spendsmart-bench-uploads')
+    os.environ['JOB_WORKER_THREADS'] = '0'
+    os.environ['METRICS_ENABLED'] = 'true'
+
+
+class Context:
+    def __init__(self, size, user_id, email, token):
+        self.size = size
+        self.user_id = user_id
+        self.email = email
+        self.run = int(time.time())
+        self.headers = {'Authorization': f'Bearer {token}'}
+
+
+def percentile(sorted_values, p):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return 0.0
+    return sorted_values[max(0, math.ceil(p / 100 * len(sorted_values)) - 1)]
+
+
+def sql_totals(endpoint, method):
+    """(statements, requests) recorded so far for an endpoint, across status classes."""
+    from metrics import metrics
+    statements = requests = 0
+    for (name, verb, _), series in list(metrics.sql_statements.series.items()):
+        if name == endpoint and verb == method:
+            statements += series[-1]
+            requests += sum(series[:-1])
+    return statements, requests
+
+
+def summarize(scenario, size, mode, latencies, errors, wall, sql_before):
+    statements, requests = sql_totals(scenario.endpoint, scenario.method)
+    statements -= sql_before[0]
+    requests -= sql_before[1]
+    ordered = sorted(latencies)
+    ms = lambda seconds: round(seconds * 1000, 3)
+    return {
+        'size': size,
+        'mode': mode,
+        'endpoint': scenario.endpoint,
+        'method': scenario.method,
+        'requests': len(latencies),
+        'errors': errors,
+        'throughput_rps': round(len(latencies) / wall, 1) if wall else 0.0,
+        'mean_ms': ms(sum(ordered) / len(ordered)) if ordered else 0.0,
+        'p50_ms': ms(percentile(ordered, 50)),
+        'p95_ms': ms(percentile(ordered, 95)),
+        'p99_ms': ms(percentile(ordered, 99)),
+        'sql_per_request': round(statements / requests, 2) if requests else 0.0,
+    }
+
+
+def _client_call(app, client, ctx, scenario, i):
+    # prepare() runs in its own app context; requests must not share it, or they would share one session
+    params = {}
+    if scenario.prepare:
+        with app.app_context():
+            params = scenario.prepare(ctx, i)
+    body = scenario.body(ctx, i) if scenario.body else None
+    kwargs = {'headers': ctx.headers}
+    if body is not None:
+        if scenario.kind == 'json':
+            kwargs['json'] = body
+        else:
+            kwargs['data'] = body
+            kwargs['content_type'] = 'multipart/form-data'
+
+    start = time.perf_counter()
+    response = client.open(scenario.path.format(**params), method=scenario.method, **kwargs)
+    response.get_data()
+    elapsed = time.perf_counter() - start
+    return elapsed, response.status_code >= 400
+
+
+def run_client(app, ctx, scenarios, iterations, warmup):
+    client = app.test_client()
+    results = []
+    for scenario in scenarios:
+        for i in range(warmup):
+            _client_call(app, client, ctx, scenario, -1 - i)
+        sql_before = sql_totals(scenario.endpoint, scenario.method)
+        latencies, errors = [], 0
+        started = time.perf_counter()
+        for i in range(iterations):
+            elapsed, failed = _client_call(app, client, ctx, scenario, i)
+            latencies.append(elapsed)
+            errors += failed
+        # Wall time includes prepare(), so throughput understates delete scenarios; their percentiles do not
+        results.append(summarize(scenario, ctx.size, 'client', latencies, errors, time.perf_counter() - started, sql_before))
+    return results
+
+
+def _http_call(base_url, ctx, scenario, i):
+    data = None
+    headers = dict(ctx.headers)
+    if scenario.body:
+        data = json.dumps(scenario.body(ctx, i)).encode()
+        headers['Content-Type'] = 'application/json'
+    request = urllib.request.Request(base_url + scenario.path, data=data, headers=headers, method=scenario.method)
+    start = time.perf_counter()
+    try:
+        with urllib.request.urlopen(request) as response:
+            response.read()
+        failed = False
+    except urllib.error.HTTPError as e:
+        e.read()
+        failed = True
+    return time.perf_counter() - start, failed
+
+
+def run_http(app, ctx, scenarios, threads, requests):
+    from werkzeug.serving import make_server
+    logging.getLogger('werkzeug').setLevel(logging.ERROR)
+    server = make_server('127.0.0.1', 0, app, threaded=True)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f'http://127.0.0.1:{server.server_port}'
+
+    results = []
+    try:
+        for scenario in scenarios:
+            if scenario.prepare or scenario.kind != 'json':
+                continue  # load mode only replays self-contained JSON requests
+            sql_before = sql_totals(scenario.endpoint, scenario.method)
+            # Offset the iteration numbers so payloads (e.g. signup emails) never repeat client-mode ones
+            iterations = range(HTTP_ITERATION_OFFSET, HTTP_ITERATION_OFFSET + requests)
+            started = time.perf_counter()
+            with ThreadPoolExecutor(threads) as pool:
+                outcomes = list(pool.map(lambda i: _http_call(base_url, ctx, scenario, i), iterations))
+            wall = time.perf_counter() - started
+            latencies = [elapsed for elapsed, _ in outcomes]
+            errors = sum(failed for _, failed in outcomes)
+            results.append(summarize(scenario, ctx.size, 'http', latencies, errors, wall, sql_before))
+    finally:
+        server.shutdown()
+    return results
+
+
+def _git_commit():
+    try:
+        commit = subprocess.check_output(['git', 'rev-parse', 'HEAD'], text=True, stderr=subprocess.DEVNULL).strip()
+        dirty = bool(subprocess.check_output(['git', 'status', '--porcelain'], text=True, stderr=subprocess.DEVNULL).strip())
+        return commit, dirty
+    except (OSError, subprocess.CalledProcessError):
+        return None, None
+
+
+def main(argv=None):
+    args = parse_args(argv)
+    configure_environment(args)
+
+    from app import create_app
+    from extensions import db
+    from benchmarks import dataset
+    from benchmarks.scenarios import SCENARIOS, uncovered
+
+    app = create_app()
+    missing = uncovered(app)
+    if missing:
+        sys.exit(f'No benchmark scenario for: {", ".join(missing)}')
+
+    sizes = [size.strip() for size in args.sizes.split(',') if size.strip()]
+    unknown = [size for size in sizes if size not in dataset.SIZES]
+    if unknown:
+        sys.exit(f'Unknown sizes: {", ".join(unknown)}')
+    only = {name.strip() for name in args.only.split(',') if name.strip()}
+    scenarios = [s for s in SCENARIOS if not only or s.endpoint in only]
+
+    with app.app_context():
+        print(f'Seeding {", ".join(sizes)} ...', file=sys.stderr)
+        user_ids = dataset.seed(sizes, args.seed)
+        dialect = db.engine.dialect.name
+
+    client = app.test_client()
+    results = []
+    for size in sizes:
+        email = dataset.email_for(size)
+        token = client.post('/api/login', json={'email': email, 'password': dataset.PASSWORD}).get_json()['token']
+        ctx = Context(size, user_ids[size], email, token)
+        if args.mode in ('client', 'both'):
+            print(f'[{size}] client mode, {len(scenarios)} scenarios ...', file=sys.stderr)
+            results += run_client(app, ctx, scenarios, args.iterations, args.warmup)
+        if args.mode in ('http', 'both'):
+            print(f'[{size}] http mode, {args.threads} threads ...', file=sys.stderr)
+            results += run_http(app, ctx, scenarios, args.threads, args.requests)
+
+    commit, dirty = _git_commit()
+    report = {
+        'meta': {
+            'commit': commit,
+            'dirty': dirty,
+            'python': platform.python_version(),
+            'dialect': dialect,
+            'seed': args.seed,
+            'sizes': {size: dataset.SIZES[size] for size in sizes},
+            'cache': args.cache,
+            'iterations': args.iterations,
+            'threads': args.threads,
+            'http_requests': args.requests,
+        },
+        'results': results,
+    }
+    text = json.dumps(report, indent=2, sort_keys=True)
+    if args.output:
+        with open(args.output, 'w') as f:
+            f.write(text + '\n')
+        print(f'Wrote {len(results)} results to {args.output}', file=sys.stderr)
+    else:
+        print(text)
+
+
+if __name__ == '__main__':
+    main()
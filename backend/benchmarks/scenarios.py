@@ -0,0 +1,178 @@
+"""One scenario per API route, plus the /media files they link to.
+
+A scenario is a request template. ``prepare`` runs before each timed
+request, untimed, and returns the path parameters it needs (for example
+a freshly created row to delete). ``body`` builds the JSON, form or
+multipart payload for iteration ``i``. Scenarios without ``prepare`` are
+also used by the HTTP load mode.
+"""
+import io
+from collections import namedtuple
+from datetime import date
+
+from werkzeug.datastructures import FileStorage
+
+from extensions import db
+from models import Transaction, Income, Budget, SavingGoal, RecurringRule
+from benchmarks.dataset import PASSWORD
+import rollups
+import uploads
+
+Scenario = namedtuple('Scenario', ['endpoint', 'method', 'path', 'body', 'prepare', 'kind'],
+                      defaults=(None, None, 'json'))
+
+
+# A 1x1 PNG, enough to exercise the upload path without an image library
+AVATAR_PNG = (b'\x89PNG\r\n\x1a\n\x00\x00\x00\rIHDR\x00\x00\x00\x01\x00\x00\x00\x01\x08\x02\x00\x00\x00\x90wS\xde'
+              b'\x00\x00\x00\x0cIDATx\x9cc\xf8\xcf\xc0\x00\x00\x03\x01\x01\x00\xc9\xfe\x92\xef'
+              b'\x00\x00\x00\x00IEND\xaeB`\x82')
+
+
+def _today():
+    return date.today().isoformat()
+
+
+def _first_id(model, user_id):
+    return db.session.query(db.func.min(model.id)).filter(model.user_id == user_id).scalar()
+
+
+def _new_row(model, **values):
+    row = model(**values)
+    db.session.add(row)
+    db.session.commit()
+    return row.id
+
+
+def _new_entry(kind, model, **values):
+    """Like ``_new_row``, but also applied to the rollups and balances, as the API's own writes are."""
+    row = model(**values)
+    db.session.add(row)
+    rollups.record_entry(kind, row)
+    db.session.commit()
+    return row.id
+
+
+def _new_expense(ctx, i):
+    return {'id': _new_entry(rollups.EXPENSE, Transaction, user_id=ctx.user_id, amount=10_00, category='Food',
+                             date=date.today(), payment_method='UPI', notes='bench delete', other_source='')}
+
+
+def _new_income(ctx, i):
+    return {'id': _new_entry(rollups.INCOME, Income, user_id=ctx.user_id, amount=10_00, source='Other',
+                             date=date.today(), payment_method='UPI', notes='bench delete', other_source='')}
+
+
+def _new_budget(ctx, i):
+    return {'id': _new_row(Budget, user_id=ctx.user_id, category=f'Bench {i}', amount=100_00,
+                           month=date.today().month, year=date.today().year)}
+
+
+def _new_goal(ctx, i):
+    return {'id': _new_row(SavingGoal, user_id=ctx.user_id, title=f'Bench {i}', target_amount=100_00,
+                           current_amount=0, target_date=date(date.today().year + 1, 1, 1))}
+
+
+def _new_rule(ctx, i):
+    return {'id': _new_row(RecurringRule, user_id=ctx.user_id, kind='expense', label=f'Bench {i}', amount=100_00,
+                           payment_method='UPI', notes='', frequency='monthly', interval=1,
+                           start_date=date(date.today().year + 1, 1, 1), next_date=date(date.today().year + 1, 1, 1))}
+
+
+def _existing(model):
+    return lambda ctx, i: {'id': _first_id(model, ctx.user_id)}
+
+
+def _csv(ctx, i):
+    lines = ['date,amount,category,notes'] + [f'{_today()},-{10 + n}.{i % 100:02d},Food,bench import {i}-{n}'
+                                             for n in range(50)]
+    return {'file': (io.BytesIO('\n'.join(lines).encode()), 'statement.csv')}
+
+
+def _profile_form(ctx, i):
+    return {'fullName': f'Benchmark {i}', 'profileImage': (io.BytesIO(AVATAR_PNG), 'avatar.png')}
+
+
+def _stored_avatar(ctx, i):
+    return {'name': uploads.store(FileStorage(io.BytesIO(AVATAR_PNG), 'avatar.png'))}
+
+
+def _batch(kind):
+    label = 'category' if kind == 'expense' else 'source'
+    return lambda ctx, i: {'operations': [{'op': 'create', 'data': {
+        'amount': 10 + n, label: 'Food' if kind == 'expense' else 'Other', 'date': _today(), 'paymentMethod': 'UPI'
+    }} for n in range(20)]}
+
+
+SCENARIOS = [
+    # Auth and profile
+    Scenario('api.login', 'POST', '/api/login', lambda ctx, i: {'email': ctx.email, 'password': PASSWORD}),
+    Scenario('api.signup', 'POST', '/api/signup', lambda ctx, i: {
+        'username': f'{ctx.size}-signup-{ctx.run}-{i}', 'fullName': 'Bench', 'email': f'{ctx.size}-{ctx.run}-{i}@bench.local',
+        'password': PASSWORD}),
+    Scenario('api.reset_password', 'POST', '/api/reset-password', lambda ctx, i: {
+        'email': ctx.email, 'newPassword': PASSWORD, 'confirmNewPassword': PASSWORD}),
+    Scenario('api.update_profile', 'POST', '/api/update-profile', _profile_form, kind='multipart'),
+    Scenario('api.get_user_data', 'GET', '/api/user-data'),
+    Scenario('api.get_dashboard', 'GET', '/api/dashboard'),
+
+    # Income and expenses
+    Scenario('api.add_expense', 'POST', '/api/add-expense', lambda ctx, i: {
+        'category': 'Food', 'amount': 12.5, 'date': _today(), 'paymentMethod': 'UPI'}),
+    Scenario('api.add_income', 'POST', '/api/add-income', lambda ctx, i: {
+        'source': 'Other', 'amount': 100, 'date': _today(), 'paymentMethod': 'UPI'}),
+    Scenario('api.get_user_income', 'GET', '/api/get-user-income'),
+    Scenario('api.get_user_expenses', 'GET', '/api/get-user-expenses'),
+    Scenario('api.update_transaction', 'PUT', '/api/transactions/{id}', lambda ctx, i: {'amount': 100 + i % 7},
+             _existing(Transaction)),
+    Scenario('api.delete_transaction', 'DELETE', '/api/transactions/{id}', prepare=_new_expense),
+    Scenario('api.filter_transactions', 'GET', '/api/transactions/filter?category=Food'),
+    Scenario('api.update_income', 'PUT', '/api/incomes/{id}', lambda ctx, i: {'amount': 1000 + i % 7},
+             _existing(Income)),
+    Scenario('api.delete_income', 'DELETE', '/api/incomes/{id}', prepare=_new_income),
+    Scenario('api.filter_incomes', 'GET', '/api/incomes/filter?source=Salary'),
+    Scenario('api.search_entries', 'GET', '/api/search?q=bench'),  # matches every seeded expense
+    Scenario('api.export_history', 'GET', '/api/export?format=csv'),
+    Scenario('api.import_history', 'POST', '/api/import', _csv, kind='multipart'),
+    Scenario('api.batch_transactions', 'POST', '/api/transactions/batch', _batch('expense')),
+    Scenario('api.batch_incomes', 'POST', '/api/incomes/batch', _batch('income')),
+
+    # Budgets, goals, notifications, achievements
+    Scenario('api.get_budgets', 'GET', '/api/budgets'),
+    Scenario('api.add_budget', 'POST', '/api/budgets', lambda ctx, i: {'category': f'Bench add {i}', 'amount': 500}),
+    Scenario('api.update_budget', 'PUT', '/api/budgets/{id}', lambda ctx, i: {'amount': 5000 + i % 7},
+             _existing(Budget)),
+    Scenario('api.delete_budget', 'DELETE', '/api/budgets/{id}', prepare=_new_budget),
+    Scenario('api.budget_analysis', 'GET', '/api/budget-analysis'),
+    Scenario('api.get_saving_goals', 'GET', '/api/saving-goals'),
+    Scenario('api.add_saving_goal', 'POST', '/api/saving-goals', lambda ctx, i: {
+        'title': f'Bench {i}', 'target_amount': 1000, 'target_date': f'{date.today().year + 1}-01-01'}),
+    Scenario('api.update_saving_goal', 'PUT', '/api/saving-goals/{id}', lambda ctx, i: {'current_amount': i % 50},
+             _existing(SavingGoal)),
+    Scenario('api.delete_saving_goal', 'DELETE', '/api/saving-goals/{id}', prepare=_new_goal),
+    Scenario('api.get_recurring_rules', 'GET', '/api/recurring-rules'),
+    Scenario('api.add_recurring_rule', 'POST', '/api/recurring-rules', lambda ctx, i: {
+        'category': f'Bench rule {i}', 'amount': 99, 'paymentMethod': 'UPI', 'frequency': 'monthly',
+        'start_date': f'{date.today().year + 1}-01-01'}),
+    Scenario('api.update_recurring_rule', 'PUT', '/api/recurring-rules/{id}', lambda ctx, i: {'amount': 500 + i % 7},
+             _existing(RecurringRule)),
+    Scenario('api.delete_recurring_rule', 'DELETE', '/api/recurring-rules/{id}', prepare=_new_rule),
+    Scenario('api.get_notifications', 'GET', '/api/notifications'),
+    Scenario('api.mark_notifications_read', 'POST', '/api/notifications/mark-read', lambda ctx, i: {}),
+    Scenario('api.get_achievements', 'GET', '/api/achievements'),
+
+    # Analytics
+    Scenario('api.get_financial_insights', 'GET', '/api/financial-insights'),
+    Scenario('api.payment_method_analysis', 'GET', '/api/payment-method-analysis'),
+    Scenario('api.analytics_trends', 'GET', '/api/analytics/trends'),
+    Scenario('api.get_forecast', 'GET', '/api/forecast'),
+
+    # Uploaded files (no database access)
+    Scenario('media.serve_media', 'GET', '/media/{name}', prepare=_stored_avatar),
+]
+
+
+def uncovered(app):
+    """``api.*`` endpoints that have no scenario."""
+    covered = {scenario.endpoint for scenario in SCENARIOS}
+    return sorted({rule.endpoint for rule in app.url_map.iter_rules()
+                   if rule.endpoint.startswith('api.') and rule.endpoint not in covered})
@@ -0,0 +1,115 @@
+"""Budget evaluation for one or many users.
+
+Spending for every budget in a month comes from one grouped query over
+the expense rollups (``GROUP BY user_id, category``). A total budget
+(empty category) is the sum of all categories from that same result, so
+evaluating budgets costs two queries (budgets, then spending) per chunk
+of up to USER_CHUNK_SIZE users.
+
+Warning/exceeded notifications are sent by the ``budgets.alerts`` job,
+which ``rollups.queue_budget_alerts`` queues when spending grows or a
+budget changes.
+Amounts are integer minor units (see money.py).
+"""
+from collections import defaultdict
+
+from extensions import db
+from models import Budget, MonthlyRollup
+from rollups import EXPENSE
+from notifications import outbox
+from cache import response_cache
+from jobs import task
+from money import format_major
+
+USER_CHUNK_SIZE = 1000
+
+
+def spent_by_category(user_ids, year, month):
+    """Return {user_id: {category: spent}} for the given month."""
+    rows = db.session.query(
+        MonthlyRollup.user_id, MonthlyRollup.category, db.func.sum(MonthlyRollup.total)
+    ).filter(
+        MonthlyRollup.user_id.in_(user_ids),
+        MonthlyRollup.kind == EXPENSE,
+        MonthlyRollup.year == year,
+        MonthlyRollup.month == month
+    ).group_by(MonthlyRollup.user_id, MonthlyRollup.category)
+
+    spent = defaultdict(dict)
+    for user_id, category, amount in rows:
+        spent[user_id][category] = int(amount or 0)
+    return spent
+
+
+def evaluate(budget, category_spent):
+    """Spent/remaining/percentage for one budget, given that user's spending by category."""
+    if budget.category:
+        spent = category_spent.get(budget.category, 0)
+    else:
+        spent = sum(category_spent.values())
+    return {
+        'budget': budget,
+        'spent': spent,
+        'remaining': budget.amount - spent,
+        'percentage': (spent / budget.amount * 100) if budget.amount > 0 else 0
+    }
+
+
+def evaluate_budgets(user_ids, year, month):
+    """Return {user_id: [evaluation, ...]} for every budget of the given users in a month.
+
+    Users are processed USER_CHUNK_SIZE at a time, two queries per chunk.
+    """
+    user_ids = [int(user_id) for user_id in user_ids]
+    results = {user_id: [] for user_id in user_ids}
+
+    for start in range(0, len(user_ids), USER_CHUNK_SIZE):
+        chunk = user_ids[start:start + USER_CHUNK_SIZE]
+        budgets = Budget.query.filter(
+            Budget.user_id.in_(chunk), Budget.year == year, Budget.month == month
+        ).order_by(Budget.id).all()
+        if not budgets:
+            continue
+
+        # int(): a budget added in this session still holds the JWT's string identity
+        spent = spent_by_category({int(b.user_id) for b in budgets}, year, month)
+        for budget in budgets:
+            user_id = int(budget.user_id)
+            results[user_id].append(evaluate(budget, spent.get(user_id, {})))
+    return results
+
+
+def evaluate_user_budgets(user_id, year, month):
+    """Evaluations for one user's budgets in a month."""
+    return evaluate_budgets([user_id], year, month)[int(user_id)]
+
+
+def needs_alert(evaluation):
+    return evaluation['percentage'] >= 90
+
+
+@task('budgets.alerts')
+def send_alerts(user_id, year, month):
+    """Notify a user about budgets at 90% or over for a month (one notification per budget and month)."""
+    for evaluation in evaluate_user_budgets(user_id, year, month):
+        if not needs_alert(evaluation):
+            continue
+        budget = evaluation['budget']
+        spent = evaluation['spent']
+        percentage = evaluation['percentage']
+        if percentage < 100:
+            outbox.add(
+                user_id,
+                f"⚠️ You've used {percentage:.0f}% of your {budget.category or 'total'} budget!",
+                'budget_warning',
+                dedup_key=f'budget:{budget.id}:{year}-{month}'
+            )
+        elif percentage >= 100:
+            outbox.add(
+                user_id,
+                f"🚨 Budget exceeded! You've spent ₹{format_major(spent)} against ₹{format_major(budget.amount)} {budget.category or 'total'} budget.",
+                'budget_exceeded',
+                dedup_key=f'budget:{budget.id}:{year}-{month}'
+            )
+    if outbox.flush():
+        response_cache.bump(user_id)
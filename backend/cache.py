@@ -0,0 +1,212 @@
+"""Per-user response cache for read endpoints.
+
+Responses are keyed on (user id, endpoint, normalized query args, day,
+user data version). Every successful write request bumps the user's
+version, so entries are never invalidated explicitly: stale ones are no
+longer addressed and age out of the backend. The ETag is derived from
+the same key, so a conditional request is answered with 304 Not Modified
+from the version counter alone, without touching the database.
+
+Backends (RESPONSE_CACHE_BACKEND):
+  memory  per-process LRU bounded by RESPONSE_CACHE_MAX_ENTRIES (default;
+          only correct with a single process that also runs the jobs, so
+          ``flask worker`` refuses to start with it)
+  redis   shared by all worker processes; needs the ``redis`` package and
+          RESPONSE_CACHE_URL
+  none    caching disabled
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from datetime import date
+from functools import wraps
+
+from flask import current_app, make_response, request
+from flask_jwt_extended import get_jwt_identity
+
+from metrics import gauge_lines
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class MemoryBackend:
+    def __init__(self, max_entries):
+        self.max_entries = max_entries
+        self.evictions = 0
+        self._entries = OrderedDict()
+        self._versions = {}
+        # Versions start from the process start time so ETags handed out by an earlier process never match
+        self._base = time.time_ns()
+        self._lock = threading.Lock()
+
+    def get_version(self, user_id):
+        return self._versions.get(user_id, self._base)
+
+    def bump_version(self, user_id):
+        with self._lock:
+            self._versions[user_id] = self._versions.get(user_id, self._base) + 1
+
+    def get(self, key):
+        with self._lock:
+            value = self._entries.get(key)
+            if value is not None:
+                self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value):
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        return {'backend': 'memory', 'entries': len(self._entries),
+                'max_entries': self.max_entries, 'evictions': self.evictions}
+
+
+class RedisBackend:
+    def __init__(self, url, ttl, prefix='spendsmart:cache:'):
+        try:
+            import redis
+        except ImportError:
+            raise RuntimeError('RESPONSE_CACHE_BACKEND=redis requires the redis package')
+        self.ttl = ttl
+        self.prefix = prefix
+        self._redis = redis.Redis.from_url(url)
+
+    def _version_key(self, user_id):
+        return f'{self.prefix}version:{user_id}'
+
+    def get_version(self, user_id):
+        key = self._version_key(user_id)
+        version = self._redis.get(key)
+        if version is None:
+            # Same reasoning as MemoryBackend: a lost counter must not restart at a value already handed out
+            self._redis.set(key, time.time_ns(), nx=True)
+            version = self._redis.get(key)
+        return int(version)
+
+    def bump_version(self, user_id):
+        self.get_version(user_id)
+        self._redis.incr(self._version_key(user_id))
+
+    def get(self, key):
+        value = self._redis.get(self.prefix + key)
+        if value is None:
+            return None
+        mimetype, _, body = value.partition(b'\n')
+        return mimetype.decode(), body
+
+    def set(self, key, value):
+        mimetype, body = value
+        self._redis.set(self.prefix + key, mimetype.encode() + b'\n' + body, ex=self.ttl)
+
+    def stats(self):
+        return {'backend': 'redis', 'entries': None, 'max_entries': None,
+                'evictions': self._redis.info('stats').get('evicted_keys', 0)}
+
+
+class ResponseCache:
+    def __init__(self):
+        self.backend = None
+        self.hits = self.misses = self.not_modified = 0
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('RESPONSE_CACHE_BACKEND', 'memory')
+        app.config.setdefault('RESPONSE_CACHE_MAX_ENTRIES', 1024)
+        app.config.setdefault('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+        app.config.setdefault('RESPONSE_CACHE_TTL', 3600)
+
+        name = app.config['RESPONSE_CACHE_BACKEND']
+        if name == 'memory':
+            self.backend = MemoryBackend(app.config['RESPONSE_CACHE_MAX_ENTRIES'])
+        elif name == 'redis':
+            self.backend = RedisBackend(app.config['RESPONSE_CACHE_URL'], app.config['RESPONSE_CACHE_TTL'])
+        elif name == 'none':
+            self.backend = None
+        else:
+            raise ValueError(f'Unknown RESPONSE_CACHE_BACKEND: {name}')
+        app.after_request(self._bump_after_write)
+
+    def bump(self, user_id):
+        """Invalidate every cached response of a user. Call this after writes made outside of requests."""
+        if self.backend is not None:
+            self.backend.bump_version(int(user_id))
+
+    def _count(self, counter):
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    def _digest(self, user_id):
+        args = sorted(request.args.items(multi=True))
+        version = self.backend.get_version(user_id)
+        key = f'{user_id}|{request.endpoint}|{args}|{date.today().isoformat()}|{version}'
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+
+    def cached(self, view):
+        """Cache a JWT-protected GET view per user. Apply below ``@jwt_required()``."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if self.backend is None:
+                return view(*args, **kwargs)
+
+            digest = self._digest(int(get_jwt_identity()))
+            if request.if_none_match.contains(digest):
+                self._count('not_modified')
+                response = current_app.response_class(status=304)
+            else:
+                entry = self.backend.get(digest)
+                if entry is not None:
+                    self._count('hits')
+                    mimetype, body = entry
+                    response = current_app.response_class(body, mimetype=mimetype)
+                else:
+                    self._count('misses')
+                    response = make_response(view(*args, **kwargs))
+                    if response.status_code != 200:
+                        return response
+                    self.backend.set(digest, (response.mimetype, response.get_data()))
+
+            response.set_etag(digest)
+            response.headers['Cache-Control'] = 'private, no-cache'
+            response.vary.add('Authorization')
+            return response
+        return wrapper
+
+    def stats(self):
+        lookups = self.hits + self.misses + self.not_modified
+        stats = {
+            'hits': self.hits,
+            'misses': self.misses,
+            'not_modified': self.not_modified,
+            'hit_rate': round((self.hits + self.not_modified) / lookups, 4) if lookups else 0.0,
+        }
+        if self.backend is not None:
+            stats.update(self.backend.stats())
+        return stats
+
+    def metric_lines(self):
+        stats = self.stats()
+        lines = []
+        for key in ('hits', 'misses', 'not_modified', 'evictions', 'entries'):
+            if stats.get(key) is not None:
+                lines += gauge_lines(f'spendsmart_response_cache_{key}', f'Response cache {key.replace("_", " ")}.', stats[key])
+        return lines
+
+    def _bump_after_write(self, response):
+        if request.method not in WRITE_METHODS or response.status_code >= 400:
+            return response
+        try:
+            user_id = get_jwt_identity()
+        except RuntimeError:
+            return response  # not a JWT-protected route (login, signup, ...)
+        if user_id is not None:
+            self.bump(user_id)
+        return response
+
+
+response_cache = ResponseCache()
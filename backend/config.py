@@ -7,9 +7,48 @@ load_dotenv()
 class Config:
     SQLALCHEMY_DATABASE_URI = os.getenv('SQLALCHEMY_DATABASE_URI')
     SQLALCHEMY_TRACK_MODIFICATIONS = False
+    # Comma-separated read replicas for the analytics/list endpoints (see replicas.py)
+    SQLALCHEMY_REPLICA_URIS = [uri for uri in os.getenv('SQLALCHEMY_REPLICA_URIS', '').split(',') if uri]
+    REPLICA_READ_YOUR_WRITES_SECONDS = float(os.getenv('REPLICA_READ_YOUR_WRITES_SECONDS', 5))
     JWT_SECRET_KEY = os.getenv('JWT_SECRET_KEY')
     JWT_ACCESS_TOKEN_EXPIRES = timedelta(days=1)
     
-    # File Uploads
-    UPLOAD_FOLDER = 'static/uploads/'
+    # File Uploads (profile images are stored by content hash and served from /media, see uploads.py)
+    UPLOAD_FOLDER = os.getenv('UPLOAD_FOLDER', 'static/uploads/')
     MAX_CONTENT_LENGTH = 16 * 1024 * 1024  # 16MB
+
+    # Notifications: identical alerts within this window are stored once
+    NOTIFICATION_COALESCE_SECONDS = int(os.getenv('NOTIFICATION_COALESCE_SECONDS', 3600))
+
+    # Response cache for read endpoints: 'memory' (per-process LRU), 'redis' (shared) or 'none'
+    RESPONSE_CACHE_BACKEND = os.getenv('RESPONSE_CACHE_BACKEND', 'memory')
+    RESPONSE_CACHE_MAX_ENTRIES = int(os.getenv('RESPONSE_CACHE_MAX_ENTRIES', 1024))
+    RESPONSE_CACHE_URL = os.getenv('RESPONSE_CACHE_URL', 'redis://localhost:6379/0')
+    RESPONSE_CACHE_TTL = int(os.getenv('RESPONSE_CACHE_TTL', 3600))
+
+    # Background jobs: worker threads started with the web app (0 = only `flask worker` runs jobs)
+    JOB_WORKER_THREADS = int(os.getenv('JOB_WORKER_THREADS', 2))
+    JOB_BACKOFF_SECONDS = int(os.getenv('JOB_BACKOFF_SECONDS', 5))
+    JOB_BACKOFF_MAX_SECONDS = int(os.getenv('JOB_BACKOFF_MAX_SECONDS', 3600))
+
+    # Periodic recompute of stale insight snapshots (seconds between runs, 0 disables)
+    INSIGHTS_REFRESH_SECONDS = int(os.getenv('INSIGHTS_REFRESH_SECONDS', 300))
+
+    # Periodic refresh of stored spending forecast models (seconds between runs, 0 disables)
+    FORECAST_REFRESH_SECONDS = int(os.getenv('FORECAST_REFRESH_SECONDS', 3600))
+
+    # Periodic creation of due recurring expenses and incomes (seconds between runs, 0 disables)
+    RECURRING_MATERIALIZE_SECONDS = int(os.getenv('RECURRING_MATERIALIZE_SECONDS', 900))
+
+    # Password hashing: bcrypt cost (stored hashes are upgraded on login when it changes) and the bounded hash pool
+    BCRYPT_LOG_ROUNDS = int(os.getenv('BCRYPT_LOG_ROUNDS', 12))
+    PASSWORD_HASH_THREADS = int(os.getenv('PASSWORD_HASH_THREADS', 4))
+    PASSWORD_HASH_MAX_WAITING = int(os.getenv('PASSWORD_HASH_MAX_WAITING', 32))
+    PASSWORD_HASH_WAIT_SECONDS = float(os.getenv('PASSWORD_HASH_WAIT_SECONDS', 2))
+
+    # Per-process cache of user profiles for authenticated requests (seconds, 0 disables; max users)
+    USER_PROFILE_CACHE_TTL = int(os.getenv('USER_PROFILE_CACHE_TTL', 60))
+    USER_PROFILE_CACHE_MAX_ENTRIES = int(os.getenv('USER_PROFILE_CACHE_MAX_ENTRIES', 4096))
+
+    # Prometheus metrics at /metrics
+    METRICS_ENABLED = os.getenv('METRICS_ENABLED', 'true').lower() == 'true'
@@ -0,0 +1,257 @@
+"""End-of-month spending forecasts from per-category exponential smoothing.
+
+Each expense category of a user has a row in ``forecast_states`` with a
+simple exponential smoothing model of its daily spend: the smoothing
+factor ``alpha`` and the smoothed daily spend ``level`` after every day
+up to ``through`` (normally yesterday) has been folded in.
+
+- With no usable state, all categories are fitted together from the
+  last HISTORY_DAYS days. The levels for every candidate in ALPHAS come
+  from one matrix product, and each category keeps the alpha with the
+  smallest one-step-ahead squared error.
+- Afterwards only the days completed since ``through`` are folded into
+  ``level``, in closed form, from one query starting at ``through``'s
+  month.
+- Writes to months before the one containing ``through`` mark the
+  user's states stale (``rollups.apply_deltas``), which forces a refit.
+  Edits within that month are caught by comparing the spend folded in
+  for it (``folded``) with the database.
+
+``GET /api/forecast`` never writes: it folds or fits in memory from the
+stored states. The ``forecast.refresh`` job stores the result. Expense
+writes queue it for users who have models, and it also runs
+periodically for users who spent recently, which creates missing models
+and keeps ``through`` at yesterday.
+
+The projection is the month's spend so far plus ``level`` for every
+remaining day. Today counts as remaining until its spend reaches the
+daily level. Amounts are integer minor units (see money.py).
+"""
+from datetime import date, datetime, timedelta, timezone
+
+import numpy as np
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Budget, ForecastState, MonthlyRollup
+from periods import month_bounds
+from rollups import EXPENSE
+from replicas import replicas
+from jobs import task, periodic
+import analytics
+import money
+
+HISTORY_DAYS = 180
+ALPHAS = (0.03, 0.05, 0.1, 0.2, 0.3, 0.5)
+DEFAULT_ALPHA = 0.1  # for categories without completed days to fit on
+SEED_DAYS = 7  # initial level: mean of the first week
+
+_EPOCH = date(1970, 1, 1)
+
+
+def smooth(daily, alpha, level):
+    """Fold a (days, categories) matrix of daily spend into ``level``; ``alpha`` per category."""
+    days = daily.shape[0]
+    weights = alpha * (1 - alpha) ** np.arange(days - 1, -1, -1)[:, None]
+    return (1 - alpha) ** days * level + (weights * daily).sum(axis=0)
+
+
+def fit(daily):
+    """(alpha, level) per category for a (days, categories) matrix of daily spend."""
+    days, width = daily.shape
+    if days == 0:
+        return np.full(width, DEFAULT_ALPHA), np.zeros(width)
+
+    alphas = np.asarray(ALPHAS)[:, None, None]
+    steps = np.arange(days)
+    lag = steps[:, None] - steps[None, :]
+    # levels[a, t] = level after day t: alpha-weighted history plus the decayed seed
+    weights = np.where(lag >= 0, alphas * (1 - alphas) ** np.maximum(lag, 0), 0)
+    seed = daily[:SEED_DAYS].mean(axis=0)
+    levels = weights @ daily + (1 - alphas) ** (steps[:, None] + 1) * seed
+    errors = ((daily[1:] - levels[:, :-1]) ** 2).sum(axis=1)
+    best = errors.argmin(axis=0)
+    return np.asarray(ALPHAS)[best], levels[best, -1, np.arange(width)]
+
+
+def _matrix(columns, start, end, names):
+    """(days, len(names)) float matrix of spend per day in [start, end) and category."""
+    index = {name: i for i, name in enumerate(names)}
+    codes = np.array([index[name] for name in columns.categories], np.int64)[columns.category_codes]
+    rows = columns.days - (start - _EPOCH).days
+    length, width = (end - start).days, len(names)
+    keep = (rows >= 0) & (rows < length)
+    sums = np.bincount(rows[keep] * width + codes[keep], weights=columns.amounts[keep], minlength=length * width)
+    return sums.reshape(length, width)
+
+
+def _load(user_id, start, end, names=()):
+    """Expense matrix for [start, end) and its category names (``names`` first)."""
+    columns = analytics.load_columns(user_id, EXPENSE, start, end)
+    names = list(names) + [name for name in columns.categories if name not in names]
+    return _matrix(columns, start, end, names), names
+
+
+def _states(user_id):
+    return {s.category: s for s in ForecastState.query.filter_by(user_id=user_id)}
+
+
+_SAVE = db.update(ForecastState.__table__).where(
+    ForecastState.__table__.c.user_id == db.bindparam('b_user_id'),
+    ForecastState.__table__.c.category == db.bindparam('b_category'),
+    ForecastState.__table__.c.generation == db.bindparam('b_generation'),
+).values(
+    alpha=db.bindparam('b_alpha'), level=db.bindparam('b_level'), through=db.bindparam('b_through'),
+    folded=db.bindparam('b_folded'), stale=False, fitted_at=db.bindparam('b_fitted_at'),
+)
+
+
+def _save(user_id, states, names, alpha, level, through, folded):
+    """Store the models. Rows invalidated since ``states`` was read keep their stale flag. Commits."""
+    now = datetime.now(timezone.utc)
+    updates = []
+    for i, name in enumerate(names):
+        values = {'alpha': float(alpha[i]), 'level': float(level[i]), 'through': through,
+                  'folded': int(round(folded[i])), 'fitted_at': now}
+        if name in states:
+            updates.append({'b_user_id': user_id, 'b_category': name, 'b_generation': states[name].generation,
+                            **{f'b_{key}': value for key, value in values.items()}})
+            continue
+        try:
+            with db.session.begin_nested():
+                db.session.add(ForecastState(user_id=user_id, category=name, stale=False, generation=0, **values))
+        except IntegrityError:
+            pass  # a concurrent request stored it first
+    if updates:
+        db.session.execute(_SAVE, updates)
+    db.session.commit()
+
+
+def _models(user_id, today, states):
+    """Models brought up to yesterday, from ``states`` or a fresh fit. Never writes.
+
+    Returns (daily, names, start, alpha, level, folded, refitted): ``daily``
+    covers [start, end of this month) for ``names``; ``folded`` is the spend
+    of yesterday's month up to yesterday. Without a refit only the first
+    ``len(states)`` names have models; the rest were first spent today.
+    """
+    yesterday = today - timedelta(days=1)
+    _, end = month_bounds(today.year, today.month)
+    through = min((s.through for s in states.values()), default=None)
+    usable = (states and not any(s.stale for s in states.values())
+              and yesterday - timedelta(days=HISTORY_DAYS) <= through <= yesterday)
+
+    if usable:
+        start = through.replace(day=1)
+        daily, names = _load(user_id, start, end, states)
+        known = len(states)
+        folded_rows = (through - start).days + 1
+        completed = daily[:(today - start).days]
+        consistent = (
+            np.array_equal(np.rint(completed[:folded_rows, :known].sum(axis=0)),
+                           [states[name].folded for name in names[:known]])
+            and not completed[:, known:].any()  # a category that has never been fitted
+        )
+        if consistent:
+            alpha = np.array([states[name].alpha for name in names[:known]])
+            level = np.array([states[name].level for name in names[:known]])
+            if through < yesterday:
+                level = smooth(completed[folded_rows:, :known], alpha, level)
+            folded = completed[(yesterday.replace(day=1) - start).days:].sum(axis=0)
+            pad = len(names) - known
+            return (daily, names, start, np.append(alpha, [DEFAULT_ALPHA] * pad), np.append(level, [0.0] * pad),
+                    folded, False)
+
+    start = yesterday - timedelta(days=HISTORY_DAYS - 1)
+    daily, names = _load(user_id, start, end)
+    history = daily[:(today - start).days]
+    active = np.flatnonzero(history.any(axis=1))
+    alpha, level = fit(history[active[0]:] if len(active) else history[:0])
+    folded = history[(yesterday.replace(day=1) - start).days:].sum(axis=0)
+    return daily, names, start, alpha, level, folded, True
+
+
+def refresh_user(user_id, today=None):
+    """Store the user's models brought up to yesterday, refitting them if needed. Commits."""
+    today = today or date.today()
+    user_id = int(user_id)
+    replicas.use_primary()  # the generation check needs the primary's view of the rows
+    states = _states(user_id)  # generations are read before the data they are checked against
+    _, names, _, alpha, level, folded, refitted = _models(user_id, today, states)
+    if refitted:
+        # Categories that no longer have any spend in the window are dropped
+        ForecastState.query.filter(ForecastState.user_id == user_id, ForecastState.category.notin_(names)).delete(
+            synchronize_session=False)
+    else:
+        names = names[:len(states)]
+    _save(user_id, states, names, alpha, level, today - timedelta(days=1), folded)
+
+
+@task('forecast.refresh')
+@periodic('forecast.refresh', 'FORECAST_REFRESH_SECONDS')
+def refresh(user_id=None):
+    """Bring stored models up to yesterday for one user or, periodically, every user who spent recently.
+
+    Queued by ``rollups.queue_forecast_refresh`` after expense writes. The
+    periodic run skips users whose models are already current; it also
+    creates the models of users who have none yet.
+    """
+    if user_id is not None:
+        refresh_user(user_id)
+        return 1
+
+    today = date.today()
+    yesterday = today - timedelta(days=1)
+    recent = yesterday - timedelta(days=HISTORY_DAYS - 1)
+    active = db.session.query(MonthlyRollup.user_id).filter(
+        MonthlyRollup.kind == EXPENSE,
+        db.tuple_(MonthlyRollup.year, MonthlyRollup.month) >= (recent.year, recent.month)
+    ).distinct()
+    current = db.session.query(ForecastState.user_id).group_by(ForecastState.user_id).having(
+        db.func.min(ForecastState.through) == yesterday,
+        db.func.max(db.cast(ForecastState.stale, db.Integer)) == 0
+    )
+    user_ids = {uid for (uid,) in active} - {uid for (uid,) in current}
+    for uid in sorted(user_ids):
+        refresh_user(uid, today)
+    return len(user_ids)
+
+
+def _entry(spent, projected, level, budgeted):
+    projected = int(round(projected))
+    return {
+        **money.fields(spent=int(round(spent)), projected=projected, daily_rate=int(round(level)), budgeted=budgeted),
+        'over_budget': None if budgeted is None else projected > budgeted,
+    }
+
+
+def get(user_id, today=None):
+    """Projected end-of-month spend per category and in total for the current month."""
+    today = today or date.today()
+    user_id = int(user_id)
+    daily, names, start, alpha, level, _, _ = _models(user_id, today, _states(user_id))
+
+    month_start, month_end = month_bounds(today.year, today.month)
+    month = daily[(month_start - start).days:]
+    spent = month.sum(axis=0)
+    spent_today = month[today.day - 1]
+    remaining_days = (month_end - today).days - 1
+    projected = spent + np.maximum(level - spent_today, 0) + level * remaining_days
+
+    budgets = {b.category or None: b.amount for b in Budget.query.filter_by(
+        user_id=user_id, year=today.year, month=today.month)}
+    index = {name: i for i, name in enumerate(names)}
+    categories = {name for name in names if level[index[name]] or spent[index[name]]} | {name for name in budgets if name}
+    entries = []
+    for name in categories:
+        i = index.get(name)
+        values = (spent[i], projected[i], level[i]) if i is not None else (0, 0, 0)
+        entries.append({'category': name, **_entry(*values, budgets.get(name))})
+    entries.sort(key=lambda entry: (-entry['projected'], entry['category']))
+
+    return {
+        'month': f'{today.year}-{today.month:02d}',
+        'days_remaining': remaining_days,
+        'total': _entry(spent.sum(), projected.sum(), level.sum(), budgets.get(None)),
+        'categories': entries,
+    }
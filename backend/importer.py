@@ -0,0 +1,192 @@
+"""Bulk import of bank statements (CSV or OFX).
+
+The uploaded file is parsed as a stream, rows are inserted with one
+executemany per chunk (plus the matching rollup deltas), and each chunk
+is committed on its own. A failing chunk stops the import with a
+partial result that says which rows were committed. Rows that match an existing entry on
+(date, amount, category/source, notes) are skipped using a fingerprint
+set loaded with one query per table.
+"""
+import csv
+import io
+import re
+from datetime import datetime
+
+from extensions import db
+from models import Transaction, Income
+import rollups
+from rollups import EXPENSE, INCOME
+import achievements
+from money import to_minor
+
+CHUNK_SIZE = 1000
+
+_MODELS = {EXPENSE: Transaction, INCOME: Income}
+_OFX_TAG = re.compile(r'<(/?)([A-Za-z0-9.]+)>([^<]*)')
+
+
+def _fingerprint(kind, day, amount, label, notes):
+    return kind, day, int(amount), label or '', notes or ''
+
+
+def _existing_fingerprints(user_id):
+    """Fingerprints of every entry the user already has (one query per table)."""
+    seen = set()
+    for kind, model in _MODELS.items():
+        label = model.category if kind == EXPENSE else model.source
+        rows = db.session.query(model.date, model.amount, label, model.notes).filter(model.user_id == user_id)
+        seen.update(_fingerprint(kind, *row) for row in rows)
+    return seen
+
+
+# =============================================
+# PARSERS (yield (row_number, fields) pairs)
+# =============================================
+
+def parse_csv(stream):
+    """Rows from a CSV with a ``date`` and ``amount`` column.
+
+    Also understands the columns written by /export (``kind``, ``category``,
+    ``source``, ``payment_method``, ``notes``, ``other_source``). Without a
+    ``kind`` column, negative amounts are expenses and positive are income.
+    """
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='')
+    reader = csv.DictReader(text)
+    for number, row in enumerate(reader, start=1):
+        yield number, {(k or '').strip().lower(): (v or '').strip() for k, v in row.items()}
+
+
+def parse_ofx(stream):
+    """Rows from the <STMTTRN> blocks of an OFX/QFX statement (SGML or XML)."""
+    text = io.TextIOWrapper(stream, encoding='utf-8', errors='replace')
+    number, current = 0, None
+    for line in text:
+        for closing, tag, value in _OFX_TAG.findall(line):
+            tag = tag.upper()
+            if tag == 'STMTTRN':
+                if closing and current is not None:
+                    number += 1
+                    yield number, current
+                current = None if closing else {}
+            elif current is not None and not closing:
+                current[tag] = value.strip()
+
+
+def _ofx_fields(row):
+    posted = row.get('DTPOSTED', '')[:8]
+    return {
+        'date': f'{posted[:4]}-{posted[4:6]}-{posted[6:8]}' if len(posted) == 8 else '',
+        'amount': row.get('TRNAMT', ''),
+        'notes': row.get('MEMO') or row.get('NAME', ''),
+        'other_source': row.get('NAME', '') if row.get('MEMO') else '',
+    }
+
+
+# =============================================
+# IMPORT
+# =============================================
+
+def _to_entry(user_id, fields, defaults):
+    """Convert parsed fields into (kind, column dict). Raises ValueError on bad rows."""
+    if not fields.get('date') or not fields.get('amount'):
+        raise ValueError('date and amount are required')
+    day = datetime.strptime(fields['date'], '%Y-%m-%d').date()
+    amount = to_minor(fields['amount'])
+
+    kind = fields.get('kind') or (EXPENSE if amount < 0 else INCOME)
+    if kind not in (EXPENSE, INCOME):
+        raise ValueError(f'unknown kind: {kind}')
+
+    row = {
+        'user_id': user_id,
+        'amount': abs(amount),
+        'date': day,
+        'payment_method': fields.get('payment_method') or defaults['payment_method'],
+        'notes': fields.get('notes') or fields.get('description', ''),
+        'other_source': fields.get('other_source', ''),
+    }
+    if kind == EXPENSE:
+        row['category'] = fields.get('category') or defaults['category']
+    else:
+        row['source'] = fields.get('source') or defaults['source']
+    return kind, row
+
+
+def _flush(user_id, pending):
+    deltas = rollups.new_deltas()
+    events = []
+    for kind, rows in pending.items():
+        make_event = achievements.expense_event if kind == EXPENSE else achievements.income_event
+        if rows:
+            db.session.execute(db.insert(_MODELS[kind]), rows)
+            for row in rows:
+                rollups.collect_row(deltas, kind, row)
+                events.append(make_event(row['date'], row['amount'], created=True))
+    rollups.apply_deltas(deltas)
+    achievements.record(user_id, sorted(events, key=lambda e: e.day))
+    db.session.commit()
+    pending[EXPENSE].clear()
+    pending[INCOME].clear()
+
+
+def import_statement(user_id, stream, file_format, defaults):
+    """Import a statement stream. Returns the per-row results and counts.
+
+    If a chunk cannot be committed (or the file cannot be read further),
+    the import stops. Earlier chunks stay committed. The result then also
+    has ``error`` and ``failed_rows``, the first and last row of the
+    chunk that was rolled back. That chunk's rows are reported as
+    ``failed``, and rows after it were not read.
+    """
+    user_id = int(user_id)
+    if file_format == 'ofx':
+        parsed = ((n, _ofx_fields(row)) for n, row in parse_ofx(stream))
+    else:
+        parsed = parse_csv(stream)
+
+    seen = _existing_fingerprints(user_id)
+    pending = {EXPENSE: [], INCOME: []}
+    results = []
+    counts = {'imported': 0, 'duplicate': 0, 'error': 0, 'failed': 0}
+    chunk_start = 0  # index in results of the first row of the uncommitted chunk
+
+    try:
+        for number, fields in parsed:
+            try:
+                kind, row = _to_entry(user_id, fields, defaults)
+            except ValueError as e:
+                results.append({'row': number, 'status': 'error', 'error': str(e)})
+                counts['error'] += 1
+                continue
+
+            label = row['category'] if kind == EXPENSE else row['source']
+            fingerprint = _fingerprint(kind, row['date'], row['amount'], label, row['notes'])
+            if fingerprint in seen:
+                results.append({'row': number, 'status': 'duplicate'})
+                counts['duplicate'] += 1
+                continue
+
+            seen.add(fingerprint)
+            pending[kind].append(row)
+            results.append({'row': number, 'status': 'imported', 'kind': kind})
+            counts['imported'] += 1
+            if len(pending[EXPENSE]) + len(pending[INCOME]) >= CHUNK_SIZE:
+                _flush(user_id, pending)
+                chunk_start = len(results)
+
+        _flush(user_id, pending)
+    except Exception as e:
+        db.session.rollback()
+        chunk = results[chunk_start:]
+        for result in chunk:
+            if result['status'] == 'imported':
+                result.update(status='failed')
+                counts['imported'] -= 1
+                counts['failed'] += 1
+        return {
+            'summary': counts,
+            'results': results,
+            'error': f'Import stopped: {e}',
+            'failed_rows': [chunk[0]['row'], chunk[-1]['row']] if chunk else None,
+        }
+    return {'summary': counts, 'results': results}
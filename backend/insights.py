@@ -0,0 +1,184 @@
+"""Financial insights, precomputed per user-month.
+
+Insights for a month are built once from ``PeriodAggregates`` and stored
+in ``insight_snapshots``, so ``/financial-insights`` is a single
+primary-key read that never writes. Writes that touch a month (rollup
+deltas, budgets) mark its snapshot stale and queue the
+``insights.refresh_stale`` job for it; until that runs, reads serve the
+stale snapshot. The same job also runs periodically for the current
+month of active users, which creates their missing snapshots.
+"""
+from datetime import datetime, timezone
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import InsightSnapshot, MonthlyRollup
+from aggregates import PeriodAggregates
+from rollups import EXPENSE, INCOME
+from jobs import task, periodic
+from replicas import replicas
+from cache import response_cache
+from money import format_major
+
+
+def build(aggregates):
+    """Insight cards for the month of ``aggregates``."""
+    insights = []
+
+    # Calculate totals
+    total_income = aggregates.total(INCOME)
+    total_expenses = aggregates.total(EXPENSE)
+
+    # 1. Savings rate
+    if total_income > 0:
+        savings_rate = ((total_income - total_expenses) / total_income) * 100
+        if savings_rate >= 20:
+            insights.append({
+                'type': 'positive',
+                'title': 'Great Savings Rate!',
+                'description': f'You\'re saving {savings_rate:.1f}% of your income this month. That\'s excellent financial health!'
+            })
+        elif savings_rate >= 0:
+            insights.append({
+                'type': 'suggestion',
+                'title': 'Room for Improvement',
+                'description': f'Your savings rate is {savings_rate:.1f}%. Try to save at least 20% of your income for financial security.'
+            })
+        else:
+            insights.append({
+                'type': 'warning',
+                'title': 'Spending Exceeds Income',
+                'description': f'You\'ve spent ₹{format_major(abs(total_income - total_expenses))} more than your income this month. Consider reducing expenses.'
+            })
+
+    # 2. Top expense category
+    category_totals = aggregates.by_category(EXPENSE)
+    if category_totals:
+        top_category, top_total = max(category_totals.items(), key=lambda item: item[1])
+        category_percentage = (top_total / total_expenses * 100) if total_expenses > 0 else 0
+        insights.append({
+            'type': 'information',
+            'title': f'Top Spending: {top_category}',
+            'description': f'{top_category} is your highest expense category at ₹{format_major(top_total)} ({category_percentage:.1f}% of total expenses).'
+        })
+
+    # 3. Monthly comparison with previous month
+    prev_expenses = aggregates.total(EXPENSE, previous=True)
+
+    if prev_expenses > 0 and total_expenses > 0:
+        change = ((total_expenses - prev_expenses) / prev_expenses) * 100
+        if change > 15:
+            insights.append({
+                'type': 'warning',
+                'title': 'Spending Increased',
+                'description': f'Your spending increased by {change:.1f}% compared to last month. Review your expenses to identify areas to cut back.'
+            })
+        elif change < -10:
+            insights.append({
+                'type': 'positive',
+                'title': 'Spending Decreased',
+                'description': f'Great job! Your spending decreased by {abs(change):.1f}% compared to last month.'
+            })
+
+    # 4. Budget adherence insight
+    evaluations = aggregates.budget_evaluations()
+    if evaluations:
+        on_track = sum(1 for e in evaluations if e['spent'] <= e['budget'].amount)
+        insights.append({
+            'type': 'positive' if on_track == len(evaluations) else 'suggestion',
+            'title': 'Budget Adherence',
+            'description': f'You\'re on track with {on_track} out of {len(evaluations)} budgets this month.'
+        })
+
+    # 5. If no data yet
+    if not insights:
+        insights.append({
+            'type': 'information',
+            'title': 'Start Tracking',
+            'description': 'Add income and expenses to get personalized financial insights and recommendations.'
+        })
+
+    return insights
+
+
+def refresh(user_id, year, month):
+    """Recompute and store one snapshot. Commits; returns the insights."""
+    replicas.use_primary()  # the generation check needs the primary's view of the row
+    user_id = int(user_id)
+    row = db.session.get(InsightSnapshot, (user_id, year, month))
+    if row is None:
+        # Create the row first so writes landing while we compute can invalidate it
+        try:
+            with db.session.begin_nested():
+                row = InsightSnapshot(user_id=user_id, year=year, month=month, insights=[], stale=True, generation=0)
+                db.session.add(row)
+        except IntegrityError:
+            row = db.session.get(InsightSnapshot, (user_id, year, month))
+    generation = row.generation
+    db.session.commit()
+
+    result = build(PeriodAggregates(user_id, year, month))
+
+    # Only store the result if no write invalidated the snapshot in the meantime
+    InsightSnapshot.query.filter_by(user_id=user_id, year=year, month=month, generation=generation).update({
+        InsightSnapshot.insights: result,
+        InsightSnapshot.stale: False,
+        InsightSnapshot.computed_at: datetime.now(timezone.utc)
+    }, synchronize_session=False)
+    db.session.commit()
+    return result
+
+
+def get(user_id, year, month, aggregates=None):
+    """Insights for a user-month from its stored snapshot, stale or not. Never writes.
+
+    Without a computed snapshot they are built from ``aggregates`` (loaded if
+    not given) and not stored.
+    """
+    row = db.session.get(InsightSnapshot, (int(user_id), year, month))
+    if row is not None and row.computed_at is not None:
+        return row.insights
+    return build(aggregates or PeriodAggregates(user_id, year, month))
+
+
+@task('insights.refresh_stale')
+@periodic('insights.refresh_stale', 'INSIGHTS_REFRESH_SECONDS')
+def refresh_stale(year=None, month=None, user_id=None):
+    """Recompute stale or missing snapshots for a month (default: the current one).
+
+    Users are "active" when they have rollups in that month. Returns the
+    number of snapshots refreshed.
+    """
+    if year is None:
+        today = datetime.now()
+        year, month = today.year, today.month
+
+    active = db.session.query(MonthlyRollup.user_id).filter_by(year=year, month=month).distinct()
+    fresh = db.session.query(InsightSnapshot.user_id).filter_by(year=year, month=month, stale=False)
+    if user_id is not None:
+        active = active.filter_by(user_id=user_id)
+    user_ids = {uid for (uid,) in active} - {uid for (uid,) in fresh}
+    # Stale snapshots of users who deleted all of the month's entries still need a refresh
+    stale = db.session.query(InsightSnapshot.user_id).filter_by(year=year, month=month, stale=True)
+    if user_id is not None:
+        stale = stale.filter_by(user_id=user_id)
+    user_ids.update(uid for (uid,) in stale)
+
+    for uid in sorted(user_ids):
+        refresh(uid, year, month)
+        response_cache.bump(uid)
+    return len(user_ids)
+
+
+insights_cli = AppGroup('insights', help='Maintain the insight_snapshots table.')
+
+
+@insights_cli.command('refresh')
+@click.option('--user-id', type=int, default=None, help='Only refresh this user.')
+def refresh_command(user_id):
+    """Recompute stale or missing insight snapshots for the current month."""
+    count = refresh_stale(user_id=user_id)
+    click.echo(f'Refreshed {count} insight snapshots.')
@@ -0,0 +1,325 @@
+"""Background jobs: a persistent queue, worker threads and a periodic scheduler.
+
+Handlers call ``enqueue`` for work the user isn't waiting for. The job row
+is added to the caller's session, so it is committed (or rolled back)
+together with the request's own writes. Workers claim jobs with a
+conditional UPDATE, which works the same on SQLite and MySQL and lets any
+number of workers share the table. Failed jobs are retried with
+exponential backoff until ``max_attempts``.
+
+Tasks are registered with ``@task``; tasks that should run on a schedule
+also use ``@periodic`` with the config key holding their interval. The
+scheduler enqueues one job per interval slot, deduplicated across
+processes by ``unique_key``.
+
+``queue.init_app`` starts JOB_WORKER_THREADS worker threads (and the
+scheduler) with the first request; ``flask worker`` runs the same worker
+out of process.
+"""
+import random
+import threading
+import time
+import traceback
+import uuid
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta, timezone
+
+import click
+from flask import current_app
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Job
+from metrics import gauge_lines
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+TASKS = {}     # name -> (function, max_attempts)
+PERIODIC = {}  # name -> config key with the interval in seconds
+
+
+def task(name, max_attempts=5):
+    def decorator(func):
+        TASKS[name] = (func, max_attempts)
+        return func
+    return decorator
+
+
+def periodic(name, interval_config):
+    """Run task ``name`` every ``app.config[interval_config]`` seconds (0 disables it)."""
+    def decorator(func):
+        PERIODIC[name] = interval_config
+        return func
+    return decorator
+
+
+def _now():
+    return datetime.now(timezone.utc).replace(tzinfo=None)
+
+
+def enqueue(name, payload=None, unique_key=None, delay=0):
+    """Add a job to the current session. Does not commit.
+
+    Returns None if a job with the same ``unique_key`` already exists.
+    """
+    func, max_attempts = TASKS[name]
+    job = Job(name=name, payload=payload or {}, unique_key=unique_key, status=QUEUED,
+              max_attempts=max_attempts, run_at=_now() + timedelta(seconds=delay))
+    try:
+        with db.session.begin_nested():
+            db.session.add(job)
+    except IntegrityError:
+        return None
+    return job
+
+
+def enqueue_coalesced(name, key, payload, window_seconds):
+    """``enqueue`` at most once per ``key`` and ``window_seconds`` window. Does not commit.
+
+    The job runs when the window closes, so every caller within the window
+    is covered by it and a burst of writes is handled once.
+    """
+    now = time.time()
+    window = int(now // window_seconds)
+    return enqueue(name, payload, unique_key=f'{name}:{key}:{window}', delay=(window + 1) * window_seconds - now)
+
+
+def _backoff(attempts):
+    base = current_app.config['JOB_BACKOFF_SECONDS']
+    delay = min(base * 2 ** (attempts - 1), current_app.config['JOB_BACKOFF_MAX_SECONDS'])
+    return delay * (1 + random.random() * 0.1)
+
+
+def claim(worker_id):
+    """Atomically move the next due job to RUNNING. Returns its id, or None."""
+    now = _now()
+    candidates = db.session.query(Job.id).filter(
+        Job.status == QUEUED, Job.run_at <= now
+    ).order_by(Job.run_at, Job.id).limit(10).all()
+    db.session.commit()
+    for (job_id,) in candidates:
+        claimed = Job.query.filter_by(id=job_id, status=QUEUED).update({
+            Job.status: RUNNING,
+            Job.locked_by: worker_id,
+            Job.started_at: now,
+            Job.attempts: Job.attempts + 1
+        }, synchronize_session=False)
+        db.session.commit()
+        if claimed:
+            return job_id
+    return None
+
+
+def execute(job_id):
+    """Run a claimed job and record the outcome. Returns the job's new status."""
+    job = db.session.get(Job, job_id)
+    name, payload = job.name, dict(job.payload or {})
+    try:
+        if name not in TASKS:
+            raise LookupError(f'Unknown task: {name}')
+        TASKS[name][0](**payload)
+        job = db.session.get(Job, job_id)
+        job.status, job.finished_at, job.last_error = DONE, _now(), None
+    except Exception:
+        db.session.rollback()
+        current_app.logger.exception('Job %s (%s) failed', job_id, name)
+        job = db.session.get(Job, job_id)
+        job.last_error = traceback.format_exc()[-2000:]
+        if job.attempts < job.max_attempts:
+            job.status = QUEUED
+            job.run_at = _now() + timedelta(seconds=_backoff(job.attempts))
+        else:
+            job.status, job.finished_at = FAILED, _now()
+    db.session.commit()
+    return job.status
+
+
+def schedule_due(last_slots):
+    """Enqueue periodic tasks whose interval slot changed since the last call."""
+    now = time.time()
+    for name, interval_config in PERIODIC.items():
+        interval = current_app.config.get(interval_config, 0)
+        if interval <= 0:
+            continue
+        slot = int(now // interval)
+        if last_slots.get(name) != slot:
+            enqueue(name, unique_key=f'periodic:{name}:{slot}')
+            last_slots[name] = slot
+    db.session.commit()
+
+
+class Worker:
+    """Dispatcher thread that claims due jobs and runs them on a thread pool."""
+
+    def __init__(self, app, threads, scheduler=True, poll_seconds=1.0):
+        self.app = app
+        self.threads = threads
+        self.scheduler = scheduler
+        self.poll_seconds = poll_seconds
+        self.worker_id = uuid.uuid4().hex[:8]
+        self._slots = threading.BoundedSemaphore(threads)
+        self._stop = threading.Event()
+        self._pool = None
+        self._thread = None
+
+    def start(self):
+        self._pool = ThreadPoolExecutor(self.threads, thread_name_prefix='job-worker')
+        self._thread = threading.Thread(target=self._dispatch, name='job-dispatcher', daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        if self._pool is not None:
+            self._pool.shutdown(wait=wait)
+
+    def run_forever(self):
+        self.start()
+        try:
+            while self._thread.is_alive():
+                self._thread.join(1)
+        except KeyboardInterrupt:
+            self.stop()
+
+    def _dispatch(self):
+        last_slots = {}
+        while not self._stop.is_set():
+            with self.app.app_context():
+                try:
+                    if self.scheduler:
+                        schedule_due(last_slots)
+                    while self._slots.acquire(blocking=False):
+                        job_id = claim(self.worker_id)
+                        if job_id is None:
+                            self._slots.release()
+                            break
+                        self._pool.submit(self._execute, job_id)
+                except Exception:
+                    db.session.rollback()
+                    self.app.logger.exception('Job dispatcher error')
+            self._stop.wait(self.poll_seconds)
+
+    def _execute(self, job_id):
+        try:
+            with self.app.app_context():
+                started = time.monotonic()
+                job = db.session.get(Job, job_id)
+                wait = (job.started_at - job.run_at).total_seconds()
+                status = execute(job_id)
+                stats.record(status, wait, time.monotonic() - started)
+        finally:
+            self._slots.release()
+
+
+class JobStats:
+    """Counters for jobs run in this process plus queue depth read from the jobs table."""
+
+    def __init__(self, window=1000):
+        self.counts = {DONE: 0, FAILED: 0, QUEUED: 0}  # QUEUED here means "scheduled for retry"
+        self._waits = deque(maxlen=window)
+        self._durations = deque(maxlen=window)
+        self._lock = threading.Lock()
+
+    def record(self, status, wait, duration):
+        with self._lock:
+            self.counts[status] += 1
+            self._waits.append(wait)
+            self._durations.append(duration)
+
+    def snapshot(self):
+        now = _now()
+        depth = dict(db.session.query(Job.status, db.func.count(Job.id)).group_by(Job.status).all())
+        ready = db.session.query(db.func.count(Job.id), db.func.min(Job.run_at)).filter(
+            Job.status == QUEUED, Job.run_at <= now
+        ).one()
+        with self._lock:
+            waits, durations = list(self._waits), list(self._durations)
+            counts = dict(self.counts)
+        return {
+            'depth': {status: depth.get(status, 0) for status in (QUEUED, RUNNING, DONE, FAILED)},
+            'ready': ready[0],
+            'oldest_ready_age_seconds': round((now - ready[1]).total_seconds(), 3) if ready[1] else 0.0,
+            'processed': counts[DONE],
+            'failed': counts[FAILED],
+            'retried': counts[QUEUED],
+            'avg_wait_seconds': round(sum(waits) / len(waits), 3) if waits else 0.0,
+            'max_wait_seconds': round(max(waits), 3) if waits else 0.0,
+            'avg_run_seconds': round(sum(durations) / len(durations), 3) if durations else 0.0,
+        }
+
+    def metric_lines(self):
+        snapshot = self.snapshot()
+        lines = gauge_lines('spendsmart_jobs', 'Jobs in the table by status.', snapshot['depth'], label='status')
+        lines += gauge_lines('spendsmart_jobs_ready', 'Queued jobs that are due.', snapshot['ready'])
+        lines += gauge_lines('spendsmart_jobs_oldest_ready_age_seconds', 'Age of the oldest due job.',
+                             snapshot['oldest_ready_age_seconds'])
+        lines += gauge_lines('spendsmart_jobs_finished', 'Jobs finished by this process.',
+                             {'done': snapshot['processed'], 'failed': snapshot['failed'], 'retry': snapshot['retried']},
+                             label='outcome')
+        lines += gauge_lines('spendsmart_jobs_avg_wait_seconds', 'Average time from due to started.', snapshot['avg_wait_seconds'])
+        return lines
+
+
+stats = JobStats()
+
+
+class JobQueue:
+    def __init__(self):
+        self.worker = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('JOB_WORKER_THREADS', 2)
+        app.config.setdefault('JOB_BACKOFF_SECONDS', 5)
+        app.config.setdefault('JOB_BACKOFF_MAX_SECONDS', 3600)
+        app.config.setdefault('JOB_TIMEOUT_SECONDS', 900)
+        app.config.setdefault('JOB_RETENTION_DAYS', 7)
+        app.config.setdefault('JOB_MAINTENANCE_SECONDS', 300)
+        # Threads start with the first request so CLI commands (db upgrade, ...) never spawn them
+        if app.config['JOB_WORKER_THREADS'] > 0:
+            app.before_request(lambda: self.start(app))
+
+    def start(self, app):
+        with self._lock:
+            if self.worker is None:
+                self.worker = Worker(app, app.config['JOB_WORKER_THREADS'])
+                self.worker.start()
+
+
+queue = JobQueue()
+
+
+@task('jobs.maintenance')
+@periodic('jobs.maintenance', 'JOB_MAINTENANCE_SECONDS')
+def maintenance():
+    """Requeue jobs whose worker died mid-run and delete old finished jobs."""
+    now = _now()
+    timeout = timedelta(seconds=current_app.config['JOB_TIMEOUT_SECONDS'])
+    Job.query.filter(Job.status == RUNNING, Job.started_at < now - timeout).update(
+        {Job.status: QUEUED, Job.run_at: now}, synchronize_session=False
+    )
+    retention = timedelta(days=current_app.config['JOB_RETENTION_DAYS'])
+    Job.query.filter(Job.status.in_([DONE, FAILED]), Job.finished_at < now - retention).delete(
+        synchronize_session=False
+    )
+    db.session.commit()
+
+
+@click.command('worker')
+@click.option('--threads', type=int, default=None, help='Worker threads (default: JOB_WORKER_THREADS).')
+@click.option('--no-scheduler', is_flag=True, help='Only run jobs; do not enqueue periodic tasks.')
+def worker_command(threads, no_scheduler):
+    """Run background job workers in the foreground."""
+    app = current_app._get_current_object()
+    if app.config.get('RESPONSE_CACHE_BACKEND', 'memory') == 'memory':
+        # Jobs bump users' cache versions; a per-process backend would only bump this process
+        raise click.UsageError('flask worker needs a shared response cache: '
+                               'set RESPONSE_CACHE_BACKEND=redis (or none)')
+    threads = threads or app.config['JOB_WORKER_THREADS'] or 1
+    click.echo(f'Starting {threads} job worker threads (scheduler {"off" if no_scheduler else "on"}).')
+    Worker(app, threads, scheduler=not no_scheduler).run_forever()
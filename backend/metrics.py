@@ -0,0 +1,168 @@
+"""Request and SQL metrics in Prometheus text format.
+
+Flask request hooks time each request; SQLAlchemy cursor events on every
+engine (primary and replicas) count the statements, time and rows of the
+request that issued them. Everything is aggregated in process memory per
+(endpoint, method, status class) and served at ``/metrics``. Recording a
+request costs a few dictionary updates under one lock.
+
+Rows are what the DB driver reports as ``rowcount``: rows affected for
+DML, and rows returned for SELECTs on MySQL (buffered cursors). SQLite
+does not report it for SELECTs. Streamed responses (``/api/export``) are
+timed up to the first byte and their size is not recorded.
+"""
+import threading
+import time
+from bisect import bisect_left
+
+from flask import Response, current_app, g, has_app_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+SIZE_BUCKETS = (256, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304)
+
+
+class Histogram:
+    def __init__(self, name, help, buckets):
+        self.name = name
+        self.help = help
+        self.buckets = buckets
+        self.series = {}  # labels tuple -> [per-bucket counts..., +Inf count, sum]
+
+    def observe(self, labels, value):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+        series[bisect_left(self.buckets, value)] += 1
+        series[-1] += value
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} histogram']
+        for labels, series in sorted(self.series.items()):
+            base = ','.join(f'{k}="{v}"' for k, v in zip(label_names, labels))
+            cumulative = 0
+            for bound, count in zip(self.buckets, series):
+                cumulative += count
+                lines.append(f'{self.name}_bucket{{{base},le="{bound}"}} {cumulative}')
+            cumulative += series[len(self.buckets)]
+            lines.append(f'{self.name}_bucket{{{base},le="+Inf"}} {cumulative}')
+            lines.append(f'{self.name}_sum{{{base}}} {series[-1]}')
+            lines.append(f'{self.name}_count{{{base}}} {cumulative}')
+        return lines
+
+
+class Counter:
+    def __init__(self, name, help):
+        self.name = name
+        self.help = help
+        self.series = {}
+
+    def inc(self, labels, value=1):
+        self.series[labels] = self.series.get(labels, 0) + value
+
+    def render(self, label_names):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} counter']
+        for labels, value in sorted(self.series.items()):
+            base = ','.join(f'{k}="{v}"' for k, v in zip(label_names, labels))
+            lines.append(f'{self.name}{{{base}}} {value}')
+        return lines
+
+
+REQUEST_LABELS = ('endpoint', 'method', 'status')
+
+
+class RequestMetrics:
+    def __init__(self):
+        self.latency = Histogram('spendsmart_request_duration_seconds', 'Request latency.', LATENCY_BUCKETS)
+        self.sql_statements = Histogram('spendsmart_request_sql_statements', 'SQL statements per request.', COUNT_BUCKETS)
+        self.sql_seconds = Histogram('spendsmart_request_sql_seconds', 'Time spent in SQL per request.', LATENCY_BUCKETS)
+        self.response_bytes = Histogram('spendsmart_response_size_bytes', 'Response body size.', SIZE_BUCKETS)
+        self.sql_rows = Counter('spendsmart_sql_rows_total', 'Rows returned or affected, as reported by the DB driver.')
+        self.collectors = []
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('METRICS_ENABLED', True)
+        if not app.config['METRICS_ENABLED']:
+            return
+        app.before_request(self._start)
+        app.after_request(self._finish)
+        app.add_url_rule('/metrics', 'metrics', self.serve)
+        for name, listener in (('before_cursor_execute', _before_cursor_execute),
+                               ('after_cursor_execute', _after_cursor_execute),
+                               ('handle_error', _handle_error)):
+            if not event.contains(Engine, name, listener):
+                event.listen(Engine, name, listener)
+
+    def add_collector(self, collect):
+        """Register a function returning extra exposition lines, evaluated at scrape time."""
+        self.collectors.append(collect)
+
+    def _start(self):
+        g.metrics = [time.perf_counter(), 0, 0.0, 0]  # start, statements, SQL seconds, rows
+
+    def _finish(self, response):
+        state = g.pop('metrics', None)
+        if state is None:
+            return response
+        start, statements, sql_seconds, rows = state
+        labels = (request.endpoint or 'unmatched', request.method, f'{response.status_code // 100}xx')
+        size = None if response.is_streamed else response.calculate_content_length()
+        with self._lock:
+            self.latency.observe(labels, time.perf_counter() - start)
+            self.sql_statements.observe(labels, statements)
+            self.sql_seconds.observe(labels, sql_seconds)
+            if size is not None:
+                self.response_bytes.observe(labels, size)
+            if rows:
+                self.sql_rows.inc(labels, rows)
+        return response
+
+    def render(self):
+        with self._lock:
+            lines = []
+            for metric in (self.latency, self.sql_statements, self.sql_seconds, self.response_bytes, self.sql_rows):
+                lines.extend(metric.render(REQUEST_LABELS))
+        for collect in self.collectors:
+            try:
+                lines.extend(collect())
+            except Exception:
+                current_app.logger.exception('Metrics collector failed')
+        return '\n'.join(lines) + '\n'
+
+    def serve(self):
+        return Response(self.render(), mimetype='text/plain; version=0.0.4')
+
+
+metrics = RequestMetrics()
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('metrics_start', []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    elapsed = time.perf_counter() - conn.info['metrics_start'].pop()
+    state = g.get('metrics') if has_app_context() else None
+    if state is not None:
+        state[1] += 1
+        state[2] += elapsed
+        if cursor.rowcount > 0:
+            state[3] += cursor.rowcount
+
+
+def _handle_error(context):
+    if context.connection is not None and context.connection.info.get('metrics_start'):
+        context.connection.info['metrics_start'].pop()
+
+
+def gauge_lines(name, help, values, label=None):
+    """Exposition lines for a gauge; ``values`` is a number or, with ``label``, a {label value: number} dict."""
+    lines = [f'# HELP {name} {help}', f'# TYPE {name} gauge']
+    if label is None:
+        lines.append(f'{name} {values}')
+    else:
+        lines.extend(f'{name}{{{label}="{key}"}} {value}' for key, value in sorted(values.items()))
+    return lines
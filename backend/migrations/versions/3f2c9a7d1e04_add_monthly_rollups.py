@@ -0,0 +1,51 @@
+"""Add monthly_rollups table
+
+Revision ID: 3f2c9a7d1e04
+Revises: 6b1790d22f0b
+Create Date: 2026-10-18 09:12:31.402117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3f2c9a7d1e04'
+down_revision = '6b1790d22f0b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    rollups = op.create_table('monthly_rollups',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('category', sa.String(length=100), nullable=False),
+    sa.Column('payment_method', sa.String(length=50), nullable=False),
+    sa.Column('sum', sa.Float(), nullable=False),
+    sa.Column('count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id'),
+    sa.UniqueConstraint('user_id', 'year', 'month', 'kind', 'category', 'payment_method', name='uq_monthly_rollups_bucket')
+    )
+
+    # Backfill from existing history (same aggregation as `flask rollups rebuild`)
+    for kind, table, category in (('expense', 'transactions', 'category'), ('income', 'incomes', 'source')):
+        raw = sa.table(table,
+            sa.column('id'), sa.column('user_id'), sa.column('date', sa.Date()), sa.column(category),
+            sa.column('payment_method'), sa.column('amount'))
+        year = sa.extract('year', raw.c.date)
+        month = sa.extract('month', raw.c.date)
+        select = sa.select(
+            raw.c.user_id, year, month, sa.literal(kind), raw.c[category], raw.c.payment_method,
+            sa.func.sum(raw.c.amount), sa.func.count(raw.c.id)
+        ).group_by(raw.c.user_id, year, month, raw.c[category], raw.c.payment_method)
+        op.execute(rollups.insert().from_select(
+            ['user_id', 'year', 'month', 'kind', 'category', 'payment_method', 'sum', 'count'], select))
+
+
+def downgrade():
+    op.drop_table('monthly_rollups')
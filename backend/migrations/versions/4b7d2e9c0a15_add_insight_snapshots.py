@@ -0,0 +1,34 @@
+"""Add insight_snapshots table
+
+Revision ID: 4b7d2e9c0a15
+Revises: e1a94c27d6b3
+Create Date: 2026-10-18 15:41:07.218934
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4b7d2e9c0a15'
+down_revision = 'e1a94c27d6b3'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('insight_snapshots',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('year', sa.Integer(), nullable=False),
+    sa.Column('month', sa.Integer(), nullable=False),
+    sa.Column('insights', sa.JSON(), nullable=False),
+    sa.Column('stale', sa.Boolean(), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.Column('computed_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'year', 'month')
+    )
+
+
+def downgrade():
+    op.drop_table('insight_snapshots')
@@ -0,0 +1,79 @@
+"""Store money as integer minor units
+
+Revision ID: 7c2d5f8a1b36
+Revises: 9e3c51f0b8d2
+Create Date: 2026-10-18 22:05:43.611028
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7c2d5f8a1b36'
+down_revision = '9e3c51f0b8d2'
+branch_labels = None
+depends_on = None
+
+# table -> [(column, nullable)]
+MONEY_COLUMNS = {
+    'users': [('account_balance', True)],
+    'transactions': [('amount', False)],
+    'incomes': [('amount', False)],
+    'budgets': [('amount', False)],
+    'saving_goals': [('target_amount', False), ('current_amount', True)],
+}
+
+
+def _rebuild_rollups():
+    # Re-aggregated from the converted rows rather than converting the float sums, so totals are exact
+    op.execute('DELETE FROM monthly_rollups')
+    rollups = sa.table('monthly_rollups',
+        sa.column('user_id'), sa.column('year'), sa.column('month'), sa.column('kind'),
+        sa.column('category'), sa.column('payment_method'), sa.column('sum'), sa.column('count'))
+    for kind, table, category in (('expense', 'transactions', 'category'), ('income', 'incomes', 'source')):
+        raw = sa.table(table,
+            sa.column('id'), sa.column('user_id'), sa.column('date', sa.Date()), sa.column(category),
+            sa.column('payment_method'), sa.column('amount'))
+        year = sa.extract('year', raw.c.date)
+        month = sa.extract('month', raw.c.date)
+        select = sa.select(
+            raw.c.user_id, year, month, sa.literal(kind), raw.c[category], raw.c.payment_method,
+            sa.func.sum(raw.c.amount), sa.func.count(raw.c.id)
+        ).group_by(raw.c.user_id, year, month, raw.c[category], raw.c.payment_method)
+        op.execute(rollups.insert().from_select(
+            ['user_id', 'year', 'month', 'kind', 'category', 'payment_method', 'sum', 'count'], select))
+
+
+def _invalidate_derived_state():
+    # Cached insight texts and the Perfect Month running totals were computed from float major units
+    op.execute('UPDATE insight_snapshots SET stale = 1, generation = generation + 1')
+    op.execute("DELETE FROM achievement_states WHERE rule = 'perfect_month'")
+
+
+def upgrade():
+    for table, columns in MONEY_COLUMNS.items():
+        for column, _ in columns:
+            op.execute(f'UPDATE {table} SET {column} = ROUND({column} * 100) WHERE {column} IS NOT NULL')
+        with op.batch_alter_table(table) as batch_op:
+            for column, nullable in columns:
+                batch_op.alter_column(column, existing_type=sa.Float(), type_=sa.BigInteger(), existing_nullable=nullable)
+
+    with op.batch_alter_table('monthly_rollups') as batch_op:
+        batch_op.alter_column('sum', existing_type=sa.Float(), type_=sa.BigInteger(), existing_nullable=False)
+    _rebuild_rollups()
+    _invalidate_derived_state()
+
+
+def downgrade():
+    for table, columns in MONEY_COLUMNS.items():
+        with op.batch_alter_table(table) as batch_op:
+            for column, nullable in columns:
+                batch_op.alter_column(column, existing_type=sa.BigInteger(), type_=sa.Float(), existing_nullable=nullable)
+        for column, _ in columns:
+            op.execute(f'UPDATE {table} SET {column} = {column} / 100.0 WHERE {column} IS NOT NULL')
+
+    with op.batch_alter_table('monthly_rollups') as batch_op:
+        batch_op.alter_column('sum', existing_type=sa.BigInteger(), type_=sa.Float(), existing_nullable=False)
+    _rebuild_rollups()
+    _invalidate_derived_state()
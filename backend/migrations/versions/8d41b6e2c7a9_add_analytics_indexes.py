@@ -0,0 +1,34 @@
+"""Add composite indexes for analytics queries
+
+Revision ID: 8d41b6e2c7a9
+Revises: 3f2c9a7d1e04
+Create Date: 2026-10-18 10:05:47.218364
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d41b6e2c7a9'
+down_revision = '3f2c9a7d1e04'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_transactions_user_date', 'transactions', ['user_id', 'date'], unique=False)
+    op.create_index('ix_transactions_user_category_date', 'transactions', ['user_id', 'category', 'date'], unique=False)
+    op.create_index('ix_transactions_user_payment_method_date', 'transactions', ['user_id', 'payment_method', 'date'], unique=False)
+    op.create_index('ix_incomes_user_date', 'incomes', ['user_id', 'date'], unique=False)
+    op.create_index('ix_incomes_user_source_date', 'incomes', ['user_id', 'source', 'date'], unique=False)
+    op.create_index('ix_incomes_user_payment_method_date', 'incomes', ['user_id', 'payment_method', 'date'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_incomes_user_payment_method_date', table_name='incomes')
+    op.drop_index('ix_incomes_user_source_date', table_name='incomes')
+    op.drop_index('ix_incomes_user_date', table_name='incomes')
+    op.drop_index('ix_transactions_user_payment_method_date', table_name='transactions')
+    op.drop_index('ix_transactions_user_category_date', table_name='transactions')
+    op.drop_index('ix_transactions_user_date', table_name='transactions')
@@ -0,0 +1,32 @@
+"""Replace user/date indexes with covering indexes for trend reports
+
+Revision ID: a3f8c61d2e47
+Revises: 7c2d5f8a1b36
+Create Date: 2026-10-18 23:40:12.504117
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a3f8c61d2e47'
+down_revision = '7c2d5f8a1b36'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_transactions_user_date_totals', 'transactions',
+                    ['user_id', 'date', 'category', 'payment_method', 'amount'], unique=False)
+    op.create_index('ix_incomes_user_date_totals', 'incomes',
+                    ['user_id', 'date', 'source', 'payment_method', 'amount'], unique=False)
+    op.drop_index('ix_transactions_user_date', table_name='transactions')
+    op.drop_index('ix_incomes_user_date', table_name='incomes')
+
+
+def downgrade():
+    op.create_index('ix_incomes_user_date', 'incomes', ['user_id', 'date'], unique=False)
+    op.create_index('ix_transactions_user_date', 'transactions', ['user_id', 'date'], unique=False)
+    op.drop_index('ix_incomes_user_date_totals', table_name='incomes')
+    op.drop_index('ix_transactions_user_date_totals', table_name='transactions')
@@ -0,0 +1,54 @@
+"""Add recurring_rules and link transactions/incomes to the rule that created them
+
+Revision ID: b8e4d2a61f57
+Revises: f2a7c9d04b18
+Create Date: 2026-10-19 14:05:41.392618
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8e4d2a61f57'
+down_revision = 'f2a7c9d04b18'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('recurring_rules',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('kind', sa.String(length=10), nullable=False),
+    sa.Column('label', sa.String(length=100), nullable=False),
+    sa.Column('amount', sa.BigInteger(), nullable=False),
+    sa.Column('payment_method', sa.String(length=50), nullable=False),
+    sa.Column('notes', sa.String(length=255), nullable=True),
+    sa.Column('frequency', sa.String(length=10), nullable=False),
+    sa.Column('interval', sa.Integer(), nullable=False),
+    sa.Column('start_date', sa.Date(), nullable=False),
+    sa.Column('until', sa.Date(), nullable=True),
+    sa.Column('next_date', sa.Date(), nullable=True),
+    sa.Column('last_date', sa.Date(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_recurring_rules_next_date', 'recurring_rules', ['next_date'], unique=False)
+    op.create_index('ix_recurring_rules_user_id', 'recurring_rules', ['user_id'], unique=False)
+
+    # Plain columns and indexes only: adding a constraint on SQLite means copying the table,
+    # which would also drop its search triggers
+    for table in ('transactions', 'incomes'):
+        op.add_column(table, sa.Column('recurring_rule_id', sa.Integer(), nullable=True))
+        op.create_index(f'uq_{table}_recurring_rule_date', table, ['recurring_rule_id', 'date'], unique=True)
+
+
+def downgrade():
+    for table in ('incomes', 'transactions'):
+        op.drop_index(f'uq_{table}_recurring_rule_date', table_name=table)
+        op.drop_column(table, 'recurring_rule_id')
+    op.drop_index('ix_recurring_rules_user_id', table_name='recurring_rules')
+    op.drop_index('ix_recurring_rules_next_date', table_name='recurring_rules')
+    op.drop_table('recurring_rules')
@@ -0,0 +1,28 @@
+"""Add dedup_key to notifications
+
+Revision ID: c5e07a3b9f12
+Revises: 8d41b6e2c7a9
+Create Date: 2026-10-18 11:40:03.915820
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c5e07a3b9f12'
+down_revision = '8d41b6e2c7a9'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('dedup_key', sa.String(length=191), nullable=True))
+        batch_op.create_unique_constraint('uq_notifications_user_dedup_key', ['user_id', 'dedup_key'])
+
+
+def downgrade():
+    with op.batch_alter_table('notifications', schema=None) as batch_op:
+        batch_op.drop_constraint('uq_notifications_user_dedup_key', type_='unique')
+        batch_op.drop_column('dedup_key')
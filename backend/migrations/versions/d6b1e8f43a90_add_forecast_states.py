@@ -0,0 +1,36 @@
+"""Add forecast_states table
+
+Revision ID: d6b1e8f43a90
+Revises: a3f8c61d2e47
+Create Date: 2026-10-19 09:12:36.845201
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd6b1e8f43a90'
+down_revision = 'a3f8c61d2e47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('forecast_states',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('category', sa.String(length=100), nullable=False),
+    sa.Column('alpha', sa.Float(), nullable=False),
+    sa.Column('level', sa.Float(), nullable=False),
+    sa.Column('through', sa.Date(), nullable=False),
+    sa.Column('folded', sa.BigInteger(), nullable=False),
+    sa.Column('stale', sa.Boolean(), nullable=False),
+    sa.Column('generation', sa.Integer(), nullable=False),
+    sa.Column('fitted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'category')
+    )
+
+
+def downgrade():
+    op.drop_table('forecast_states')
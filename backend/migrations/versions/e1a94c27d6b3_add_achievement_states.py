@@ -0,0 +1,32 @@
+"""Add achievement_states table
+
+Revision ID: e1a94c27d6b3
+Revises: c5e07a3b9f12
+Create Date: 2026-10-18 13:02:18.660471
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e1a94c27d6b3'
+down_revision = 'c5e07a3b9f12'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('achievement_states',
+    sa.Column('user_id', sa.Integer(), nullable=False),
+    sa.Column('rule', sa.String(length=50), nullable=False),
+    sa.Column('state', sa.JSON(), nullable=False),
+    sa.ForeignKeyConstraint(['user_id'], ['users.id'], ),
+    sa.PrimaryKeyConstraint('user_id', 'rule')
+    )
+    op.create_index('ix_achievements_user_date_earned', 'achievements', ['user_id', 'date_earned'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_achievements_user_date_earned', table_name='achievements')
+    op.drop_table('achievement_states')
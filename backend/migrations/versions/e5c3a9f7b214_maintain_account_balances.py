@@ -0,0 +1,36 @@
+"""Maintain account balance and lifetime totals on users
+
+Revision ID: e5c3a9f7b214
+Revises: b8e4d2a61f57
+Create Date: 2026-10-19 16:48:12.207935
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5c3a9f7b214'
+down_revision = 'b8e4d2a61f57'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('users', sa.Column('total_income', sa.BigInteger(), nullable=False, server_default='0'))
+    op.add_column('users', sa.Column('total_expenses', sa.BigInteger(), nullable=False, server_default='0'))
+
+    # account_balance was never written; start every user from their full history
+    op.execute('UPDATE users SET '
+               'total_income = (SELECT COALESCE(SUM(amount), 0) FROM incomes WHERE incomes.user_id = users.id), '
+               'total_expenses = (SELECT COALESCE(SUM(amount), 0) FROM transactions WHERE transactions.user_id = users.id)')
+    op.execute('UPDATE users SET account_balance = total_income - total_expenses')
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('account_balance', existing_type=sa.BigInteger(), nullable=False)
+
+
+def downgrade():
+    with op.batch_alter_table('users') as batch_op:
+        batch_op.alter_column('account_balance', existing_type=sa.BigInteger(), nullable=True)
+        batch_op.drop_column('total_expenses')
+        batch_op.drop_column('total_income')
@@ -0,0 +1,77 @@
+"""Add full-text search index over transactions and incomes
+
+Revision ID: f2a7c9d04b18
+Revises: d6b1e8f43a90
+Create Date: 2026-10-19 11:27:58.130476
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f2a7c9d04b18'
+down_revision = 'd6b1e8f43a90'
+branch_labels = None
+depends_on = None
+
+# table -> (label column, document id offset); document ids are id * 2 + offset
+TABLES = {'transactions': ('category', 0), 'incomes': ('source', 1)}
+
+
+def _sqlite_upgrade():
+    op.execute("CREATE VIRTUAL TABLE search_index USING fts5("
+               "owner, label, notes, other_source, content='', prefix='2 3')")
+    for table, (label, offset) in TABLES.items():
+        values = f"'owner' || {{row}}.user_id, {{row}}.{label}, {{row}}.notes, {{row}}.other_source"
+        insert = (f"INSERT INTO search_index (rowid, owner, label, notes, other_source) "
+                  f"VALUES (new.id * 2 + {offset}, {values.format(row='new')});")
+        delete = (f"INSERT INTO search_index (search_index, rowid, owner, label, notes, other_source) "
+                  f"VALUES ('delete', old.id * 2 + {offset}, {values.format(row='old')});")
+        op.execute(f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END")
+        op.execute(f"CREATE TRIGGER {table}_search_update "
+                   f"AFTER UPDATE OF user_id, {label}, notes, other_source ON {table} BEGIN {delete} {insert} END")
+        op.execute(f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END")
+        op.execute(f"INSERT INTO search_index (rowid, owner, label, notes, other_source) "
+                   f"SELECT id * 2 + {offset}, 'owner' || user_id, {label}, notes, other_source FROM {table}")
+
+
+def _mysql_upgrade():
+    op.execute("CREATE TABLE search_documents ("
+               "id BIGINT NOT NULL PRIMARY KEY, user_id INT NOT NULL, owner VARCHAR(32) NOT NULL, "
+               "label VARCHAR(100) NULL, notes VARCHAR(255) NULL, other_source VARCHAR(100) NULL) ENGINE=InnoDB")
+    for table, (label, offset) in TABLES.items():
+        op.execute(f"INSERT INTO search_documents (id, user_id, owner, label, notes, other_source) "
+                   f"SELECT id * 2 + {offset}, user_id, CONCAT('owner', user_id), {label}, notes, other_source "
+                   f"FROM {table}")
+    # Building the FULLTEXT index after the bulk load is much faster than maintaining it row by row
+    op.execute("CREATE FULLTEXT INDEX ft_search_documents ON search_documents (owner, label, notes, other_source)")
+    for table, (label, offset) in TABLES.items():
+        op.execute(f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} FOR EACH ROW "
+                   f"INSERT INTO search_documents (id, user_id, owner, label, notes, other_source) "
+                   f"VALUES (NEW.id * 2 + {offset}, NEW.user_id, CONCAT('owner', NEW.user_id), "
+                   f"NEW.{label}, NEW.notes, NEW.other_source)")
+        op.execute(f"CREATE TRIGGER {table}_search_update AFTER UPDATE ON {table} FOR EACH ROW "
+                   f"UPDATE search_documents SET user_id = NEW.user_id, owner = CONCAT('owner', NEW.user_id), "
+                   f"label = NEW.{label}, notes = NEW.notes, other_source = NEW.other_source "
+                   f"WHERE id = NEW.id * 2 + {offset}")
+        op.execute(f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} FOR EACH ROW "
+                   f"DELETE FROM search_documents WHERE id = OLD.id * 2 + {offset}")
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'sqlite':
+        _sqlite_upgrade()
+    elif dialect == 'mysql':
+        _mysql_upgrade()
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect not in ('sqlite', 'mysql'):
+        return
+    for table in TABLES:
+        for action in ('insert', 'update', 'delete'):
+            op.execute(f'DROP TRIGGER IF EXISTS {table}_search_{action}')
+    op.execute('DROP TABLE IF EXISTS search_index' if dialect == 'sqlite' else 'DROP TABLE IF EXISTS search_documents')
@@ -1,6 +1,7 @@
-from datetime import datetime, timezone, timedelta
+from datetime import date, datetime, timezone, timedelta
 import uuid
-from extensions import db, bcrypt
+from extensions import db
+from passwords import hasher
 
 class User(db.Model):
     __tablename__ = 'users'
@@ -12,7 +13,10 @@ class User(db.Model):
     qualifications = db.Column(db.Text, nullable=True)
     gender = db.Column(db.String(10), nullable=True)
     profile_pic = db.Column(db.String(255), nullable=True)
-    account_balance = db.Column(db.Float, default=0.0)
+    # Lifetime totals in minor units, maintained with every income/expense write (see balances.py)
+    account_balance = db.Column(db.BigInteger, nullable=False, default=0)  # total_income - total_expenses
+    total_income = db.Column(db.BigInteger, nullable=False, default=0)
+    total_expenses = db.Column(db.BigInteger, nullable=False, default=0)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     # Relationships
@@ -23,11 +27,15 @@ class User(db.Model):
     notifications = db.relationship('Notification', backref='user', lazy='dynamic')
     achievements = db.relationship('Achievement', backref='user', lazy='dynamic')
 
+    # Both run bcrypt on the bounded hash pool (see passwords.py) and may raise PasswordHasherBusy
     def set_password(self, password):
-        self.password_hash = bcrypt.generate_password_hash(password).decode('utf-8')
+        self.password_hash = hasher.hash(password)
 
     def check_password(self, password):
-        return bcrypt.check_password_hash(self.password_hash, password)
+        return hasher.verify(self.password_hash, password)
+
+    def password_needs_rehash(self):
+        return hasher.needs_rehash(self.password_hash)
 
     def __repr__(self):
         return f'<User {self.username}>'
@@ -36,14 +44,23 @@ class User(db.Model):
 # Transaction Model (Note: Handles Expenses)
 class Transaction(db.Model):
     __tablename__ = 'transactions'
+    __table_args__ = (
+        # Covers the trend report's range scan (see analytics.py); also serves (user_id, date) lookups
+        db.Index('ix_transactions_user_date_totals', 'user_id', 'date', 'category', 'payment_method', 'amount'),
+        db.Index('ix_transactions_user_category_date', 'user_id', 'category', 'date'),
+        db.Index('ix_transactions_user_payment_method_date', 'user_id', 'payment_method', 'date'),
+        # An occurrence of a recurring rule is created once (see recurring.py)
+        db.Index('uq_transactions_recurring_rule_date', 'recurring_rule_id', 'date', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     category = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)  # minor units, see money.py
     date = db.Column(db.Date, default=lambda: datetime.now(timezone.utc), nullable=False)
     payment_method = db.Column(db.String(50), nullable=False)
     notes = db.Column(db.String(255), nullable=True)
     other_source = db.Column(db.String(100), nullable=True)
+    recurring_rule_id = db.Column(db.Integer, nullable=True)  # RecurringRule that created the entry
 
     def __repr__(self):
         return f'<Transactions {self.category} - {self.amount}>'
@@ -52,26 +69,82 @@ class Transaction(db.Model):
 # Income Model
 class Income(db.Model):
     __tablename__ = 'incomes'
+    __table_args__ = (
+        # Covers the trend report's range scan (see analytics.py); also serves (user_id, date) lookups
+        db.Index('ix_incomes_user_date_totals', 'user_id', 'date', 'source', 'payment_method', 'amount'),
+        db.Index('ix_incomes_user_source_date', 'user_id', 'source', 'date'),
+        db.Index('ix_incomes_user_payment_method_date', 'user_id', 'payment_method', 'date'),
+        # An occurrence of a recurring rule is created once (see recurring.py)
+        db.Index('uq_incomes_recurring_rule_date', 'recurring_rule_id', 'date', unique=True),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     source = db.Column(db.String(100), nullable=False)
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)  # minor units, see money.py
     date = db.Column(db.Date, default=datetime.utcnow, nullable=False)
     payment_method = db.Column(db.String(50), nullable=False)
     notes = db.Column(db.String(255), nullable=True)
     other_source = db.Column(db.String(100), nullable=True)
+    recurring_rule_id = db.Column(db.Integer, nullable=True)  # RecurringRule that created the entry
 
     def __repr__(self):
         return f'<Incomes {self.source} - {self.amount}>'
 
 
+# Recurring expense/income rule, materialized into entries by the recurring.materialize job (see recurring.py)
+class RecurringRule(db.Model):
+    __tablename__ = 'recurring_rules'
+    __table_args__ = (
+        db.Index('ix_recurring_rules_next_date', 'next_date'),
+        db.Index('ix_recurring_rules_user_id', 'user_id'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # 'expense' or 'income'
+    label = db.Column(db.String(100), nullable=False)  # Transaction.category / Income.source
+    amount = db.Column(db.BigInteger, nullable=False)  # minor units, see money.py
+    payment_method = db.Column(db.String(50), nullable=False)
+    notes = db.Column(db.String(255), nullable=True)
+    frequency = db.Column(db.String(10), nullable=False)  # daily/weekly/monthly/yearly
+    interval = db.Column(db.Integer, nullable=False, default=1)
+    start_date = db.Column(db.Date, nullable=False)  # first occurrence
+    until = db.Column(db.Date, nullable=True)  # last possible occurrence (inclusive)
+    next_date = db.Column(db.Date, nullable=True)  # first occurrence not yet created; NULL once the rule has ended
+    last_date = db.Column(db.Date, nullable=True)  # last occurrence created
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
+
+    def __repr__(self):
+        return f'<RecurringRule {self.kind} {self.label} - {self.amount}>'
+
+
+# Monthly Rollup Model (per-user running totals, maintained by every income/expense write)
+class MonthlyRollup(db.Model):
+    __tablename__ = 'monthly_rollups'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'year', 'month', 'kind', 'category', 'payment_method',
+                            name='uq_monthly_rollups_bucket'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
+    year = db.Column(db.Integer, nullable=False)
+    month = db.Column(db.Integer, nullable=False)
+    kind = db.Column(db.String(10), nullable=False)  # 'expense' or 'income'
+    category = db.Column(db.String(100), nullable=False)  # Transaction.category / Income.source
+    payment_method = db.Column(db.String(50), nullable=False)
+    total = db.Column('sum', db.BigInteger, nullable=False, default=0)  # minor units
+    count = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<MonthlyRollup {self.kind} {self.year}-{self.month:02d} {self.category} - {self.total}>'
+
+
 # Budget Model
 class Budget(db.Model):
     __tablename__ = 'budgets'
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     category = db.Column(db.String(100), nullable=True)  # NULL = total budget
-    amount = db.Column(db.Float, nullable=False)
+    amount = db.Column(db.BigInteger, nullable=False)  # minor units, see money.py
     month = db.Column(db.Integer, nullable=False)
     year = db.Column(db.Integer, nullable=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
@@ -86,8 +159,8 @@ class SavingGoal(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
-    target_amount = db.Column(db.Float, nullable=False)
-    current_amount = db.Column(db.Float, default=0.0)
+    target_amount = db.Column(db.BigInteger, nullable=False)  # minor units, see money.py
+    current_amount = db.Column(db.BigInteger, default=0)
     target_date = db.Column(db.Date, nullable=False)
     completed = db.Column(db.Boolean, default=False)
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
@@ -99,11 +172,15 @@ class SavingGoal(db.Model):
 # Notification Model
 class Notification(db.Model):
     __tablename__ = 'notifications'
+    __table_args__ = (
+        db.UniqueConstraint('user_id', 'dedup_key', name='uq_notifications_user_dedup_key'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     message = db.Column(db.String(500), nullable=False)
     type = db.Column(db.String(50), nullable=False, default='info')
     read = db.Column(db.Boolean, default=False)
+    dedup_key = db.Column(db.String(191), nullable=True)  # see notifications.NotificationOutbox
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
 
     def __repr__(self):
@@ -113,6 +190,9 @@ class Notification(db.Model):
 # Achievement Model
 class Achievement(db.Model):
     __tablename__ = 'achievements'
+    __table_args__ = (
+        db.Index('ix_achievements_user_date_earned', 'user_id', 'date_earned'),
+    )
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('users.id'), nullable=False)
     title = db.Column(db.String(200), nullable=False)
@@ -124,6 +204,108 @@ class Achievement(db.Model):
         return f'<Achievement {self.title}>'
 
 
+# Achievement rule state (small per-user JSON kept by the achievement engine)
+class AchievementState(db.Model):
+    __tablename__ = 'achievement_states'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    rule = db.Column(db.String(50), primary_key=True)  # Achievement.badge_type
+    state = db.Column(db.JSON, nullable=False, default=dict)
+
+    def __repr__(self):
+        return f'<AchievementState {self.user_id} {self.rule}>'
+
+
+# Financial insights precomputed per user-month (see insights.py)
+class InsightSnapshot(db.Model):
+    __tablename__ = 'insight_snapshots'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    year = db.Column(db.Integer, primary_key=True)
+    month = db.Column(db.Integer, primary_key=True)
+    insights = db.Column(db.JSON, nullable=False, default=list)
+    stale = db.Column(db.Boolean, nullable=False, default=True)
+    generation = db.Column(db.Integer, nullable=False, default=0)  # bumped on every invalidation
+    computed_at = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def invalidate(cls, user_id, periods=None):
+        """Mark the user's snapshots for the given (year, month) periods (default: all) stale."""
+        cls.invalidate_users([user_id], periods)
+
+    @classmethod
+    def invalidate_users(cls, user_ids, periods=None):
+        """``invalidate`` for several users at once."""
+        query = cls.query.filter(cls.user_id.in_([int(user_id) for user_id in user_ids]))
+        if periods is not None:
+            periods = set(periods)
+            if not periods:
+                return
+            query = query.filter(db.or_(*[db.and_(cls.year == y, cls.month == m) for y, m in periods]))
+        query.update({cls.stale: True, cls.generation: cls.generation + 1}, synchronize_session=False)
+
+    def __repr__(self):
+        return f'<InsightSnapshot {self.user_id} {self.year}-{self.month:02d}>'
+
+
+# Spending forecast model per user and expense category (see forecast.py)
+class ForecastState(db.Model):
+    __tablename__ = 'forecast_states'
+    user_id = db.Column(db.Integer, db.ForeignKey('users.id'), primary_key=True)
+    category = db.Column(db.String(100), primary_key=True)
+    alpha = db.Column(db.Float, nullable=False)  # smoothing factor
+    level = db.Column(db.Float, nullable=False)  # smoothed daily spend, minor units
+    through = db.Column(db.Date, nullable=False)  # last day folded into ``level``
+    folded = db.Column(db.BigInteger, nullable=False, default=0)  # spend of through's month up to ``through``
+    stale = db.Column(db.Boolean, nullable=False, default=False)
+    generation = db.Column(db.Integer, nullable=False, default=0)  # bumped on every invalidation
+    fitted_at = db.Column(db.DateTime, nullable=True)
+
+    @classmethod
+    def invalidate(cls, user_id, periods):
+        """Mark the user's states stale if they have folded in any day of the (year, month) periods.
+
+        Only months before the one containing ``through`` are checked here;
+        changes within that month are detected when the forecast is read.
+        """
+        cls.invalidate_users([user_id], periods)
+
+    @classmethod
+    def invalidate_users(cls, user_ids, periods):
+        """``invalidate`` for several users at once."""
+        if not periods:
+            return
+        year, month = min(periods)
+        after = date(year + month // 12, month % 12 + 1, 1)
+        cls.query.filter(cls.user_id.in_([int(user_id) for user_id in user_ids]), cls.through >= after).update(
+            {cls.stale: True, cls.generation: cls.generation + 1}, synchronize_session=False)
+
+    def __repr__(self):
+        return f'<ForecastState {self.user_id} {self.category}>'
+
+
+# Background job (see jobs.py)
+class Job(db.Model):
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        db.Index('ix_jobs_status_run_at', 'status', 'run_at'),
+    )
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(10), nullable=False, default='queued')  # queued/running/done/failed
+    unique_key = db.Column(db.String(191), unique=True, nullable=True)
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    run_at = db.Column(db.DateTime, nullable=False)
+    created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc).replace(tzinfo=None))
+    started_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+    locked_by = db.Column(db.String(50), nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+
+    def __repr__(self):
+        return f'<Job {self.id} {self.name} {self.status}>'
+
+
 # Password Reset Token Model
 class PasswordResetToken(db.Model):
     __tablename__ = 'password_reset_tokens'
@@ -0,0 +1,63 @@
+"""Money is stored as integer minor units (paise/cents).
+
+Every amount column is a BIGINT of minor units, so SUMs in the database
+and additions in Python are exact integer arithmetic and need no
+rounding. Conversion happens only at the API boundary:
+
+- ``to_minor`` parses request values (numbers or decimal strings).
+- ``to_major`` renders stored values as JSON numbers in major units.
+- ``fields`` also adds the raw integers (``amount_minor``, ``totalIncomeMinor``, ...)
+  when the client asks for them with ``?minor_units=1``.
+"""
+from decimal import Decimal, InvalidOperation, ROUND_HALF_UP
+
+from flask import has_request_context, request
+
+MINOR_PER_MAJOR = 100
+_QUANTUM = Decimal(1) / MINOR_PER_MAJOR
+
+
+def to_minor(value):
+    """Major-unit amount (number or string such as '1,234.50') -> int minor units. Raises ValueError."""
+    if isinstance(value, bool):
+        raise ValueError(f'Invalid amount: {value!r}')
+    if isinstance(value, int):
+        return value * MINOR_PER_MAJOR
+    try:
+        amount = Decimal(str(value).replace(',', '').strip())
+    except InvalidOperation:
+        raise ValueError(f'Invalid amount: {value!r}')
+    if not amount.is_finite():
+        raise ValueError(f'Invalid amount: {value!r}')
+    return int(amount.quantize(_QUANTUM, rounding=ROUND_HALF_UP) * MINOR_PER_MAJOR)
+
+
+def to_major(minor):
+    """Int minor units -> major units for JSON (e.g. 1250 -> 12.5)."""
+    if minor is None:
+        return None
+    return minor / MINOR_PER_MAJOR
+
+
+def format_major(minor):
+    """Minor units as a fixed two-decimal string for messages and CSV (e.g. 1250 -> '12.50')."""
+    sign = '-' if minor < 0 else ''
+    major, cents = divmod(abs(int(minor)), MINOR_PER_MAJOR)
+    return f'{sign}{major}.{cents:02d}'
+
+
+def wants_minor_units():
+    return has_request_context() and request.args.get('minor_units', '').lower() in ('1', 'true', 'yes')
+
+
+def minor_key(key):
+    """Name of the opt-in integer field, following the key's casing: amount_minor, totalIncomeMinor."""
+    return f'{key}Minor' if key != key.lower() else f'{key}_minor'
+
+
+def fields(**amounts):
+    """Response fields for minor-unit amounts, plus their raw integers if ``?minor_units=1``."""
+    result = {key: to_major(value) for key, value in amounts.items()}
+    if wants_minor_units():
+        result.update({minor_key(key): value for key, value in amounts.items()})
+    return result
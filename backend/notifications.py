@@ -0,0 +1,80 @@
+"""Per-request notification outbox.
+
+Route handlers queue notifications with ``outbox.add``; they are written
+with one bulk insert after the response is built, and only if the
+request succeeded. Every notification carries a dedup key enforced by a
+unique (user_id, dedup_key) index, and the insert ignores conflicts, so
+repeated alerts are dropped by the database without extra reads.
+Notifications without an explicit key are coalesced per
+(type, message) within NOTIFICATION_COALESCE_SECONDS.
+"""
+import hashlib
+import time
+
+from flask import current_app, g
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import Notification
+
+
+class NotificationOutbox:
+    def init_app(self, app):
+        app.config.setdefault('NOTIFICATION_COALESCE_SECONDS', 3600)
+        app.after_request(self._flush_after_request)
+
+    def add(self, user_id, message, notification_type='info', dedup_key=None):
+        """Queue a notification. Repeats of the same key in one request are merged."""
+        if dedup_key is None:
+            window = int(time.time() // current_app.config['NOTIFICATION_COALESCE_SECONDS'])
+            digest = hashlib.sha1(message.encode('utf-8')).hexdigest()[:16]
+            dedup_key = f'{digest}:{window}'
+        key = f'{notification_type}:{dedup_key}'[:191]
+
+        pending = g.setdefault('notification_outbox', {})
+        pending.setdefault((int(user_id), key), {
+            'user_id': int(user_id), 'message': message, 'type': notification_type, 'dedup_key': key
+        })
+
+    def discard(self):
+        g.pop('notification_outbox', None)
+
+    def flush(self):
+        """Insert queued notifications and commit. Call this outside of requests (CLI, jobs).
+
+        Returns the number of rows inserted; duplicates dropped by the dedup index are not counted.
+        """
+        pending = g.pop('notification_outbox', None)
+        if not pending:
+            return 0
+
+        rows = list(pending.values())
+        inserted = 0
+        dialect = db.session.get_bind().dialect.name
+        if dialect in ('sqlite', 'mysql'):
+            # Core insert on the table: the ORM bulk path does not report rowcount
+            stmt = db.insert(Notification.__table__).prefix_with('OR IGNORE', dialect='sqlite').prefix_with('IGNORE', dialect='mysql')
+            inserted = db.session.execute(stmt, rows).rowcount
+        else:
+            for row in rows:
+                try:
+                    with db.session.begin_nested():
+                        inserted += db.session.execute(db.insert(Notification.__table__), row).rowcount
+                except IntegrityError:
+                    pass
+        db.session.commit()
+        return inserted
+
+    def _flush_after_request(self, response):
+        if response.status_code >= 400:
+            self.discard()
+            return response
+        try:
+            self.flush()
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Failed to flush notification outbox')
+        return response
+
+
+outbox = NotificationOutbox()
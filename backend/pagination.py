@@ -0,0 +1,50 @@
+"""Keyset (cursor) pagination for history listings.
+
+Pages are ordered by ``(date DESC, id DESC)`` and the cursor encodes the
+last row's ``(date, id)``, so fetching any page is an index range scan on
+``(user_id, date)`` no matter how deep into the history it is.
+"""
+import base64
+import json
+from datetime import date
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def encode_cursor(row):
+    payload = json.dumps([row.date.isoformat(), row.id], separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (date, id) from a cursor token. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        day, row_id = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        return date.fromisoformat(day), int(row_id)
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+def page_args(args):
+    """Read ``limit`` and ``cursor`` from request args. Raises ValueError on bad input."""
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError as e:
+        raise ValueError('limit must be an integer') from e
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+    cursor = args.get('cursor') or None
+    return limit, (decode_cursor(cursor) if cursor else None)
+
+
+def paginate(query, model, limit, after=None):
+    """Return (rows, next_cursor) for one page of ``query`` ordered newest first."""
+    if after is not None:
+        after_date, after_id = after
+        query = query.filter(
+            (model.date < after_date) | ((model.date == after_date) & (model.id < after_id))
+        )
+    rows = query.order_by(model.date.desc(), model.id.desc()).limit(limit + 1).all()
+    next_cursor = encode_cursor(rows[limit - 1]) if len(rows) > limit else None
+    return rows[:limit], next_cursor
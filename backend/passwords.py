@@ -0,0 +1,154 @@
+"""Bounded bcrypt pool for password hashing and verification.
+
+bcrypt is deliberately slow (~250ms at cost 12) and used to run on the
+request thread, so a login storm occupied every worker and the rest of
+the API queued behind it. Hashes now run on a dedicated pool of
+PASSWORD_HASH_THREADS threads (bcrypt releases the GIL). At most
+PASSWORD_HASH_MAX_WAITING more requests may queue for it; beyond that a
+request waits up to PASSWORD_HASH_WAIT_SECONDS for room and is then
+answered with 503 and Retry-After instead of piling up.
+
+The cost is BCRYPT_LOG_ROUNDS. Hashes stored with a different cost are
+re-hashed on the next successful login, so raising (or lowering) it
+needs no migration. Pool saturation is exported on /metrics.
+"""
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app, jsonify
+
+from extensions import db, bcrypt
+from metrics import Histogram, LATENCY_BUCKETS, gauge_lines
+
+
+class PasswordHasherBusy(Exception):
+    """The hash pool and its queue are full."""
+
+
+def hash_rounds(password_hash):
+    """Cost factor of a stored bcrypt hash ('$2b$12$...' -> 12), or None if it is not one."""
+    try:
+        return int(password_hash.split('$')[2])
+    except (AttributeError, IndexError, ValueError):
+        return None
+
+
+class PasswordHasher:
+    def __init__(self):
+        self.rounds = 12
+        self.threads = 0
+        self.max_waiting = 0
+        self.wait_seconds = 0.0
+        self.running = self.waiting = 0
+        self.completed = self.rejected = self.rehashed = 0
+        self.wait = Histogram('spendsmart_password_hash_wait_seconds', 'Time queued for the hash pool.', LATENCY_BUCKETS)
+        self.duration = Histogram('spendsmart_password_hash_seconds', 'bcrypt time per operation.', LATENCY_BUCKETS)
+        self._executor = None
+        self._slots = None
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('BCRYPT_LOG_ROUNDS', 12)
+        app.config.setdefault('PASSWORD_HASH_THREADS', 4)
+        app.config.setdefault('PASSWORD_HASH_MAX_WAITING', 32)
+        app.config.setdefault('PASSWORD_HASH_WAIT_SECONDS', 2.0)
+
+        self.rounds = app.config['BCRYPT_LOG_ROUNDS']
+        self.wait_seconds = app.config['PASSWORD_HASH_WAIT_SECONDS']
+        threads = app.config['PASSWORD_HASH_THREADS']
+        if threads != self.threads:
+            if self._executor is not None:
+                self._executor.shutdown(wait=False)
+            self.threads = threads
+            self.max_waiting = app.config['PASSWORD_HASH_MAX_WAITING']
+            self._executor = ThreadPoolExecutor(threads, thread_name_prefix='bcrypt') if threads > 0 else None
+            self._slots = threading.BoundedSemaphore(threads + self.max_waiting) if threads > 0 else None
+        app.register_error_handler(PasswordHasherBusy, self._busy)
+
+    def hash(self, password):
+        return self._run('hash', lambda: bcrypt.generate_password_hash(password, self.rounds).decode('utf-8'))
+
+    def verify(self, password_hash, password):
+        return self._run('verify', lambda: bcrypt.check_password_hash(password_hash, password))
+
+    def needs_rehash(self, password_hash):
+        return hash_rounds(password_hash) != self.rounds
+
+    def upgrade(self, user, password):
+        """Re-hash a just-verified password at the configured cost. Best effort: login must not fail on it."""
+        try:
+            user.set_password(password)
+            db.session.commit()
+        except PasswordHasherBusy:
+            return
+        except Exception:
+            db.session.rollback()
+            current_app.logger.exception('Password re-hash failed for user %s', user.id)
+            return
+        with self._lock:
+            self.rehashed += 1
+
+    def _run(self, operation, fn):
+        if self._executor is None:
+            return self._timed(operation, fn, time.perf_counter())  # PASSWORD_HASH_THREADS=0: inline
+        if not self._slots.acquire(timeout=self.wait_seconds):
+            with self._lock:
+                self.rejected += 1
+            raise PasswordHasherBusy()
+        try:
+            with self._lock:
+                self.waiting += 1
+            future = self._executor.submit(self._timed, operation, fn, time.perf_counter(), True)
+        except Exception:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future.result()
+
+    def _timed(self, operation, fn, queued_at, pooled=False):
+        started = time.perf_counter()
+        with self._lock:
+            if pooled:
+                self.waiting -= 1
+            self.running += 1
+            self.wait.observe((operation,), started - queued_at)
+        try:
+            return fn()
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+                self.duration.observe((operation,), time.perf_counter() - started)
+
+    def _busy(self, error):
+        response = jsonify({'error': 'Server is busy, please retry shortly'})
+        response.headers['Retry-After'] = str(max(1, round(self.wait_seconds)))
+        return response, 503
+
+    def stats(self):
+        with self._lock:
+            return {
+                'rounds': self.rounds,
+                'threads': self.threads,
+                'max_waiting': self.max_waiting,
+                'running': self.running,
+                'waiting': self.waiting,
+                'completed': self.completed,
+                'rejected': self.rejected,
+                'rehashed': self.rehashed,
+            }
+
+    def metric_lines(self):
+        stats = self.stats()
+        lines = gauge_lines('spendsmart_password_hash_pool', 'Hash pool size and occupancy.',
+                            {key: stats[key] for key in ('threads', 'max_waiting', 'running', 'waiting')}, label='state')
+        lines += gauge_lines('spendsmart_password_hash_operations', 'Hash pool operations by outcome.',
+                             {key: stats[key] for key in ('completed', 'rejected', 'rehashed')}, label='outcome')
+        with self._lock:
+            lines += self.wait.render(('operation',))
+            lines += self.duration.render(('operation',))
+        return lines
+
+
+hasher = PasswordHasher()
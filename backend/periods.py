@@ -0,0 +1,121 @@
+"""Half-open date periods for analytics queries.
+
+Filtering with ``extract('month', date) == m`` hides the column behind a
+function, so no index on ``date`` can be used. These helpers turn a
+period into ``date >= start AND date < end`` predicates that the
+``(user_id, date)``-prefixed indexes can answer with a range scan.
+"""
+from datetime import date, timedelta
+
+import click
+from flask.cli import AppGroup
+
+from extensions import db
+from models import Transaction, Income
+
+
+def month_bounds(year, month):
+    """Return [start, end) for a calendar month."""
+    start = date(year, month, 1)
+    end = date(year + 1, 1, 1) if month == 12 else date(year, month + 1, 1)
+    return start, end
+
+
+def previous_month(year, month):
+    """Return (year, month) of the month before the given one."""
+    return (year, month - 1) if month > 1 else (year - 1, 12)
+
+
+def next_month(year, month):
+    """Return (year, month) of the month after the given one."""
+    return (year, month + 1) if month < 12 else (year + 1, 1)
+
+
+def range_bounds(start=None, end=None):
+    """Return [start, end) for an inclusive date range; either side may be open (None)."""
+    return start, (end + timedelta(days=1)) if end else None
+
+
+def in_period(column, start, end):
+    """SQL predicate ``column >= start AND column < end``, skipping open sides."""
+    conditions = []
+    if start is not None:
+        conditions.append(column >= start)
+    if end is not None:
+        conditions.append(column < end)
+    return db.and_(*conditions)
+
+
+def in_month(column, year, month):
+    return in_period(column, *month_bounds(year, month))
+
+
+# =============================================
+# EXPLAIN CHECK
+# =============================================
+
+def _explain(statement):
+    """Return (uses_range_scan, plan text) for a SELECT on the current engine."""
+    engine = db.session.get_bind()
+    sql = str(statement.compile(dialect=engine.dialect, compile_kwargs={'literal_binds': True}))
+
+    if engine.dialect.name == 'sqlite':
+        rows = db.session.execute(db.text('EXPLAIN QUERY PLAN ' + sql)).fetchall()
+        details = [row[-1] for row in rows]
+        # e.g. "SEARCH transactions USING INDEX ix_transactions_user_date (user_id=? AND date>? AND date<?)"
+        ranged = any('USING' in d and 'INDEX' in d and 'date>' in d for d in details)
+        return ranged, '; '.join(details)
+
+    result = db.session.execute(db.text('EXPLAIN ' + sql))
+    rows = [dict(row._mapping) for row in result]
+    ranged = any(row.get('type') == 'range' and row.get('key') for row in rows)
+    return ranged, '; '.join(f"type={row.get('type')} key={row.get('key')} rows={row.get('rows')}" for row in rows)
+
+
+def _analytics_queries(user_id, year, month):
+    """Representative analytics queries, each as (name, legacy predicate, sargable predicate)."""
+    def legacy(column):
+        return db.and_(db.extract('month', column) == month, db.extract('year', column) == year)
+
+    def expense_sum(*conditions):
+        return db.select(db.func.sum(Transaction.amount)).where(Transaction.user_id == user_id, *conditions)
+
+    def income_sum(*conditions):
+        return db.select(db.func.sum(Income.amount)).where(Income.user_id == user_id, *conditions)
+
+    def by_category(*conditions):
+        return expense_sum(Transaction.category == 'Food', *conditions)
+
+    def by_payment_method(*conditions):
+        return expense_sum(Transaction.payment_method == 'Cash', *conditions)
+
+    return [
+        ('monthly expenses', expense_sum(legacy(Transaction.date)),
+         expense_sum(in_month(Transaction.date, year, month))),
+        ('category budget spend', by_category(legacy(Transaction.date)),
+         by_category(in_month(Transaction.date, year, month))),
+        ('payment method spend', by_payment_method(legacy(Transaction.date)),
+         by_payment_method(in_month(Transaction.date, year, month))),
+        ('monthly income', income_sum(legacy(Income.date)),
+         income_sum(in_month(Income.date, year, month))),
+    ]
+
+
+periods_cli = AppGroup('periods', help='Inspect date-period query plans.')
+
+
+@periods_cli.command('explain')
+@click.option('--user-id', type=int, default=1, help='User id to plug into the sample queries.')
+def explain_command(user_id):
+    """EXPLAIN the analytics queries with extract() vs half-open date predicates."""
+    today = date.today()
+    failures = 0
+    for name, before, after in _analytics_queries(user_id, today.year, today.month):
+        _, before_plan = _explain(before)
+        ranged, after_plan = _explain(after)
+        failures += not ranged
+        click.echo(f'{name}:')
+        click.echo(f'  extract():  {before_plan}')
+        click.echo(f'  date range: {after_plan}  [{"index range scan" if ranged else "NO RANGE SCAN"}]')
+    if failures:
+        raise click.ClickException(f'{failures} queries are not using an index range scan; run `flask db upgrade`.')
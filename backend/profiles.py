@@ -0,0 +1,136 @@
+"""Per-process cache of user profiles keyed by JWT identity.
+
+Authenticated endpoints that only need who the user is (name, email,
+picture, ...) read a ``UserProfile``: a small slotted, read-only copy of
+the ``users`` row that is safe to share between requests and threads,
+unlike an ORM instance bound to one session. Entries live for
+USER_PROFILE_CACHE_TTL seconds in an LRU of USER_PROFILE_CACHE_MAX_ENTRIES.
+
+Any committed change to a User (profile update, password reset, picture
+stored by the upload job, deletion) invalidates its entry via session
+events, so callers never invalidate by hand. Other processes only see
+the change once their entry expires, which bounds cross-worker staleness
+to the TTL.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from flask_jwt_extended import get_jwt_identity
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from extensions import db
+from metrics import gauge_lines
+from models import User
+
+
+class UserProfile:
+    __slots__ = ('id', 'username', 'full_name', 'email', 'gender', 'profile_pic', 'qualifications', 'created_at')
+
+    def __init__(self, user):
+        for name in self.__slots__:
+            object.__setattr__(self, name, getattr(user, name))
+
+    def __setattr__(self, name, value):
+        raise AttributeError('UserProfile is read-only')
+
+    def __repr__(self):
+        return f'<UserProfile {self.id}>'
+
+
+class ProfileCache:
+    def __init__(self):
+        self.ttl = 60
+        self.max_entries = 4096
+        self.hits = self.misses = self.evictions = self.invalidations = 0
+        self._entries = OrderedDict()  # user id -> (expires_at, profile)
+        self._generations = {}  # user id -> invalidation count, guards against re-caching a row read before a commit
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        app.config.setdefault('USER_PROFILE_CACHE_TTL', 60)
+        app.config.setdefault('USER_PROFILE_CACHE_MAX_ENTRIES', 4096)
+        self.ttl = app.config['USER_PROFILE_CACHE_TTL']
+        self.max_entries = app.config['USER_PROFILE_CACHE_MAX_ENTRIES']
+        # Ids flushed by a transaction that is later rolled back are kept: invalidating too much is harmless
+        for name, listener in (('after_flush', _collect_changed_users),
+                               ('after_commit', _invalidate_changed_users)):
+            if not event.contains(Session, name, listener):
+                event.listen(Session, name, listener)
+
+    def get(self, user_id):
+        """The profile of ``user_id``, or None if there is no such user."""
+        user_id = int(user_id)
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(user_id)
+            if entry is not None and entry[0] > now:
+                self._entries.move_to_end(user_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generations.get(user_id, 0)
+
+        user = db.session.get(User, user_id)
+        if user is None:
+            return None
+        profile = UserProfile(user)
+        if self.ttl <= 0:
+            return profile
+
+        with self._lock:
+            if self._generations.get(user_id, 0) == generation:
+                self._entries[user_id] = (now + self.ttl, profile)
+                self._entries.move_to_end(user_id)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return profile
+
+    def invalidate(self, user_id):
+        user_id = int(user_id)
+        with self._lock:
+            self._entries.pop(user_id, None)
+            self._generations[user_id] = self._generations.get(user_id, 0) + 1
+            self.invalidations += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'entries': len(self._entries),
+                'max_entries': self.max_entries,
+                'ttl_seconds': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': round(self.hits / lookups, 4) if lookups else 0.0,
+                'evictions': self.evictions,
+                'invalidations': self.invalidations,
+            }
+
+    def metric_lines(self):
+        stats = self.stats()
+        lines = []
+        for key in ('hits', 'misses', 'evictions', 'invalidations', 'entries'):
+            lines += gauge_lines(f'spendsmart_profile_cache_{key}', f'User profile cache {key}.', stats[key])
+        return lines
+
+
+profiles = ProfileCache()
+
+
+def current_profile():
+    """Profile of the JWT identity of the current request, or None."""
+    return profiles.get(get_jwt_identity())
+
+
+def _collect_changed_users(session, flush_context):
+    changed = [obj.id for obj in list(session.dirty) + list(session.deleted) if isinstance(obj, User)]
+    if changed:
+        session.info.setdefault('changed_user_ids', set()).update(changed)
+
+
+def _invalidate_changed_users(session):
+    for user_id in session.info.pop('changed_user_ids', ()):
+        profiles.invalidate(user_id)
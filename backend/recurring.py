@@ -0,0 +1,334 @@
+"""Recurring expenses and incomes (rent, salaries, subscriptions).
+
+A ``RecurringRule`` repeats an entry every ``interval`` days, weeks,
+months or years from ``start_date`` up to ``until``, the FREQ, INTERVAL,
+DTSTART and UNTIL parts of an RFC 5545 RRULE. Monthly and yearly rules
+keep the start date's day of the month, clamped in shorter months: a
+rule starting on Jan 31 falls on Feb 28 (or 29) and then Mar 31.
+
+The periodic ``recurring.materialize`` job creates the transactions and
+incomes for every occurrence that is due. ``next_date`` is the rule's
+first occurrence that has not been created yet, so one index range scan
+finds the due rules of all users. They are processed CHUNK_SIZE at a
+time: one bulk insert per table, one executemany advancing
+``next_date``, the rollup and achievement bookkeeping of ``importer``,
+and one commit. After downtime the next run creates every missed
+occurrence, up to MAX_OCCURRENCES per rule and run.
+
+Created entries keep their rule's id, and (recurring_rule_id, date) is
+unique in both tables, so an occurrence is never created twice, even by
+overlapping or retried runs.
+"""
+import calendar
+from collections import defaultdict
+from datetime import date, datetime, timedelta
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import RecurringRule, Transaction, Income
+from rollups import EXPENSE, INCOME
+from jobs import task, periodic
+from cache import response_cache
+from notifications import outbox
+from money import to_minor
+import achievements
+import money
+import rollups
+
+CHUNK_SIZE = 1000
+MAX_OCCURRENCES = 1000  # per rule and run
+MAX_INTERVAL = 1000
+
+# frequency -> (days, months) per interval
+FREQUENCIES = {'daily': (1, 0), 'weekly': (7, 0), 'monthly': (0, 1), 'yearly': (0, 12)}
+
+_SPECS = {
+    EXPENSE: {'model': Transaction, 'label': 'category', 'default_payment_method': None},
+    INCOME: {'model': Income, 'label': 'source', 'default_payment_method': 'Bank Transfer'},
+}
+
+
+# =============================================
+# SCHEDULES
+# =============================================
+
+def occurrence(rule, n):
+    """The ``n``-th occurrence of a rule (0 is ``start_date``), ignoring ``until``."""
+    days, months = FREQUENCIES[rule.frequency]
+    if days:
+        return rule.start_date + timedelta(days=n * days * rule.interval)
+    year, month = divmod(rule.start_date.year * 12 + rule.start_date.month - 1 + n * months * rule.interval, 12)
+    month += 1
+    return date(year, month, min(rule.start_date.day, calendar.monthrange(year, month)[1]))
+
+
+def _first_index(rule, day):
+    """Index of the rule's first occurrence on or after ``day``."""
+    start = rule.start_date
+    if day <= start:
+        return 0
+    days, months = FREQUENCIES[rule.frequency]
+    if days:
+        return -(-(day - start).days // (days * rule.interval))
+    n = ((day.year - start.year) * 12 + day.month - start.month) // (months * rule.interval)
+    while occurrence(rule, n) < day:
+        n += 1
+    return n
+
+
+def next_after(rule, day=None):
+    """The first occurrence after ``day`` (from the start if None), or None if the rule ends first."""
+    following = occurrence(rule, _first_index(rule, day + timedelta(days=1) if day else rule.start_date))
+    return following if rule.until is None or following <= rule.until else None
+
+
+def due_dates(rule, today):
+    """Occurrences from ``next_date`` through ``today`` (at most MAX_OCCURRENCES) and the one after them."""
+    n = _first_index(rule, rule.next_date)
+    days = []
+    day = occurrence(rule, n)
+    while day <= today and len(days) < MAX_OCCURRENCES and (rule.until is None or day <= rule.until):
+        days.append(day)
+        n += 1
+        day = occurrence(rule, n)
+    return days, (day if rule.until is None or day <= rule.until else None)
+
+
+def to_rrule(rule):
+    parts = [f'FREQ={rule.frequency.upper()}', f'INTERVAL={rule.interval}', f'DTSTART={rule.start_date:%Y%m%d}']
+    if rule.until:
+        parts.append(f'UNTIL={rule.until:%Y%m%d}')
+    return ';'.join(parts)
+
+
+def _rrule_date(value):
+    return datetime.strptime(value[:8], '%Y%m%d').date()
+
+
+def parse_rrule(text):
+    """Schedule fields of an RRULE string such as ``FREQ=MONTHLY;INTERVAL=1``. Raises ValueError."""
+    parts = dict(part.split('=', 1) for part in text.strip().removeprefix('RRULE:').split(';') if '=' in part)
+    unsupported = set(parts) - {'FREQ', 'INTERVAL', 'DTSTART', 'UNTIL'}
+    if unsupported:
+        raise ValueError(f"Unsupported rrule parts: {', '.join(sorted(unsupported))}")
+    if 'FREQ' not in parts:
+        raise ValueError('rrule must contain FREQ')
+    values = {'frequency': parts['FREQ'].lower(), 'interval': parts.get('INTERVAL', 1)}
+    if 'DTSTART' in parts:
+        values['start_date'] = _rrule_date(parts['DTSTART'])
+    if 'UNTIL' in parts:
+        values['until'] = _rrule_date(parts['UNTIL'])
+    return values
+
+
+# =============================================
+# RULES
+# =============================================
+
+def _date(value):
+    return datetime.strptime(value, '%Y-%m-%d').date() if value else None
+
+
+def values(data, rule=None):
+    """Validate request fields for a new rule (rule=None) or an update. Raises ValueError."""
+    kind = data.get('kind', rule.kind if rule else EXPENSE)
+    if kind not in _SPECS:
+        raise ValueError('kind must be expense or income')
+    if rule is not None and kind != rule.kind:
+        raise ValueError('kind cannot be changed')
+    spec = _SPECS[kind]
+    result = {'kind': kind}
+
+    if spec['label'] in data:
+        result['label'] = data[spec['label']]
+    if 'amount' in data:
+        result['amount'] = to_minor(data['amount'])
+        if result['amount'] <= 0:
+            raise ValueError('amount must be positive')
+    payment_method = data.get('paymentMethod', data.get('payment_method'))
+    if payment_method is not None:
+        result['payment_method'] = payment_method
+    if 'notes' in data:
+        result['notes'] = data['notes']
+
+    if data.get('rrule'):
+        result.update(parse_rrule(data['rrule']))
+    for field in ('frequency', 'interval'):
+        if field in data:
+            result[field] = data[field]
+    if data.get('start_date'):
+        result['start_date'] = _date(data['start_date'])
+    if 'until' in data:
+        result['until'] = _date(data['until'])
+
+    if 'frequency' in result and result['frequency'] not in FREQUENCIES:
+        raise ValueError(f"frequency must be one of {', '.join(FREQUENCIES)}")
+    if 'interval' in result:
+        if isinstance(result['interval'], bool) or not str(result['interval']).isdigit() \
+                or not 1 <= int(result['interval']) <= MAX_INTERVAL:
+            raise ValueError(f'interval must be between 1 and {MAX_INTERVAL}')
+        result['interval'] = int(result['interval'])
+
+    if rule is None:
+        result.setdefault('payment_method', spec['default_payment_method'])
+        result.setdefault('notes', '')
+        result.setdefault('interval', 1)
+        required = {spec['label']: 'label', 'amount': 'amount', 'paymentMethod': 'payment_method',
+                    'frequency': 'frequency', 'start_date': 'start_date'}
+        missing = [field for field, key in required.items() if not result.get(key)]
+        if missing:
+            raise ValueError(f"Missing required fields: {', '.join(missing)}")
+    elif not result.get('label', rule.label):
+        raise ValueError(f"{spec['label']} cannot be empty")
+
+    start = result.get('start_date', rule.start_date if rule else None)
+    until = result.get('until', rule.until if rule else None)
+    if until is not None and until < start:
+        raise ValueError('until must not be before start_date')
+    return result
+
+
+def apply(rule, changes):
+    """Set validated ``changes`` on a rule and reschedule the occurrences it has not created yet."""
+    for key, value in changes.items():
+        setattr(rule, key, value)
+    rule.next_date = next_after(rule, rule.last_date)
+
+
+def serialize(rule):
+    return {
+        'id': rule.id,
+        'kind': rule.kind,
+        _SPECS[rule.kind]['label']: rule.label,
+        **money.fields(amount=rule.amount),
+        'paymentMethod': rule.payment_method,
+        'notes': rule.notes,
+        'frequency': rule.frequency,
+        'interval': rule.interval,
+        'start_date': rule.start_date.strftime('%Y-%m-%d'),
+        'until': rule.until.strftime('%Y-%m-%d') if rule.until else None,
+        'next_date': rule.next_date.strftime('%Y-%m-%d') if rule.next_date else None,
+        'last_date': rule.last_date.strftime('%Y-%m-%d') if rule.last_date else None,
+        'rrule': to_rrule(rule),
+    }
+
+
+def detach(rule):
+    """Unlink the entries a rule created, so they outlive it. Does not commit."""
+    for spec in _SPECS.values():
+        model = spec['model']
+        model.query.filter(model.recurring_rule_id == rule.id).update(
+            {model.recurring_rule_id: None}, synchronize_session=False)
+
+
+# =============================================
+# MATERIALIZATION
+# =============================================
+
+_ADVANCE = db.update(RecurringRule.__table__).where(
+    RecurringRule.__table__.c.id == db.bindparam('b_id'),
+    RecurringRule.__table__.c.next_date == db.bindparam('b_from'),
+).values(next_date=db.bindparam('b_next'), last_date=db.bindparam('b_last'))
+
+
+def _row(rule, day):
+    return {
+        'user_id': rule.user_id, _SPECS[rule.kind]['label']: rule.label, 'amount': rule.amount, 'date': day,
+        'payment_method': rule.payment_method, 'notes': rule.notes or '', 'other_source': '',
+        'recurring_rule_id': rule.id,
+    }
+
+
+def _insert(rows):
+    """Bulk-insert rows per kind, skipping occurrences that already exist. Returns the rows inserted."""
+    try:
+        with db.session.begin_nested():
+            for kind, kind_rows in rows.items():
+                if kind_rows:
+                    db.session.execute(db.insert(_SPECS[kind]['model']), kind_rows)
+        return rows
+    except IntegrityError:
+        pass
+
+    # An overlapping run created some of them first
+    inserted = {}
+    for kind, kind_rows in rows.items():
+        model = _SPECS[kind]['model']
+        existing = set()
+        if kind_rows:
+            existing = set(db.session.execute(db.select(model.recurring_rule_id, model.date).where(
+                model.recurring_rule_id.in_({row['recurring_rule_id'] for row in kind_rows}),
+                model.date >= min(row['date'] for row in kind_rows),
+            )).all())
+        inserted[kind] = [row for row in kind_rows if (row['recurring_rule_id'], row['date']) not in existing]
+        if inserted[kind]:
+            db.session.execute(db.insert(model), inserted[kind])
+    return inserted
+
+
+def _materialize_chunk(rule_ids, today):
+    """Create the due occurrences of some rules in one transaction. Returns (entries created, user ids)."""
+    rules = RecurringRule.query.filter(RecurringRule.id.in_(rule_ids), RecurringRule.next_date <= today).all()
+    rows = {EXPENSE: [], INCOME: []}
+    advances = []
+    for rule in rules:
+        days, following = due_dates(rule, today)
+        rows[rule.kind].extend(_row(rule, day) for day in days)
+        advances.append({'b_id': rule.id, 'b_from': rule.next_date, 'b_next': following,
+                         'b_last': days[-1] if days else rule.last_date})
+
+    inserted = _insert(rows)
+    deltas = rollups.new_deltas()
+    events = defaultdict(list)
+    for kind, kind_rows in inserted.items():
+        make_event = achievements.expense_event if kind == EXPENSE else achievements.income_event
+        for row in kind_rows:
+            rollups.collect_row(deltas, kind, row)
+            events[row['user_id']].append(make_event(row['date'], row['amount']))
+    if advances:
+        db.session.execute(_ADVANCE, advances)
+    rollups.apply_deltas(deltas)
+    achievements.record_many({user_id: sorted(user_events, key=lambda e: e.day)
+                              for user_id, user_events in events.items()})
+    db.session.commit()
+    return sum(len(kind_rows) for kind_rows in inserted.values()), set(events)
+
+
+@task('recurring.materialize')
+@periodic('recurring.materialize', 'RECURRING_MATERIALIZE_SECONDS')
+def materialize(today=None, rule_id=None):
+    """Create the occurrences due by ``today`` (ISO date, default today) of one rule or of all rules.
+
+    Returns the number of entries created.
+    """
+    today = date.fromisoformat(today) if today else date.today()
+    due = db.session.query(RecurringRule.user_id, RecurringRule.id).filter(RecurringRule.next_date <= today)
+    if rule_id is not None:
+        due = due.filter(RecurringRule.id == rule_id)
+    # By user, so a user's rules are usually handled (and their bookkeeping done) in one chunk
+    rule_ids = [due_id for _, due_id in sorted(due)]
+
+    created = 0
+    for start in range(0, len(rule_ids), CHUNK_SIZE):
+        count, user_ids = _materialize_chunk(rule_ids[start:start + CHUNK_SIZE], today)
+        created += count
+        # Written outside of a request: deliver achievement notifications and drop cached responses here
+        outbox.flush()
+        for user_id in user_ids:
+            response_cache.bump(user_id)
+    return created
+
+
+recurring_cli = AppGroup('recurring', help='Maintain recurring expense and income rules.')
+
+
+@recurring_cli.command('materialize')
+@click.option('--today', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Create occurrences up to this date (default: today).')
+def materialize_command(today):
+    """Create the transactions and incomes of every due recurring rule."""
+    count = materialize(today.date().isoformat() if today else None)
+    click.echo(f'Created {count} recurring entries.')
@@ -0,0 +1,134 @@
+"""Read-replica routing.
+
+Replica URIs from SQLALCHEMY_REPLICA_URIS become the binds ``replica_0``,
+``replica_1``, ... Views decorated with ``@replicas.reads`` send their
+plain SELECTs to those binds, round-robin; everything else, and every
+statement outside such views (CLI, jobs), uses the primary. Once a
+request writes (flush, INSERT/UPDATE/DELETE, SELECT ... FOR UPDATE) the
+rest of it stays on the primary.
+
+Read-your-writes: after a successful write request, that user's reads go
+to the primary for REPLICA_READ_YOUR_WRITES_SECONDS. The window is kept
+per process, so run multi-process deployments with a window at least as
+long as the replication lag or with sticky routing per user.
+
+Locally, point SQLALCHEMY_REPLICA_URIS at a second SQLite file and copy
+the primary into it with ``flask replicas sync``.
+"""
+import itertools
+import sqlite3
+import threading
+import time
+from functools import wraps
+
+import click
+from flask import current_app, g, has_request_context, request
+from flask.cli import AppGroup
+from flask_jwt_extended import get_jwt_identity
+from flask_sqlalchemy.session import Session
+from sqlalchemy.engine import make_url
+
+WRITE_METHODS = {'POST', 'PUT', 'PATCH', 'DELETE'}
+
+
+class ReplicaRouter:
+    def __init__(self):
+        self.bind_keys = []
+        self.window = 0
+        self._next = itertools.count()
+        self._recent_writes = {}  # user_id -> time.monotonic() deadline
+        self._lock = threading.Lock()
+
+    def init_app(self, app):
+        """Register the replica binds. Call before ``db.init_app``."""
+        app.config.setdefault('SQLALCHEMY_REPLICA_URIS', [])
+        app.config.setdefault('REPLICA_READ_YOUR_WRITES_SECONDS', 5)
+        binds = dict(app.config.get('SQLALCHEMY_BINDS') or {})
+        self.bind_keys = []
+        for i, uri in enumerate(app.config['SQLALCHEMY_REPLICA_URIS']):
+            key = f'replica_{i}'
+            binds[key] = uri
+            self.bind_keys.append(key)
+        app.config['SQLALCHEMY_BINDS'] = binds
+        self.window = app.config['REPLICA_READ_YOUR_WRITES_SECONDS']
+        app.after_request(self._record_write)
+
+    def reads(self, view):
+        """Route a JWT-protected read view's SELECTs to a replica. Apply below ``@jwt_required()``."""
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            if self.bind_keys and not self.wrote_recently(get_jwt_identity()):
+                g.read_replica = True
+            return view(*args, **kwargs)
+        return wrapper
+
+    def use_primary(self):
+        """Send the rest of the current request to the primary."""
+        if has_request_context():
+            g.read_replica = False
+
+    def wrote_recently(self, user_id):
+        deadline = self._recent_writes.get(int(user_id))
+        return deadline is not None and deadline > time.monotonic()
+
+    def pick(self, engines):
+        key = self.bind_keys[next(self._next) % len(self.bind_keys)]
+        return engines[key]
+
+    def _record_write(self, response):
+        if not self.bind_keys or request.method not in WRITE_METHODS or response.status_code >= 400:
+            return response
+        try:
+            user_id = get_jwt_identity()
+        except RuntimeError:
+            return response
+        if user_id is not None:
+            now = time.monotonic()
+            with self._lock:
+                if len(self._recent_writes) > 10000:
+                    self._recent_writes = {u: d for u, d in self._recent_writes.items() if d > now}
+                self._recent_writes[int(user_id)] = now + self.window
+        return response
+
+
+replicas = ReplicaRouter()
+
+
+def _is_plain_select(clause):
+    return clause is not None and getattr(clause, 'is_select', False) and getattr(clause, '_for_update_arg', None) is None
+
+
+class RoutingSession(Session):
+    """Session that sends SELECTs to a replica when the current request allows it."""
+
+    def get_bind(self, mapper=None, clause=None, bind=None, **kwargs):
+        if bind is None and has_request_context() and g.get('read_replica'):
+            if not self._flushing and _is_plain_select(clause):
+                return replicas.pick(self._db.engines)
+            g.read_replica = False  # this request writes; keep it on the primary from now on
+        return super().get_bind(mapper=mapper, clause=clause, bind=bind, **kwargs)
+
+
+replicas_cli = AppGroup('replicas', help='Local read-replica helpers.')
+
+
+@replicas_cli.command('sync')
+def sync_command():
+    """Copy a SQLite primary into SQLite replicas (local testing only)."""
+    primary = make_url(current_app.config['SQLALCHEMY_DATABASE_URI'])
+    if primary.get_backend_name() != 'sqlite':
+        raise click.ClickException('replicas sync only supports SQLite; use real replication for other databases.')
+    source = sqlite3.connect(primary.database)
+    try:
+        for uri in current_app.config['SQLALCHEMY_REPLICA_URIS']:
+            replica = make_url(uri)
+            if replica.get_backend_name() != 'sqlite':
+                raise click.ClickException(f'{uri} is not a SQLite database.')
+            target = sqlite3.connect(replica.database)
+            try:
+                source.backup(target)
+            finally:
+                target.close()
+            click.echo(f'Copied {primary.database} -> {replica.database}')
+    finally:
+        source.close()
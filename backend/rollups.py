@@ -0,0 +1,347 @@
+"""Per-user monthly rollups of income and expense totals.
+
+Every write to ``transactions`` or ``incomes`` adjusts the matching
+``monthly_rollups`` bucket inside the same DB transaction, so the totals
+endpoints read a handful of small rows instead of scanning the user's
+whole history. Applying deltas also adjusts the users' balances and
+lifetime totals (see balances.py), marks the affected insight snapshots
+and forecast models stale and queues their refresh (see insights.py and
+forecast.py), and queues budget alerts for months whose spending grew
+(see budgets.py).
+Amounts are integer minor units (see money.py), so totals are exact and
+never need rounding.
+"""
+from collections import defaultdict
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy.exc import IntegrityError
+
+from extensions import db
+from models import MonthlyRollup, Transaction, Income, InsightSnapshot, ForecastState, Budget
+from periods import next_month
+from money import format_major
+import balances
+import jobs
+
+EXPENSE = 'expense'
+INCOME = 'income'
+
+# Budget alert, insight and forecast refresh jobs are coalesced per window (see jobs.enqueue_coalesced)
+REFRESH_WINDOW_SECONDS = 10
+
+_SOURCES = {
+    EXPENSE: (Transaction, Transaction.category),
+    INCOME: (Income, Income.source),
+}
+
+
+def new_deltas():
+    """Return an accumulator mapping rollup bucket -> [amount, count]."""
+    return defaultdict(lambda: [0, 0])
+
+
+def snapshot(kind, entry):
+    """Capture the bucket and amount of an entry before it is modified."""
+    category = entry.category if kind == EXPENSE else entry.source
+    key = (int(entry.user_id), entry.date.year, entry.date.month, kind, category, entry.payment_method)
+    return key, entry.amount
+
+
+def collect(deltas, kind, entry, sign=1):
+    """Add (sign=1) or remove (sign=-1) an entry's contribution to ``deltas``."""
+    key, amount = snapshot(kind, entry)
+    bucket = deltas[key]
+    bucket[0] += sign * amount
+    bucket[1] += sign
+
+
+def collect_row(deltas, kind, row, sign=1):
+    """Like ``collect`` but for a column dict, as used with bulk inserts."""
+    category = row['category'] if kind == EXPENSE else row['source']
+    key = (int(row['user_id']), row['date'].year, row['date'].month, kind, category, row['payment_method'])
+    bucket = deltas[key]
+    bucket[0] += sign * row['amount']
+    bucket[1] += sign
+
+
+def _by_periods(periods_by_user):
+    """Group users by their set of periods, so each group is invalidated with one UPDATE."""
+    groups = defaultdict(list)
+    for user_id, periods in periods_by_user.items():
+        groups[frozenset(periods)].append(user_id)
+    return groups
+
+
+def apply_deltas(deltas):
+    """Fold accumulated deltas into ``monthly_rollups``. Does not commit."""
+    changed = {key: (amount, count) for key, (amount, count) in deltas.items() if amount or count}
+    if len(changed) > 1:
+        _upsert_many(changed)
+    else:
+        for key, (amount, count) in changed.items():
+            _upsert(key, amount, count)
+
+    touched = defaultdict(set)
+    spent = defaultdict(set)
+    grew = defaultdict(set)
+    lifetime = defaultdict(lambda: [0, 0])  # user_id -> [income, expenses]
+    for (user_id, year, month, kind, *_), (amount, _) in changed.items():
+        # A month's insights also compare against the month before, so the next month goes stale too
+        touched[user_id].update({(year, month), next_month(year, month)})
+        lifetime[user_id][kind == EXPENSE] += amount
+        if kind == EXPENSE:
+            spent[user_id].add((year, month))
+            if amount > 0:
+                grew[user_id].add((year, month))
+    balances.adjust(lifetime)
+    queue_budget_alerts(grew)
+    for periods, user_ids in _by_periods(touched).items():
+        InsightSnapshot.invalidate_users(user_ids, periods)
+    queue_insight_refresh(touched)
+    for periods, user_ids in _by_periods(spent).items():
+        ForecastState.invalidate_users(user_ids, periods)
+    queue_forecast_refresh(spent)
+
+
+def totals_by_category(user_id, kind):
+    """All-time {category (or income source): total} for one user, from the rollups."""
+    rows = db.session.query(MonthlyRollup.category, db.func.sum(MonthlyRollup.total)).filter(
+        MonthlyRollup.user_id == int(user_id), MonthlyRollup.kind == kind
+    ).group_by(MonthlyRollup.category)
+    return {category: int(total) for category, total in rows if total}
+
+
+def queue_budget_alerts(periods_by_user):
+    """Queue the ``budgets.alerts`` job for {user_id: {(year, month)}} user-months that have a budget.
+
+    Called when spending grows or a budget changes. Does not commit.
+    """
+    periods = set().union(*periods_by_user.values()) if periods_by_user else set()
+    if not periods:
+        return
+    budgeted = db.session.query(Budget.user_id, Budget.year, Budget.month).filter(
+        Budget.user_id.in_(list(periods_by_user)), db.tuple_(Budget.year, Budget.month).in_(list(periods))
+    ).distinct()
+    for user_id, year, month in budgeted:
+        if (year, month) in periods_by_user[user_id]:
+            jobs.enqueue_coalesced('budgets.alerts', f'{user_id}:{year}-{month}',
+                                   {'user_id': user_id, 'year': year, 'month': month}, REFRESH_WINDOW_SECONDS)
+
+
+def queue_insight_refresh(periods_by_user):
+    """Queue a refresh of the {user_id: {(year, month)}} insight snapshots that exist. Does not commit.
+
+    Call it after ``InsightSnapshot.invalidate``; reads serve the stale snapshot until then.
+    """
+    periods = set().union(*periods_by_user.values()) if periods_by_user else set()
+    if not periods:
+        return
+    snapshots = db.session.query(InsightSnapshot.user_id, InsightSnapshot.year, InsightSnapshot.month).filter(
+        InsightSnapshot.user_id.in_(list(periods_by_user)),
+        db.tuple_(InsightSnapshot.year, InsightSnapshot.month).in_(list(periods))
+    )
+    for user_id, year, month in snapshots:
+        if (year, month) in periods_by_user[user_id]:
+            jobs.enqueue_coalesced('insights.refresh_stale', f'{user_id}:{year}-{month}',
+                                   {'user_id': user_id, 'year': year, 'month': month}, REFRESH_WINDOW_SECONDS)
+
+
+def queue_forecast_refresh(user_ids):
+    """Queue the ``forecast.refresh`` job for the given users that have forecast models. Does not commit."""
+    if not user_ids:
+        return
+    modelled = db.session.query(ForecastState.user_id).filter(
+        ForecastState.user_id.in_([int(user_id) for user_id in user_ids])
+    ).distinct()
+    for (user_id,) in modelled:
+        jobs.enqueue_coalesced('forecast.refresh', str(user_id), {'user_id': user_id}, REFRESH_WINDOW_SECONDS)
+
+
+def record_entry(kind, entry, sign=1):
+    """Apply a single created (sign=1) or deleted (sign=-1) entry."""
+    deltas = new_deltas()
+    collect(deltas, kind, entry, sign)
+    apply_deltas(deltas)
+
+
+def record_change(kind, before, entry):
+    """Apply an update, given the ``snapshot`` taken before the change."""
+    deltas = new_deltas()
+    old_key, old_amount = before
+    deltas[old_key][0] -= old_amount
+    deltas[old_key][1] -= 1
+    collect(deltas, kind, entry)
+    apply_deltas(deltas)
+
+
+_BUCKET_COLUMNS = ('user_id', 'year', 'month', 'kind', 'category', 'payment_method')
+
+# Built once so each upsert only binds parameters instead of rebuilding the expression.
+# A Core statement, so it can also run as an executemany (see _upsert_many).
+_ROLLUPS = MonthlyRollup.__table__
+_INCREMENT = db.update(_ROLLUPS).where(
+    *(_ROLLUPS.c[col] == db.bindparam(f'b_{col}') for col in _BUCKET_COLUMNS)
+).values({
+    _ROLLUPS.c.sum: _ROLLUPS.c.sum + db.bindparam('b_amount'),
+    _ROLLUPS.c.count: _ROLLUPS.c.count + db.bindparam('b_count'),
+})
+
+
+def _increment_params(key, amount, count):
+    params = {f'b_{col}': value for col, value in zip(_BUCKET_COLUMNS, key)}
+    params.update(b_amount=amount, b_count=count)
+    return params
+
+
+def _increment(key, amount, count):
+    return db.session.execute(_INCREMENT, _increment_params(key, amount, count)).rowcount
+
+
+def _upsert(key, amount, count):
+    if _increment(key, amount, count):
+        return
+
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(MonthlyRollup).values(
+                **dict(zip(_BUCKET_COLUMNS, key)), total=amount, count=count
+            ))
+    except IntegrityError:
+        # A concurrent request created the bucket first; add onto it instead.
+        _increment(key, amount, count)
+
+
+def _upsert_many(changed):
+    """``_upsert`` for many buckets: one SELECT of the existing ones, one executemany and one bulk INSERT."""
+    keys = list(changed)
+    existing = db.session.execute(db.select(*(_ROLLUPS.c[col] for col in _BUCKET_COLUMNS)).where(
+        _ROLLUPS.c.user_id.in_({key[0] for key in keys}),
+        _ROLLUPS.c.year.in_({key[1] for key in keys}),
+        _ROLLUPS.c.month.in_({key[2] for key in keys}),
+    ))
+    existing = {tuple(row) for row in existing}
+    updates = [_increment_params(key, *changed[key]) for key in keys if key in existing]
+    if updates:
+        db.session.execute(_INCREMENT, updates)
+
+    missing = [key for key in keys if key not in existing]
+    if not missing:
+        return
+    try:
+        with db.session.begin_nested():
+            db.session.execute(db.insert(MonthlyRollup), [
+                {**dict(zip(_BUCKET_COLUMNS, key)), 'total': changed[key][0], 'count': changed[key][1]}
+                for key in missing
+            ])
+    except IntegrityError:
+        # Some were created concurrently (or differ from a stored bucket only by collation)
+        for key in missing:
+            _upsert(key, *changed[key])
+
+
+# =============================================
+# READ HELPERS
+# =============================================
+
+def total(user_id, kind, year=None, month=None):
+    """Sum of a user's income or expenses, all-time or for one month."""
+    query = db.session.query(db.func.sum(MonthlyRollup.total)).filter(
+        MonthlyRollup.user_id == user_id,
+        MonthlyRollup.kind == kind
+    )
+    if year is not None:
+        query = query.filter(MonthlyRollup.year == year)
+    if month is not None:
+        query = query.filter(MonthlyRollup.month == month)
+    return int(query.scalar() or 0)  # MySQL returns SUM() of integers as DECIMAL
+
+
+# =============================================
+# REBUILD / VERIFY
+# =============================================
+
+def _raw_buckets(user_id=None):
+    """Aggregate the raw tables into {bucket: (amount, count)}."""
+    buckets = {}
+    for kind, (model, category_col) in _SOURCES.items():
+        year = db.extract('year', model.date)
+        month = db.extract('month', model.date)
+        query = db.session.query(
+            model.user_id, year, month, category_col, model.payment_method,
+            db.func.sum(model.amount), db.func.count(model.id)
+        )
+        if user_id is not None:
+            query = query.filter(model.user_id == user_id)
+        query = query.group_by(model.user_id, year, month, category_col, model.payment_method)
+        for uid, y, m, category, payment_method, amount, count in query:
+            buckets[(uid, int(y), int(m), kind, category, payment_method)] = (int(amount or 0), count)
+    return buckets
+
+
+def _stored_buckets(user_id=None):
+    query = MonthlyRollup.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    return {
+        (r.user_id, r.year, r.month, r.kind, r.category, r.payment_method): (r.total, r.count)
+        for r in query if r.count
+    }
+
+
+def rebuild(user_id=None):
+    """Recompute rollups from the raw tables. Returns the number of buckets written."""
+    buckets = _raw_buckets(user_id)
+    query = MonthlyRollup.query
+    if user_id is not None:
+        query = query.filter_by(user_id=user_id)
+    query.delete(synchronize_session=False)
+    snapshots = InsightSnapshot.query
+    if user_id is not None:
+        snapshots = snapshots.filter_by(user_id=user_id)
+    snapshots.update({InsightSnapshot.stale: True, InsightSnapshot.generation: InsightSnapshot.generation + 1},
+                     synchronize_session=False)
+    if buckets:
+        db.session.execute(db.insert(MonthlyRollup), [{
+            'user_id': uid, 'year': y, 'month': m, 'kind': kind,
+            'category': category, 'payment_method': payment_method,
+            'total': amount, 'count': count
+        } for (uid, y, m, kind, category, payment_method), (amount, count) in buckets.items()])
+    db.session.commit()
+    return len(buckets)
+
+
+def verify(user_id=None):
+    """Compare stored rollups with the raw tables. Returns a list of mismatched buckets."""
+    expected = _raw_buckets(user_id)
+    stored = _stored_buckets(user_id)
+    mismatches = []
+    for key in expected.keys() | stored.keys():
+        want = expected.get(key, (0, 0))
+        have = stored.get(key, (0, 0))
+        if want != have:
+            mismatches.append((key, want, have))
+    return mismatches
+
+
+rollups_cli = AppGroup('rollups', help='Maintain the monthly_rollups table.')
+
+
+@rollups_cli.command('rebuild')
+@click.option('--user-id', type=int, default=None, help='Only rebuild this user.')
+def rebuild_command(user_id):
+    """Rebuild monthly rollups from transactions and incomes."""
+    count = rebuild(user_id)
+    click.echo(f'Rebuilt {count} rollup buckets.')
+
+
+@rollups_cli.command('verify')
+@click.option('--user-id', type=int, default=None, help='Only verify this user.')
+def verify_command(user_id):
+    """Check monthly rollups against transactions and incomes."""
+    mismatches = verify(user_id)
+    for key, want, have in sorted(mismatches, key=lambda m: m[0]):
+        click.echo(f'{key}: expected {format_major(want[0])} ({want[1]} rows), stored {format_major(have[0])} ({have[1]} rows)')
+    if mismatches:
+        raise click.ClickException(f'{len(mismatches)} rollup buckets out of sync; run `flask rollups rebuild`.')
+    click.echo('Rollups are in sync.')
@@ -1,11 +1,37 @@
-from flask import Blueprint, jsonify, request, abort, current_app
+from flask import Blueprint, Response, jsonify, request, abort, stream_with_context
 from flask_jwt_extended import create_access_token, jwt_required, get_jwt_identity
-from werkzeug.utils import secure_filename
 from datetime import datetime, timedelta
 from collections import defaultdict
+import csv
+import io
+import json
 import os
-from extensions import db, bcrypt
-from models import User, Transaction, Income, PasswordResetToken, Budget, SavingGoal, Notification, Achievement
+from extensions import db
+from models import User, Transaction, Income, PasswordResetToken, Budget, SavingGoal, Notification, Achievement, InsightSnapshot, RecurringRule
+import rollups
+from rollups import EXPENSE, INCOME
+from periods import range_bounds, in_period
+from pagination import DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE, page_args, paginate
+import importer
+import batch
+from aggregates import PeriodAggregates
+import jobs
+import uploads
+from notifications import outbox
+from passwords import hasher
+import money
+from money import to_minor
+from profiles import current_profile
+from cache import response_cache
+from replicas import replicas
+import achievements
+import insights
+import analytics
+import forecast
+import search
+import recurring
+import balances
+from achievements import entry_events, budget_event, goal_event
 
 api_bp = Blueprint('api', __name__)
 
@@ -18,6 +44,8 @@ def login():
     user = User.query.filter_by(email=email).first()
     
     if user and user.check_password(password):
+        if user.password_needs_rehash():
+            hasher.upgrade(user, password)  # BCRYPT_LOG_ROUNDS changed since this hash was stored
         access_token = create_access_token(identity=str(user.id))  # Create a JWT token
         return jsonify({"message": "Login successful", "token": access_token}), 200
     return jsonify({"error": "Invalid email or password"}), 401
@@ -43,10 +71,12 @@ def signup():
     if existing_user:
         return jsonify({"error": "Username or email already exists"}), 400
 
+    # Hash outside the try: a full hash pool is answered with 503, not reported as a failed signup
+    new_user = User(username=username, full_name=full_name, email=email)
+    new_user.set_password(password)
+
     # Attempt to create the user
     try:
-        new_user = User(username=username, full_name=full_name, email=email)
-        new_user.set_password(password)
         db.session.add(new_user)
         db.session.commit()
     except Exception as e:
@@ -74,8 +104,8 @@ def reset_password():
     if not user:
         return jsonify({"error": "User not found"}), 404
 
+    user.set_password(new_password)
     try:
-        user.set_password(new_password)
         db.session.commit()
     except Exception as e:
         db.session.rollback()
@@ -86,44 +116,33 @@ def reset_password():
 
 @api_bp.route('/user-data', methods=['GET'])
 @jwt_required()
+@response_cache.cached
+@replicas.reads
 def get_user_data():
-    user_id = get_jwt_identity()  # Retrieve the user ID from the JWT token
-
-    # Fetch the user from the database
-    user = User.query.get(user_id)
+    user = current_profile()  # Cached profile of the JWT identity
     if not user:
         return jsonify({"error": "User not found"}), 404
 
-    # Get the current month and year
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    return jsonify(_user_summary(user, _current_aggregates(user.id)))
+
+
+def _current_aggregates(user_id):
+    today = datetime.now()
+    return PeriodAggregates(user_id, today.year, today.month)
 
-    # Calculate all-time income and expenses for accurate balance
-    total_income = db.session.query(db.func.sum(Income.amount)).filter(
-        Income.user_id == user.id
-    ).scalar() or 0.0
 
-    total_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user.id
-    ).scalar() or 0.0
+def _user_summary(user, aggregates):
+    # Balance and all-time totals are kept on the user's row (see balances.py)
+    balance = balances.get(user.id)
 
     # Also calculate monthly for reference
-    total_monthly_income = db.session.query(db.func.sum(Income.amount)).filter(
-        Income.user_id == user.id,
-        db.extract('month', Income.date) == current_month,
-        db.extract('year', Income.date) == current_year
-    ).scalar() or 0.0
-
-    total_monthly_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user.id,
-        db.extract('month', Transaction.date) == current_month,
-        db.extract('year', Transaction.date) == current_year
-    ).scalar() or 0.0
+    total_monthly_income = aggregates.total(INCOME)
+    total_monthly_expenses = aggregates.total(EXPENSE)
 
     # Get the recent transactions (last 5)
     recent_transactions = [
-        {"category": transaction.category, "amount": transaction.amount}
-        for transaction in user.transactions.order_by(Transaction.date.desc()).limit(5).all()
+        {"category": transaction.category, **money.fields(amount=transaction.amount)}
+        for transaction in Transaction.query.filter_by(user_id=user.id).order_by(Transaction.date.desc()).limit(5).all()
     ]
 
     # Prepare the response data
@@ -132,17 +151,18 @@ def get_user_data():
         "email": user.email,
         "gender": user.gender,
         "profilePic": user.profile_pic,
+        "profilePicThumbnails": uploads.thumbnails(user.profile_pic),
         "qualifications": user.qualifications,
-        "accountBalance": total_income - total_expenses,
-        "totalIncome": total_income,
-        "totalExpenses": total_expenses,
+        **money.fields(accountBalance=balance.balance,
+                       totalIncome=balance.income,
+                       totalExpenses=balance.expenses,
+                       totalMonthlyIncome=total_monthly_income,
+                       totalMonthlyExpenses=total_monthly_expenses),
         "createdAt": user.created_at,
-        "recentTransactions": recent_transactions,
-        "totalMonthlyIncome": total_monthly_income,
-        "totalMonthlyExpenses": total_monthly_expenses
+        "recentTransactions": recent_transactions
     }
 
-    return jsonify(user_data)
+    return user_data
     
 @api_bp.route('/update-profile', methods=['POST'])
 @jwt_required()
@@ -159,14 +179,18 @@ def update_profile():
     user.email = request.form.get('email', user.email)
     user.gender = request.form.get('gender', user.gender)
 
-    # Process and save the profile image
+    # Stream the profile image to its content-addressed name; thumbnails are made in the background
     if 'profileImage' in request.files:
         file = request.files['profileImage']
         if file:
-            filename = secure_filename(file.filename)
-            file_path = os.path.join(current_app.config['UPLOAD_FOLDER'], filename)
-            file.save(file_path)
-            user.profile_pic = file_path
+            try:
+                name = uploads.store(file)
+            except ValueError as e:
+                db.session.rollback()
+                return jsonify({"error": str(e)}), 400
+            user.profile_pic = uploads.url(name)
+            if uploads.pending_thumbnails(name):
+                jobs.enqueue('uploads.make_thumbnails', {'name': name})
 
     # Save changes to the database
     try:
@@ -182,6 +206,7 @@ def update_profile():
         "email": user.email,
         "gender": user.gender,
         "profilePic": user.profile_pic,  # Note: Match frontend field names
+        "profilePicThumbnails": uploads.thumbnails(user.profile_pic),
         "createdAt": user.created_at
     }), 200
 
@@ -198,7 +223,7 @@ def add_income():
         return jsonify({'error': 'Missing required fields'}), 400
 
     try:
-        amount = float(data['amount'])
+        amount = to_minor(data['amount'])
         date_received = datetime.strptime(data['date'], '%Y-%m-%d').date()
 
         # Create a new income entry and associate it with the user_id
@@ -214,6 +239,8 @@ def add_income():
 
         # Add the income entry to the database and commit the transaction
         db.session.add(income_entry)
+        rollups.record_entry(INCOME, income_entry)
+        achievements.record(user_id, entry_events(INCOME, None, income_entry))
         db.session.commit()
 
         # Return success response with the added income data
@@ -227,46 +254,56 @@ def add_income():
 # Endpoint to get the user's income data (total income and recent income)
 @api_bp.route('/get-user-income', methods=['GET'])
 @jwt_required()
+@replicas.reads
 def get_user_income():
     user_id = get_jwt_identity()  # Retrieve the user ID from the JWT token
 
     try:
-        # Calculate total monthly income
-        today = datetime.today()
-        first_day_of_month = today.replace(day=1)
-        
-        total_income = db.session.query(db.func.sum(Income.amount)).filter(
-            Income.user_id == user_id,
-            Income.date >= first_day_of_month
-        ).scalar() or 0.0  # Default to 0.0 if no income for the month
-
-        # Calculate all-time total income
-        all_time_income = db.session.query(db.func.sum(Income.amount)).filter(
-            Income.user_id == user_id
-        ).scalar() or 0.0
-
-        # Get all income entries
-        recent_income = Income.query.filter(Income.user_id == user_id).order_by(Income.date.desc()).all()
-
-        # Prepare the response data
-        recent_income_data = [{
-            'id': income.id,
-            'source': income.source,
-            'amount': income.amount,
-            'date': income.date.strftime('%Y-%m-%d'),
-            'paymentMethod': income.payment_method,
-            'notes': income.notes,
-            'otherSource': income.other_source
-        } for income in recent_income]
+        limit, after = page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        return jsonify({
-            'totalMonthlyIncome': total_income,
-            'totalIncome': all_time_income,
-            'recentIncome': recent_income_data
-        }), 200
+    try:
+        aggregates = _current_aggregates(user_id) if after is None else None
+        return jsonify(_income_page(user_id, limit, after, aggregates)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
+
+def _category_totals(user_id, kind):
+    # All-time totals per category (or income source), so clients never sum the paged rows themselves
+    totals = rollups.totals_by_category(user_id, kind)
+    response = {'categoryTotals': {category: money.to_major(total) for category, total in totals.items()}}
+    if money.wants_minor_units():
+        response['categoryTotalsMinor'] = totals
+    return response
+
+
+def _income_page(user_id, limit, after, aggregates=None):
+    # Get one page of income entries, newest first
+    recent_income, next_cursor = paginate(Income.query.filter(Income.user_id == user_id), Income, limit, after)
+
+    # Prepare the response data
+    recent_income_data = [{
+        'id': income.id,
+        'source': income.source,
+        **money.fields(amount=income.amount),
+        'date': income.date.strftime('%Y-%m-%d'),
+        'paymentMethod': income.payment_method,
+        'notes': income.notes,
+        'otherSource': income.other_source
+    } for income in recent_income]
+
+    response = {'recentIncome': recent_income_data, 'next_cursor': next_cursor}
+
+    # Totals come from the rollups and the user's row and are only sent with the first page
+    if after is None:
+        response.update(money.fields(totalMonthlyIncome=aggregates.total(INCOME),
+                                     totalIncome=balances.get(user_id).income))
+        response.update(_category_totals(user_id, INCOME))
+
+    return response
+
 @api_bp.route('/add-expense', methods=['POST'])
 @jwt_required()  # Protect this route with JWT
 def add_expense():
@@ -279,7 +316,7 @@ def add_expense():
         return jsonify({'error': 'Missing required fields'}), 400
 
     try:
-        amount = float(data['amount'])
+        amount = to_minor(data['amount'])
         date_spent = datetime.strptime(data['date'], '%Y-%m-%d').date()
 
         # Create a new expense entry associated with the authenticated user
@@ -295,6 +332,8 @@ def add_expense():
 
         # Add the expense entry to the database and commit the transaction
         db.session.add(expense_entry)
+        rollups.record_entry(EXPENSE, expense_entry)
+        achievements.record(user_id, entry_events(EXPENSE, None, expense_entry))
         db.session.commit()
 
         # Return success response with the added expense data
@@ -308,78 +347,77 @@ def add_expense():
 # Endpoint to get the user's expense data (total expenses and recent expenses)
 @api_bp.route('/get-user-expenses', methods=['GET'])
 @jwt_required()
+@replicas.reads
 def get_user_expenses():
     user_id = get_jwt_identity()  # Retrieve the user ID from the JWT token
 
     try:
-        # Calculate total monthly expenses
-        today = datetime.today()
-        first_day_of_month = today.replace(day=1)
-        
-        total_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            Transaction.date >= first_day_of_month
-        ).scalar() or 0.0  # Default to 0.0 if no expenses for the month
-
-        # Calculate all-time total expenses
-        all_time_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id
-        ).scalar() or 0.0
-
-        # Get all expense entries
-        recent_expenses = Transaction.query.filter(
-            Transaction.user_id == user_id
-        ).order_by(Transaction.date.desc()).all()
-
-        # Prepare the response data
-        recent_expense_data = [{
-            'id': expense.id,
-            'category': expense.category,
-            'amount': expense.amount,
-            'paymentMethod': expense.payment_method,
-            'notes': expense.notes,
-            'otherSource': expense.other_source,
-            'date': expense.date.strftime('%Y-%m-%d')
-        } for expense in recent_expenses]
+        limit, after = page_args(request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-        return jsonify({
-            'totalMonthlyExpenses': total_expenses,
-            'totalExpenses': all_time_expenses,
-            'recentExpenses': recent_expense_data
-        }), 200
+    try:
+        aggregates = _current_aggregates(user_id) if after is None else None
+        return jsonify(_expense_page(user_id, limit, after, aggregates)), 200
     except Exception as e:
         return jsonify({'error': str(e)}), 500
 
 
+def _expense_page(user_id, limit, after, aggregates=None):
+    # Get one page of expense entries, newest first
+    recent_expenses, next_cursor = paginate(
+        Transaction.query.filter(Transaction.user_id == user_id), Transaction, limit, after
+    )
+
+    # Prepare the response data
+    recent_expense_data = [{
+        'id': expense.id,
+        'category': expense.category,
+        **money.fields(amount=expense.amount),
+        'paymentMethod': expense.payment_method,
+        'notes': expense.notes,
+        'otherSource': expense.other_source,
+        'date': expense.date.strftime('%Y-%m-%d')
+    } for expense in recent_expenses]
+
+    response = {'recentExpenses': recent_expense_data, 'next_cursor': next_cursor}
+
+    # Totals come from the rollups and the user's row and are only sent with the first page
+    if after is None:
+        response.update(money.fields(totalMonthlyExpenses=aggregates.total(EXPENSE),
+                                     totalExpenses=balances.get(user_id).expenses))
+        response.update(_category_totals(user_id, EXPENSE))
+
+    return response
+
+
 # =============================================
 # BUDGET ROUTES
 # =============================================
 
-def create_notification(user_id, message, notification_type='info'):
-    """Helper to create a notification."""
-    notification = Notification(
-        user_id=user_id,
-        message=message,
-        type=notification_type
-    )
-    db.session.add(notification)
-    db.session.commit()
+def create_notification(user_id, message, notification_type='info', dedup_key=None):
+    """Helper to queue a notification; it is written when the request finishes."""
+    outbox.add(user_id, message, notification_type, dedup_key)
 
 
 @api_bp.route('/budgets', methods=['GET'])
 @jwt_required()
+@response_cache.cached
+@replicas.reads
 def get_budgets():
     user_id = get_jwt_identity()
+    return jsonify({'budgets': _budget_list(user_id)}), 200
+
+
+def _budget_list(user_id):
     budgets = Budget.query.filter_by(user_id=user_id).all()
-    return jsonify({
-        'budgets': [{
-            'id': b.id,
-            'category': b.category or '',
-            'amount': b.amount,
-            'month': b.month,
-            'year': b.year
-        } for b in budgets]
-    }), 200
+    return [{
+        'id': b.id,
+        'category': b.category or '',
+        **money.fields(amount=b.amount),
+        'month': b.month,
+        'year': b.year
+    } for b in budgets]
 
 
 @api_bp.route('/budgets', methods=['POST'])
@@ -395,19 +433,24 @@ def add_budget():
         budget = Budget(
             user_id=user_id,
             category=data.get('category', ''),
-            amount=float(data['amount']),
+            amount=to_minor(data['amount']),
             month=data.get('month', datetime.now().month),
             year=data.get('year', datetime.now().year)
         )
         db.session.add(budget)
+        InsightSnapshot.invalidate(user_id, [(int(budget.year), int(budget.month))])
+        rollups.queue_insight_refresh({int(user_id): {(int(budget.year), int(budget.month))}})
+        rollups.queue_budget_alerts({int(user_id): {(int(budget.year), int(budget.month))}})
+        achievements.record(user_id, [budget_event()])
         db.session.commit()
 
-        create_notification(user_id, f"Budget created: ₹{budget.amount} for {budget.category or 'Total'}", 'budget_created')
+        create_notification(user_id, f"Budget created: ₹{money.format_major(budget.amount)} for {budget.category or 'Total'}", 'budget_created',
+                            dedup_key=f'budget:{budget.id}')
 
         return jsonify({
             'id': budget.id,
             'category': budget.category or '',
-            'amount': budget.amount,
+            **money.fields(amount=budget.amount),
             'month': budget.month,
             'year': budget.year
         }), 201
@@ -427,16 +470,22 @@ def update_budget(budget_id):
 
     data = request.get_json()
     try:
+        old_period = (budget.year, budget.month)
         budget.category = data.get('category', budget.category)
-        budget.amount = float(data.get('amount', budget.amount))
+        if 'amount' in data:
+            budget.amount = to_minor(data['amount'])
         budget.month = data.get('month', budget.month)
         budget.year = data.get('year', budget.year)
+        InsightSnapshot.invalidate(user_id, [old_period, (int(budget.year), int(budget.month))])
+        rollups.queue_insight_refresh({int(user_id): {old_period, (int(budget.year), int(budget.month))}})
+        rollups.queue_budget_alerts({int(user_id): {(int(budget.year), int(budget.month))}})
+        achievements.record(user_id, [budget_event()])
         db.session.commit()
 
         return jsonify({
             'id': budget.id,
             'category': budget.category or '',
-            'amount': budget.amount,
+            **money.fields(amount=budget.amount),
             'month': budget.month,
             'year': budget.year
         }), 200
@@ -456,6 +505,9 @@ def delete_budget(budget_id):
 
     try:
         db.session.delete(budget)
+        InsightSnapshot.invalidate(user_id, [(budget.year, budget.month)])
+        rollups.queue_insight_refresh({int(user_id): {(budget.year, budget.month)}})
+        achievements.record(user_id, [budget_event()])
         db.session.commit()
         return jsonify({'message': 'Budget deleted successfully'}), 200
     except Exception as e:
@@ -465,53 +517,28 @@ def delete_budget(budget_id):
 
 @api_bp.route('/budget-analysis', methods=['GET'])
 @jwt_required()
+@response_cache.cached
+@replicas.reads
 def budget_analysis():
     user_id = get_jwt_identity()
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    return jsonify({'budget_analysis': _budget_analysis(_current_aggregates(user_id))}), 200
 
-    budgets = Budget.query.filter_by(
-        user_id=user_id, month=current_month, year=current_year
-    ).all()
 
+def _budget_analysis(aggregates):
     analysis = []
-    for budget in budgets:
-        # Calculate spending for this category
-        query = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            db.extract('month', Transaction.date) == current_month,
-            db.extract('year', Transaction.date) == current_year
-        )
-        if budget.category:
-            query = query.filter(Transaction.category == budget.category)
-
-        spent = query.scalar() or 0.0
-        remaining = budget.amount - spent
-        percentage = (spent / budget.amount * 100) if budget.amount > 0 else 0
+    for evaluation in aggregates.budget_evaluations():
+        budget = evaluation['budget']
+        spent = evaluation['spent']
+        remaining = evaluation['remaining']
+        percentage = evaluation['percentage']
 
         analysis.append({
             'category': budget.category or 'Total',
-            'budgeted': budget.amount,
-            'spent': spent,
-            'remaining': remaining,
+            **money.fields(budgeted=budget.amount, spent=spent, remaining=remaining),
             'percentage': round(percentage, 1)
         })
 
-        # Auto-generate budget warning notifications
-        if percentage >= 90 and percentage < 100:
-            create_notification(
-                user_id,
-                f"⚠️ You've used {percentage:.0f}% of your {budget.category or 'total'} budget!",
-                'budget_warning'
-            )
-        elif percentage >= 100:
-            create_notification(
-                user_id,
-                f"🚨 Budget exceeded! You've spent ₹{spent:.2f} against ₹{budget.amount:.2f} {budget.category or 'total'} budget.",
-                'budget_exceeded'
-            )
-
-    return jsonify({'budget_analysis': analysis}), 200
+    return analysis
 
 
 # =============================================
@@ -520,19 +547,22 @@ def budget_analysis():
 
 @api_bp.route('/saving-goals', methods=['GET'])
 @jwt_required()
+@response_cache.cached
+@replicas.reads
 def get_saving_goals():
     user_id = get_jwt_identity()
+    return jsonify({'saving_goals': _saving_goal_list(user_id)}), 200
+
+
+def _saving_goal_list(user_id):
     goals = SavingGoal.query.filter_by(user_id=user_id).order_by(SavingGoal.created_at.desc()).all()
-    return jsonify({
-        'saving_goals': [{
-            'id': g.id,
-            'title': g.title,
-            'target_amount': g.target_amount,
-            'current_amount': g.current_amount,
-            'target_date': g.target_date.strftime('%Y-%m-%d'),
-            'completed': g.completed
-        } for g in goals]
-    }), 200
+    return [{
+        'id': g.id,
+        'title': g.title,
+        **money.fields(target_amount=g.target_amount, current_amount=g.current_amount),
+        'target_date': g.target_date.strftime('%Y-%m-%d'),
+        'completed': g.completed
+    } for g in goals]
 
 
 @api_bp.route('/saving-goals', methods=['POST'])
@@ -548,21 +578,22 @@ def add_saving_goal():
         goal = SavingGoal(
             user_id=user_id,
             title=data['title'],
-            target_amount=float(data['target_amount']),
-            current_amount=float(data.get('current_amount', 0)),
+            target_amount=to_minor(data['target_amount']),
+            current_amount=to_minor(data.get('current_amount', 0)),
             target_date=datetime.strptime(data['target_date'], '%Y-%m-%d').date(),
             completed=False
         )
         db.session.add(goal)
+        achievements.record(user_id, [goal_event(False)])
         db.session.commit()
 
-        create_notification(user_id, f"🎯 New saving goal created: {goal.title} - ₹{goal.target_amount}", 'goal_created')
+        create_notification(user_id, f"🎯 New saving goal created: {goal.title} - ₹{money.format_major(goal.target_amount)}", 'goal_created',
+                            dedup_key=f'goal:{goal.id}')
 
         return jsonify({
             'id': goal.id,
             'title': goal.title,
-            'target_amount': goal.target_amount,
-            'current_amount': goal.current_amount,
+            **money.fields(target_amount=goal.target_amount, current_amount=goal.current_amount),
             'target_date': goal.target_date.strftime('%Y-%m-%d'),
             'completed': goal.completed
         }), 201
@@ -583,8 +614,10 @@ def update_saving_goal(goal_id):
     data = request.get_json()
     try:
         goal.title = data.get('title', goal.title)
-        goal.target_amount = float(data.get('target_amount', goal.target_amount))
-        goal.current_amount = float(data.get('current_amount', goal.current_amount))
+        if 'target_amount' in data:
+            goal.target_amount = to_minor(data['target_amount'])
+        if 'current_amount' in data:
+            goal.current_amount = to_minor(data['current_amount'])
         if data.get('target_date'):
             goal.target_date = datetime.strptime(data['target_date'], '%Y-%m-%d').date()
 
@@ -592,15 +625,16 @@ def update_saving_goal(goal_id):
         if goal.current_amount >= goal.target_amount:
             if not goal.completed:
                 goal.completed = True
-                create_notification(user_id, f"🎉 Congratulations! You've reached your saving goal: {goal.title}!", 'goal_completed')
+                create_notification(user_id, f"🎉 Congratulations! You've reached your saving goal: {goal.title}!", 'goal_completed',
+                                    dedup_key=f'goal:{goal.id}')
 
+        achievements.record(user_id, [goal_event(goal.completed)])
         db.session.commit()
 
         return jsonify({
             'id': goal.id,
             'title': goal.title,
-            'target_amount': goal.target_amount,
-            'current_amount': goal.current_amount,
+            **money.fields(target_amount=goal.target_amount, current_amount=goal.current_amount),
             'target_date': goal.target_date.strftime('%Y-%m-%d'),
             'completed': goal.completed
         }), 200
@@ -627,27 +661,119 @@ def delete_saving_goal(goal_id):
         return jsonify({'error': str(e)}), 500
 
 
+# =============================================
+# RECURRING RULE ROUTES
+# =============================================
+
+@api_bp.route('/recurring-rules', methods=['GET'])
+@jwt_required()
+@response_cache.cached
+@replicas.reads
+def get_recurring_rules():
+    user_id = get_jwt_identity()
+    rules = RecurringRule.query.filter_by(user_id=user_id).order_by(RecurringRule.created_at.desc()).all()
+    return jsonify({'recurring_rules': [recurring.serialize(rule) for rule in rules]}), 200
+
+
+def _enqueue_due(rule):
+    # Occurrences due already are created by the worker rather than in the request
+    if rule.next_date is not None and rule.next_date <= datetime.now().date():
+        jobs.enqueue('recurring.materialize', {'rule_id': rule.id})
+
+
+@api_bp.route('/recurring-rules', methods=['POST'])
+@jwt_required()
+def add_recurring_rule():
+    """Create a rule. The schedule is ``frequency``, ``interval``, ``start_date`` and ``until``, or an ``rrule``."""
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    try:
+        changes = recurring.values(data)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        rule = RecurringRule(user_id=user_id)
+        recurring.apply(rule, changes)
+        db.session.add(rule)
+        db.session.flush()
+        _enqueue_due(rule)
+        db.session.commit()
+        return jsonify(recurring.serialize(rule)), 201
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route('/recurring-rules/<int:rule_id>', methods=['PUT'])
+@jwt_required()
+def update_recurring_rule(rule_id):
+    """Change a rule. Entries created already are kept; the new values apply from ``next_date`` on."""
+    user_id = get_jwt_identity()
+    rule = RecurringRule.query.filter_by(id=rule_id, user_id=user_id).first()
+
+    if not rule:
+        return jsonify({'error': 'Recurring rule not found'}), 404
+
+    try:
+        changes = recurring.values(request.get_json(silent=True) or {}, rule)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        recurring.apply(rule, changes)
+        _enqueue_due(rule)
+        db.session.commit()
+        return jsonify(recurring.serialize(rule)), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+@api_bp.route('/recurring-rules/<int:rule_id>', methods=['DELETE'])
+@jwt_required()
+def delete_recurring_rule(rule_id):
+    """Delete a rule. The transactions and incomes it created are kept."""
+    user_id = get_jwt_identity()
+    rule = RecurringRule.query.filter_by(id=rule_id, user_id=user_id).first()
+
+    if not rule:
+        return jsonify({'error': 'Recurring rule not found'}), 404
+
+    try:
+        recurring.detach(rule)
+        db.session.delete(rule)
+        db.session.commit()
+        return jsonify({'message': 'Recurring rule deleted successfully'}), 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
 # =============================================
 # NOTIFICATION ROUTES
 # =============================================
 
 @api_bp.route('/notifications', methods=['GET'])
 @jwt_required()
+@replicas.reads
 def get_notifications():
     user_id = get_jwt_identity()
+    return jsonify({'notifications': _notification_list(user_id)}), 200
+
+
+def _notification_list(user_id):
     notifications = Notification.query.filter_by(user_id=user_id).order_by(
         Notification.created_at.desc()
     ).limit(50).all()
 
-    return jsonify({
-        'notifications': [{
-            'id': n.id,
-            'message': n.message,
-            'type': n.type,
-            'read': n.read,
-            'created_at': n.created_at.isoformat()
-        } for n in notifications]
-    }), 200
+    return [{
+        'id': n.id,
+        'message': n.message,
+        'type': n.type,
+        'read': n.read,
+        'created_at': n.created_at.isoformat()
+    } for n in notifications]
 
 
 @api_bp.route('/notifications/mark-read', methods=['POST'])
@@ -682,103 +808,25 @@ def mark_notifications_read():
 
 @api_bp.route('/achievements', methods=['GET'])
 @jwt_required()
+@replicas.reads
 def get_achievements():
     user_id = get_jwt_identity()
+    return jsonify({'achievements': _achievement_list(user_id)}), 200
 
-    # Auto-check and award achievements
-    _check_and_award_achievements(user_id)
 
-    achievements = Achievement.query.filter_by(user_id=user_id).order_by(
+def _achievement_list(user_id):
+    # Badges are awarded by the achievement engine on writes, so this is a plain read
+    earned = Achievement.query.filter_by(user_id=user_id).order_by(
         Achievement.date_earned.desc()
     ).all()
 
-    return jsonify({
-        'achievements': [{
-            'id': a.id,
-            'title': a.title,
-            'description': a.description,
-            'badge_type': a.badge_type,
-            'date_earned': a.date_earned.isoformat()
-        } for a in achievements]
-    }), 200
-
-
-def _check_and_award_achievements(user_id):
-    """Check and award new achievements based on user activity."""
-    existing_badges = {a.badge_type for a in Achievement.query.filter_by(user_id=user_id).all()}
-
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-
-    # 1. Budget Master - stayed under budget for current month
-    if 'budget_master' not in existing_badges:
-        budgets = Budget.query.filter_by(user_id=user_id, month=current_month, year=current_year).all()
-        if budgets:
-            all_under = True
-            for budget in budgets:
-                query = db.session.query(db.func.sum(Transaction.amount)).filter(
-                    Transaction.user_id == user_id,
-                    db.extract('month', Transaction.date) == current_month,
-                    db.extract('year', Transaction.date) == current_year
-                )
-                if budget.category:
-                    query = query.filter(Transaction.category == budget.category)
-                spent = query.scalar() or 0.0
-                if spent > budget.amount:
-                    all_under = False
-                    break
-            if all_under:
-                _award_achievement(user_id, 'budget_master', 'Budget Master',
-                                   'Stayed within all budgets for a full month!')
-
-    # 2. Saving Goal Achieved
-    if 'saving_goal_achieved' not in existing_badges:
-        completed_goals = SavingGoal.query.filter_by(user_id=user_id, completed=True).count()
-        if completed_goals > 0:
-            _award_achievement(user_id, 'saving_goal_achieved', 'Goal Achiever',
-                               'Completed your first saving goal!')
-
-    # 3. Perfect Month - income > expenses
-    if 'perfect_month' not in existing_badges:
-        total_income = db.session.query(db.func.sum(Income.amount)).filter(
-            Income.user_id == user_id,
-            db.extract('month', Income.date) == current_month,
-            db.extract('year', Income.date) == current_year
-        ).scalar() or 0.0
-
-        total_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-            Transaction.user_id == user_id,
-            db.extract('month', Transaction.date) == current_month,
-            db.extract('year', Transaction.date) == current_year
-        ).scalar() or 0.0
-
-        if total_income > 0 and total_income > total_expenses:
-            _award_achievement(user_id, 'perfect_month', 'Perfect Month',
-                               'Your income exceeded your expenses this month!')
-
-    # 4. Streak Master - 7+ transactions in last 7 days
-    if 'streak_master' not in existing_badges:
-        seven_days_ago = datetime.now().date() - timedelta(days=7)
-        distinct_days = db.session.query(db.func.count(db.distinct(Transaction.date))).filter(
-            Transaction.user_id == user_id,
-            Transaction.date >= seven_days_ago
-        ).scalar() or 0
-        if distinct_days >= 7:
-            _award_achievement(user_id, 'streak_master', 'Streak Master',
-                               'Logged transactions for 7 consecutive days!')
-
-
-def _award_achievement(user_id, badge_type, title, description):
-    """Award an achievement and create a notification."""
-    achievement = Achievement(
-        user_id=user_id,
-        title=title,
-        description=description,
-        badge_type=badge_type
-    )
-    db.session.add(achievement)
-    db.session.commit()
-    create_notification(user_id, f"🏆 Achievement unlocked: {title}!", 'achievement')
+    return [{
+        'id': a.id,
+        'title': a.title,
+        'description': a.description,
+        'badge_type': a.badge_type,
+        'date_earned': a.date_earned.isoformat()
+    } for a in earned]
 
 
 # =============================================
@@ -787,121 +835,54 @@ def _award_achievement(user_id, badge_type, title, description):
 
 @api_bp.route('/financial-insights', methods=['GET'])
 @jwt_required()
+@response_cache.cached
+@replicas.reads
 def get_financial_insights():
     user_id = get_jwt_identity()
-    insights = []
-
-    current_month = datetime.now().month
-    current_year = datetime.now().year
-
-    # Calculate totals
-    total_income = db.session.query(db.func.sum(Income.amount)).filter(
-        Income.user_id == user_id,
-        db.extract('month', Income.date) == current_month,
-        db.extract('year', Income.date) == current_year
-    ).scalar() or 0.0
-
-    total_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        db.extract('month', Transaction.date) == current_month,
-        db.extract('year', Transaction.date) == current_year
-    ).scalar() or 0.0
-
-    # 1. Savings rate
-    if total_income > 0:
-        savings_rate = ((total_income - total_expenses) / total_income) * 100
-        if savings_rate >= 20:
-            insights.append({
-                'type': 'positive',
-                'title': 'Great Savings Rate!',
-                'description': f'You\'re saving {savings_rate:.1f}% of your income this month. That\'s excellent financial health!'
-            })
-        elif savings_rate >= 0:
-            insights.append({
-                'type': 'suggestion',
-                'title': 'Room for Improvement',
-                'description': f'Your savings rate is {savings_rate:.1f}%. Try to save at least 20% of your income for financial security.'
-            })
-        else:
-            insights.append({
-                'type': 'warning',
-                'title': 'Spending Exceeds Income',
-                'description': f'You\'ve spent ₹{abs(total_income - total_expenses):.2f} more than your income this month. Consider reducing expenses.'
-            })
-
-    # 2. Top expense category
-    top_category = db.session.query(
-        Transaction.category,
-        db.func.sum(Transaction.amount).label('total')
-    ).filter(
-        Transaction.user_id == user_id,
-        db.extract('month', Transaction.date) == current_month,
-        db.extract('year', Transaction.date) == current_year
-    ).group_by(Transaction.category).order_by(db.desc('total')).first()
-
-    if top_category:
-        category_percentage = (top_category.total / total_expenses * 100) if total_expenses > 0 else 0
-        insights.append({
-            'type': 'information',
-            'title': f'Top Spending: {top_category.category}',
-            'description': f'{top_category.category} is your highest expense category at ₹{top_category.total:.2f} ({category_percentage:.1f}% of total expenses).'
-        })
+    today = datetime.now()
+    return jsonify({'insights': insights.get(user_id, today.year, today.month)}), 200
 
-    # 3. Monthly comparison with previous month
-    prev_month = current_month - 1 if current_month > 1 else 12
-    prev_year = current_year if current_month > 1 else current_year - 1
-
-    prev_expenses = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        db.extract('month', Transaction.date) == prev_month,
-        db.extract('year', Transaction.date) == prev_year
-    ).scalar() or 0.0
-
-    if prev_expenses > 0 and total_expenses > 0:
-        change = ((total_expenses - prev_expenses) / prev_expenses) * 100
-        if change > 15:
-            insights.append({
-                'type': 'warning',
-                'title': 'Spending Increased',
-                'description': f'Your spending increased by {change:.1f}% compared to last month. Review your expenses to identify areas to cut back.'
-            })
-        elif change < -10:
-            insights.append({
-                'type': 'positive',
-                'title': 'Spending Decreased',
-                'description': f'Great job! Your spending decreased by {abs(change):.1f}% compared to last month.'
-            })
-
-    # 4. Budget adherence insight
-    budgets = Budget.query.filter_by(user_id=user_id, month=current_month, year=current_year).all()
-    if budgets:
-        on_track = sum(1 for b in budgets if _get_budget_spent(user_id, b, current_month, current_year) <= b.amount)
-        insights.append({
-            'type': 'positive' if on_track == len(budgets) else 'suggestion',
-            'title': 'Budget Adherence',
-            'description': f'You\'re on track with {on_track} out of {len(budgets)} budgets this month.'
-        })
 
-    # 5. If no data yet
-    if not insights:
-        insights.append({
-            'type': 'information',
-            'title': 'Start Tracking',
-            'description': 'Add income and expenses to get personalized financial insights and recommendations.'
-        })
+# =============================================
+# ANALYTICS ROUTES
+# =============================================
 
-    return jsonify({'insights': insights}), 200
+@api_bp.route('/analytics/trends', methods=['GET'])
+@jwt_required()
+@response_cache.cached
+@replicas.reads
+def analytics_trends():
+    """Monthly, weekly, rolling-average and month-over-month series.
+
+    ``?months=`` sets how many months up to the current one are reported
+    (default 12, at most ``analytics.MAX_MONTHS``); ``?kind=income``
+    reports incomes by source instead of expenses by category.
+    """
+    user_id = get_jwt_identity()
+    kind = request.args.get('kind', EXPENSE)
+    if kind not in (EXPENSE, INCOME):
+        return jsonify({'error': 'kind must be expense or income'}), 400
+    months = request.args.get('months', '12')
+    if not months.isdigit() or not 1 <= int(months) <= analytics.MAX_MONTHS:
+        return jsonify({'error': f'months must be between 1 and {analytics.MAX_MONTHS}'}), 400
 
+    try:
+        return jsonify(analytics.trends(user_id, kind, int(months))), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
-def _get_budget_spent(user_id, budget, month, year):
-    query = db.session.query(db.func.sum(Transaction.amount)).filter(
-        Transaction.user_id == user_id,
-        db.extract('month', Transaction.date) == month,
-        db.extract('year', Transaction.date) == year
-    )
-    if budget.category:
-        query = query.filter(Transaction.category == budget.category)
-    return query.scalar() or 0.0
+
+@api_bp.route('/forecast', methods=['GET'])
+@jwt_required()
+@response_cache.cached
+@replicas.reads
+def get_forecast():
+    """Projected end-of-month spend per category and in total, against this month's budgets."""
+    user_id = get_jwt_identity()
+    try:
+        return jsonify({'forecast': forecast.get(user_id)}), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
 
 
 # =============================================
@@ -910,31 +891,23 @@ def _get_budget_spent(user_id, budget, month, year):
 
 @api_bp.route('/payment-method-analysis', methods=['GET'])
 @jwt_required()
+@response_cache.cached
+@replicas.reads
 def payment_method_analysis():
     user_id = get_jwt_identity()
-    current_month = datetime.now().month
-    current_year = datetime.now().year
+    return jsonify({'payment_method_analysis': _payment_method_analysis(_current_aggregates(user_id))}), 200
 
-    results = db.session.query(
-        Transaction.payment_method,
-        db.func.sum(Transaction.amount).label('total'),
-        db.func.count(Transaction.id).label('count')
-    ).filter(
-        Transaction.user_id == user_id,
-        db.extract('month', Transaction.date) == current_month,
-        db.extract('year', Transaction.date) == current_year
-    ).group_by(Transaction.payment_method).all()
 
-    total_spent = sum(r.total for r in results) if results else 0
+def _payment_method_analysis(aggregates):
+    results = aggregates.by_payment_method(EXPENSE)
+    total_spent = sum(total for total, _ in results.values())
 
-    analysis = [{
-        'method': r.payment_method,
-        'total': r.total,
-        'count': r.count,
-        'percentage': round((r.total / total_spent * 100) if total_spent > 0 else 0, 1)
-    } for r in results]
-
-    return jsonify({'payment_method_analysis': analysis}), 200
+    return [{
+        'method': method,
+        **money.fields(total=total),
+        'count': count,
+        'percentage': round((total / total_spent * 100) if total_spent > 0 else 0, 1)
+    } for method, (total, count) in results.items()]
 
 
 # =============================================
@@ -952,18 +925,22 @@ def update_transaction(transaction_id):
 
     data = request.get_json()
     try:
+        before = rollups.snapshot(EXPENSE, transaction)
         transaction.category = data.get('category', transaction.category)
-        transaction.amount = float(data.get('amount', transaction.amount))
+        if 'amount' in data:
+            transaction.amount = to_minor(data['amount'])
         if data.get('date'):
             transaction.date = datetime.strptime(data['date'], '%Y-%m-%d').date()
         transaction.payment_method = data.get('payment_method', transaction.payment_method)
         transaction.notes = data.get('notes', transaction.notes)
+        rollups.record_change(EXPENSE, before, transaction)
+        achievements.record(user_id, entry_events(EXPENSE, before, transaction))
         db.session.commit()
 
         return jsonify({
             'id': transaction.id,
             'category': transaction.category,
-            'amount': transaction.amount,
+            **money.fields(amount=transaction.amount),
             'date': transaction.date.strftime('%Y-%m-%d'),
             'paymentMethod': transaction.payment_method,
             'notes': transaction.notes
@@ -984,6 +961,8 @@ def delete_transaction(transaction_id):
 
     try:
         db.session.delete(transaction)
+        rollups.record_entry(EXPENSE, transaction, sign=-1)
+        achievements.record(user_id, entry_events(EXPENSE, rollups.snapshot(EXPENSE, transaction)))
         db.session.commit()
         return jsonify({'message': 'Transaction deleted successfully'}), 200
     except Exception as e:
@@ -991,33 +970,51 @@ def delete_transaction(transaction_id):
         return jsonify({'error': str(e)}), 500
 
 
+def _date_range(args):
+    """Half-open [start, end) for the inclusive ``start_date``/``end_date`` filter params."""
+    start, end = (datetime.strptime(args[name], '%Y-%m-%d').date() if args.get(name) else None
+                  for name in ('start_date', 'end_date'))
+    return range_bounds(start, end)
+
+
+def _filter_transactions_query(user_id, args):
+    """Build the Transaction query for the filter params shared by /transactions/filter and /export."""
+    query = Transaction.query.filter_by(user_id=user_id)
+
+    start, end = _date_range(args)
+    if start or end:
+        query = query.filter(in_period(Transaction.date, start, end))
+    if args.get('min_amount'):
+        query = query.filter(Transaction.amount >= to_minor(args['min_amount']))
+    if args.get('max_amount'):
+        query = query.filter(Transaction.amount <= to_minor(args['max_amount']))
+    if args.get('category'):
+        query = query.filter(Transaction.category == args['category'])
+    if args.get('payment_method'):
+        query = query.filter(Transaction.payment_method == args['payment_method'])
+    return query
+
+
 @api_bp.route('/transactions/filter', methods=['GET'])
 @jwt_required()
+@replicas.reads
 def filter_transactions():
     user_id = get_jwt_identity()
 
-    query = Transaction.query.filter_by(user_id=user_id)
+    try:
+        limit, after = page_args(request.args)
+        query = _filter_transactions_query(user_id, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if request.args.get('start_date'):
-        query = query.filter(Transaction.date >= datetime.strptime(request.args['start_date'], '%Y-%m-%d').date())
-    if request.args.get('end_date'):
-        query = query.filter(Transaction.date <= datetime.strptime(request.args['end_date'], '%Y-%m-%d').date())
-    if request.args.get('min_amount'):
-        query = query.filter(Transaction.amount >= float(request.args['min_amount']))
-    if request.args.get('max_amount'):
-        query = query.filter(Transaction.amount <= float(request.args['max_amount']))
-    if request.args.get('category'):
-        query = query.filter(Transaction.category == request.args['category'])
-    if request.args.get('payment_method'):
-        query = query.filter(Transaction.payment_method == request.args['payment_method'])
-
-    transactions = query.order_by(Transaction.date.desc()).all()
+    transactions, next_cursor = paginate(query, Transaction, limit, after)
 
     return jsonify({
+        'next_cursor': next_cursor,
         'transactions': [{
             'id': t.id,
             'category': t.category,
-            'amount': t.amount,
+            **money.fields(amount=t.amount),
             'date': t.date.strftime('%Y-%m-%d'),
             'paymentMethod': t.payment_method,
             'notes': t.notes
@@ -1040,18 +1037,22 @@ def update_income(income_id):
 
     data = request.get_json()
     try:
+        before = rollups.snapshot(INCOME, income)
         income.source = data.get('source', income.source)
-        income.amount = float(data.get('amount', income.amount))
+        if 'amount' in data:
+            income.amount = to_minor(data['amount'])
         if data.get('date'):
             income.date = datetime.strptime(data['date'], '%Y-%m-%d').date()
         income.payment_method = data.get('payment_method', income.payment_method)
         income.notes = data.get('notes', income.notes)
+        rollups.record_change(INCOME, before, income)
+        achievements.record(user_id, entry_events(INCOME, before, income))
         db.session.commit()
 
         return jsonify({
             'id': income.id,
             'source': income.source,
-            'amount': income.amount,
+            **money.fields(amount=income.amount),
             'date': income.date.strftime('%Y-%m-%d'),
             'paymentMethod': income.payment_method,
             'notes': income.notes
@@ -1072,6 +1073,8 @@ def delete_income(income_id):
 
     try:
         db.session.delete(income)
+        rollups.record_entry(INCOME, income, sign=-1)
+        achievements.record(user_id, entry_events(INCOME, rollups.snapshot(INCOME, income)))
         db.session.commit()
         return jsonify({'message': 'Income deleted successfully'}), 200
     except Exception as e:
@@ -1079,35 +1082,293 @@ def delete_income(income_id):
         return jsonify({'error': str(e)}), 500
 
 
+def _filter_incomes_query(user_id, args):
+    """Build the Income query for the filter params shared by /incomes/filter and /export."""
+    query = Income.query.filter_by(user_id=user_id)
+
+    start, end = _date_range(args)
+    if start or end:
+        query = query.filter(in_period(Income.date, start, end))
+    if args.get('min_amount'):
+        query = query.filter(Income.amount >= to_minor(args['min_amount']))
+    if args.get('max_amount'):
+        query = query.filter(Income.amount <= to_minor(args['max_amount']))
+    if args.get('source'):
+        query = query.filter(Income.source == args['source'])
+    if args.get('payment_method'):
+        query = query.filter(Income.payment_method == args['payment_method'])
+    return query
+
+
 @api_bp.route('/incomes/filter', methods=['GET'])
 @jwt_required()
+@replicas.reads
 def filter_incomes():
     user_id = get_jwt_identity()
 
-    query = Income.query.filter_by(user_id=user_id)
+    try:
+        limit, after = page_args(request.args)
+        query = _filter_incomes_query(user_id, request.args)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
 
-    if request.args.get('start_date'):
-        query = query.filter(Income.date >= datetime.strptime(request.args['start_date'], '%Y-%m-%d').date())
-    if request.args.get('end_date'):
-        query = query.filter(Income.date <= datetime.strptime(request.args['end_date'], '%Y-%m-%d').date())
-    if request.args.get('min_amount'):
-        query = query.filter(Income.amount >= float(request.args['min_amount']))
-    if request.args.get('max_amount'):
-        query = query.filter(Income.amount <= float(request.args['max_amount']))
-    if request.args.get('source'):
-        query = query.filter(Income.source == request.args['source'])
-    if request.args.get('payment_method'):
-        query = query.filter(Income.payment_method == request.args['payment_method'])
-
-    incomes = query.order_by(Income.date.desc()).all()
+    incomes, next_cursor = paginate(query, Income, limit, after)
 
     return jsonify({
+        'next_cursor': next_cursor,
         'incomes': [{
             'id': i.id,
             'source': i.source,
-            'amount': i.amount,
+            **money.fields(amount=i.amount),
             'date': i.date.strftime('%Y-%m-%d'),
             'paymentMethod': i.payment_method,
             'notes': i.notes
         } for i in incomes]
     }), 200
+
+
+# =============================================
+# SEARCH ROUTES
+# =============================================
+
+@api_bp.route('/search', methods=['GET'])
+@jwt_required()
+@response_cache.cached
+@replicas.reads
+def search_entries():
+    """Ranked full-text matches of ``q`` in expenses and incomes (category/source, notes, other source)."""
+    user_id = get_jwt_identity()
+    if not search.terms(request.args.get('q')):
+        return jsonify({'error': 'q is required'}), 400
+    try:
+        limit = max(1, min(int(request.args.get('limit', DEFAULT_PAGE_SIZE)), MAX_PAGE_SIZE))
+    except ValueError:
+        return jsonify({'error': 'limit must be an integer'}), 400
+    try:
+        offset = search.decode_offset(request.args['cursor']) if request.args.get('cursor') else 0
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    try:
+        hits, more = search.search(user_id, request.args['q'], limit, offset)
+    except search.SearchUnavailable as e:
+        return jsonify({'error': str(e)}), 501
+
+    results = []
+    for kind, row, score in hits:
+        label = 'category' if kind == EXPENSE else 'source'
+        results.append({
+            'kind': kind,
+            'id': row.id,
+            label: getattr(row, label),
+            **money.fields(amount=row.amount),
+            'date': row.date.strftime('%Y-%m-%d'),
+            'paymentMethod': row.payment_method,
+            'notes': row.notes,
+            'otherSource': row.other_source,
+            'score': round(score, 4)
+        })
+    return jsonify({
+        'next_cursor': search.encode_offset(offset + limit) if more else None,
+        'results': results
+    }), 200
+
+
+# =============================================
+# EXPORT ROUTES
+# =============================================
+
+EXPORT_FIELDS = ['kind', 'id', 'date', 'category', 'source', 'amount', 'payment_method', 'notes', 'other_source']
+EXPORT_BATCH_SIZE = 1000
+
+
+def _export_rows(queries):
+    """Yield one dict per row, streaming each query in EXPORT_BATCH_SIZE chunks."""
+    for kind, model, query in queries:
+        for row in query.order_by(model.date, model.id).yield_per(EXPORT_BATCH_SIZE):
+            yield {
+                'kind': kind,
+                'id': row.id,
+                'date': row.date.strftime('%Y-%m-%d'),
+                'category': row.category if kind == 'expense' else '',
+                'source': row.source if kind == 'income' else '',
+                'amount': money.to_major(row.amount),
+                'payment_method': row.payment_method,
+                'notes': row.notes or '',
+                'other_source': row.other_source or ''
+            }
+
+
+def _csv_stream(rows):
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_FIELDS)
+    writer.writeheader()
+    for row in rows:
+        writer.writerow(row)
+        if buffer.tell() >= 64 * 1024:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def _ndjson_stream(rows):
+    for row in rows:
+        yield json.dumps(row) + '\n'
+
+
+@api_bp.route('/export', methods=['GET'])
+@jwt_required()
+@replicas.reads
+def export_history():
+    user_id = get_jwt_identity()
+    export_format = request.args.get('format', 'csv')
+    kind = request.args.get('kind', 'all')
+
+    if export_format not in ('csv', 'ndjson'):
+        return jsonify({'error': 'format must be csv or ndjson'}), 400
+    if kind not in ('expenses', 'incomes', 'all'):
+        return jsonify({'error': 'kind must be expenses, incomes or all'}), 400
+
+    # Build the queries up front so bad filter values fail before streaming starts
+    try:
+        queries = []
+        if kind in ('expenses', 'all'):
+            queries.append(('expense', Transaction, _filter_transactions_query(user_id, request.args)))
+        if kind in ('incomes', 'all'):
+            queries.append(('income', Income, _filter_incomes_query(user_id, request.args)))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+
+    rows = _export_rows(queries)
+    if export_format == 'csv':
+        body, mimetype = _csv_stream(rows), 'text/csv'
+    else:
+        body, mimetype = _ndjson_stream(rows), 'application/x-ndjson'
+
+    filename = f'spendsmart-{kind}.{export_format}'
+    return Response(stream_with_context(body), mimetype=mimetype,
+                    headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
+# =============================================
+# IMPORT ROUTES
+# =============================================
+
+@api_bp.route('/import', methods=['POST'])
+@jwt_required()
+def import_history():
+    user_id = get_jwt_identity()
+
+    file = request.files.get('file')
+    if not file:
+        return jsonify({'error': 'A CSV or OFX file is required'}), 400
+
+    file_format = request.form.get('format') or os.path.splitext(file.filename or '')[1].lstrip('.').lower()
+    if file_format == 'qfx':
+        file_format = 'ofx'
+    if file_format not in ('csv', 'ofx'):
+        return jsonify({'error': 'format must be csv or ofx'}), 400
+
+    defaults = {
+        'category': request.form.get('category', 'Other'),
+        'source': request.form.get('source', 'Other'),
+        'payment_method': request.form.get('paymentMethod', 'Bank Transfer'),
+    }
+
+    try:
+        result = importer.import_statement(user_id, file.stream, file_format, defaults)
+        # A partial import keeps its committed chunks; the body says which rows they were
+        return jsonify(result), 500 if 'error' in result else 200
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+
+# =============================================
+# BATCH ROUTES
+# =============================================
+
+def _run_batch(kind):
+    user_id = get_jwt_identity()
+    data = request.get_json(silent=True) or {}
+    operations = data.get('operations')
+
+    if not isinstance(operations, list) or not operations:
+        return jsonify({'error': 'operations must be a non-empty list'}), 400
+    if len(operations) > batch.MAX_BATCH_SIZE:
+        return jsonify({'error': f'A batch can contain at most {batch.MAX_BATCH_SIZE} operations'}), 400
+
+    atomic = data.get('atomic', request.args.get('atomic', 'false'))
+    atomic = atomic is True or str(atomic).lower() == 'true'
+
+    try:
+        results, applied = batch.apply_batch(user_id, kind, operations, atomic)
+    except Exception as e:
+        db.session.rollback()
+        return jsonify({'error': str(e)}), 500
+
+    return jsonify({'applied': applied, 'results': results}), 200 if applied else 400
+
+
+@api_bp.route('/transactions/batch', methods=['POST'])
+@jwt_required()
+def batch_transactions():
+    return _run_batch(EXPENSE)
+
+
+@api_bp.route('/incomes/batch', methods=['POST'])
+@jwt_required()
+def batch_incomes():
+    return _run_batch(INCOME)
+
+
+# =============================================
+# DASHBOARD (composite read)
+# =============================================
+
+# Section name -> (response key, builder(user, aggregates)). Keys match the standalone endpoints.
+DASHBOARD_SECTIONS = {
+    'summary': ('user_data', lambda user, agg: _user_summary(user, agg)),
+    'income': ('income', lambda user, agg: _income_page(user.id, DEFAULT_PAGE_SIZE, None, agg)),
+    'expenses': ('expenses', lambda user, agg: _expense_page(user.id, DEFAULT_PAGE_SIZE, None, agg)),
+    'budgets': ('budgets', lambda user, agg: _budget_list(user.id)),
+    'budget_analysis': ('budget_analysis', lambda user, agg: _budget_analysis(agg)),
+    'insights': ('insights', lambda user, agg: insights.get(user.id, agg.year, agg.month, agg)),
+    'payment_methods': ('payment_method_analysis', lambda user, agg: _payment_method_analysis(agg)),
+    'saving_goals': ('saving_goals', lambda user, agg: _saving_goal_list(user.id)),
+    'notifications': ('notifications', lambda user, agg: _notification_list(user.id)),
+    'achievements': ('achievements', lambda user, agg: _achievement_list(user.id)),
+}
+
+
+@api_bp.route('/dashboard', methods=['GET'])
+@jwt_required()
+@response_cache.cached
+@replicas.reads
+def get_dashboard():
+    """Everything the dashboard needs in one response.
+
+    ``?sections=summary,budgets,...`` limits the payload (default: all
+    sections). The user row and the current/previous month rollups are
+    loaded once and shared by every section.
+    """
+    requested = request.args.get('sections')
+    names = [n.strip() for n in requested.split(',') if n.strip()] if requested else list(DASHBOARD_SECTIONS)
+    unknown = [n for n in names if n not in DASHBOARD_SECTIONS]
+    if unknown:
+        return jsonify({'error': f"Unknown sections: {', '.join(unknown)}"}), 400
+
+    user = current_profile()
+    if not user:
+        return jsonify({"error": "User not found"}), 404
+
+    try:
+        aggregates = _current_aggregates(user.id)
+        response = {}
+        for name in names:
+            key, build = DASHBOARD_SECTIONS[name]
+            response[key] = build(user, aggregates)
+        return jsonify(response), 200
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
@@ -0,0 +1,230 @@
+"""Full-text search over transactions and incomes.
+
+Both tables are indexed as one set of documents, so matches from either
+are ranked together. A document's id is ``id * 2`` for a transaction and
+``id * 2 + 1`` for an income. Database triggers keep the index in sync,
+so every write path (ORM, bulk statements, imports) updates it in the
+same transaction:
+
+- SQLite: a contentless FTS5 table ``search_index``, ranked with bm25.
+- MySQL: a ``search_documents`` table with a FULLTEXT index, ranked by
+  boolean-mode relevance.
+
+Every document also carries an ``owner<user_id>`` token, so the text
+index itself restricts matches to one user instead of ranking every
+user's matches and filtering afterwards. Only the user's newest
+RANK_WINDOW matches are scored and paged through, which bounds the cost
+of very common words for users with long histories.
+"""
+import base64
+import json
+import re
+
+import click
+from flask.cli import AppGroup
+from sqlalchemy import event
+
+from extensions import db
+from models import Transaction, Income
+from rollups import EXPENSE, INCOME
+
+MAX_TERMS = 8
+RANK_WINDOW = 1000
+
+# kind -> (table, label column, document id offset)
+_TABLES = {
+    EXPENSE: ('transactions', 'category', 0),
+    INCOME: ('incomes', 'source', 1),
+}
+_MODELS = {EXPENSE: Transaction, INCOME: Income}
+_KINDS = {offset: kind for kind, (_, _, offset) in _TABLES.items()}
+
+
+class SearchUnavailable(Exception):
+    """The database dialect has no supported full-text index."""
+
+
+# =============================================
+# SCHEMA
+# =============================================
+
+def _sqlite_ddl():
+    statements = [
+        "CREATE VIRTUAL TABLE IF NOT EXISTS search_index USING fts5("
+        "owner, label, notes, other_source, content='', prefix='2 3')"
+    ]
+    for table, label, offset in _TABLES.values():
+        values = f"'owner' || {{row}}.user_id, {{row}}.{label}, {{row}}.notes, {{row}}.other_source"
+        insert = (f"INSERT INTO search_index (rowid, owner, label, notes, other_source) "
+                  f"VALUES (new.id * 2 + {offset}, {values.format(row='new')});")
+        # Contentless tables are told the old values to remove
+        delete = (f"INSERT INTO search_index (search_index, rowid, owner, label, notes, other_source) "
+                  f"VALUES ('delete', old.id * 2 + {offset}, {values.format(row='old')});")
+        statements += [
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_insert AFTER INSERT ON {table} BEGIN {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_update "
+            f"AFTER UPDATE OF user_id, {label}, notes, other_source ON {table} BEGIN {delete} {insert} END",
+            f"CREATE TRIGGER IF NOT EXISTS {table}_search_delete AFTER DELETE ON {table} BEGIN {delete} END",
+        ]
+    return statements
+
+
+def _mysql_ddl():
+    statements = [
+        "CREATE TABLE IF NOT EXISTS search_documents ("
+        "id BIGINT NOT NULL PRIMARY KEY, user_id INT NOT NULL, owner VARCHAR(32) NOT NULL, "
+        "label VARCHAR(100) NULL, notes VARCHAR(255) NULL, other_source VARCHAR(100) NULL, "
+        "FULLTEXT KEY ft_search_documents (owner, label, notes, other_source)) ENGINE=InnoDB"
+    ]
+    for table, label, offset in _TABLES.values():
+        statements += [f'DROP TRIGGER IF EXISTS {table}_search_{action}' for action in ('insert', 'update', 'delete')]
+        statements += [
+            f"CREATE TRIGGER {table}_search_insert AFTER INSERT ON {table} FOR EACH ROW "
+            f"INSERT INTO search_documents (id, user_id, owner, label, notes, other_source) "
+            f"VALUES (NEW.id * 2 + {offset}, NEW.user_id, CONCAT('owner', NEW.user_id), "
+            f"NEW.{label}, NEW.notes, NEW.other_source)",
+            f"CREATE TRIGGER {table}_search_update AFTER UPDATE ON {table} FOR EACH ROW "
+            f"UPDATE search_documents SET user_id = NEW.user_id, owner = CONCAT('owner', NEW.user_id), "
+            f"label = NEW.{label}, notes = NEW.notes, other_source = NEW.other_source "
+            f"WHERE id = NEW.id * 2 + {offset}",
+            f"CREATE TRIGGER {table}_search_delete AFTER DELETE ON {table} FOR EACH ROW "
+            f"DELETE FROM search_documents WHERE id = OLD.id * 2 + {offset}",
+        ]
+    return statements
+
+
+_DDL = {'sqlite': _sqlite_ddl, 'mysql': _mysql_ddl}
+_DROP = {'sqlite': 'DROP TABLE IF EXISTS search_index', 'mysql': 'DROP TABLE IF EXISTS search_documents'}
+
+
+@event.listens_for(db.metadata, 'after_create')
+def _create_index(target, connection, **kw):
+    """Create the index and triggers along with ``db.create_all()`` (migrations create them too)."""
+    for statement in _DDL.get(connection.dialect.name, list)():
+        connection.exec_driver_sql(statement)
+
+
+@event.listens_for(db.metadata, 'before_drop')
+def _drop_index(target, connection, **kw):
+    # The triggers go with their tables; the index table would outlive them
+    if connection.dialect.name in _DROP:
+        connection.exec_driver_sql(_DROP[connection.dialect.name])
+
+
+def rebuild():
+    """Re-index every transaction and income. Returns the number of documents. Commits."""
+    dialect = db.engine.dialect.name
+    if dialect not in _DDL:
+        raise SearchUnavailable(f'Full-text search is not supported on {dialect}')
+    if dialect == 'sqlite':
+        db.session.execute(db.text("INSERT INTO search_index (search_index) VALUES ('delete-all')"))
+        target = 'search_index (rowid, owner, label, notes, other_source)'
+        owner = "'owner' || user_id"
+    else:
+        db.session.execute(db.text('DELETE FROM search_documents'))
+        target = 'search_documents (id, user_id, owner, label, notes, other_source)'
+        owner = "user_id, CONCAT('owner', user_id)"
+    for table, label, offset in _TABLES.values():
+        db.session.execute(db.text(
+            f'INSERT INTO {target} SELECT id * 2 + {offset}, {owner}, {label}, notes, other_source FROM {table}'))
+    db.session.commit()
+    return sum(_MODELS[kind].query.count() for kind in _TABLES)
+
+
+# =============================================
+# QUERIES
+# =============================================
+
+def terms(text):
+    """Words of a search string, with a trailing ``*`` kept for prefix search; other syntax is dropped."""
+    return re.findall(r'\w+\*?', text or '')[:MAX_TERMS]
+
+
+def _sqlite_matches(user_id, words, limit, offset):
+    # All words must match in the text columns of the user's documents
+    phrases = [f'"{word[:-1]}"*' if word.endswith('*') else f'"{word}"' for word in words]
+    query = f'owner : owner{int(user_id)} AND {{label notes other_source}} : (' + ' AND '.join(phrases) + ')'
+    return db.session.execute(db.text(
+        'SELECT rowid, score FROM ('
+        '  SELECT rowid, -bm25(search_index, 0.0, 4.0, 2.0, 1.0) AS score FROM search_index'
+        '  WHERE search_index MATCH :query ORDER BY rowid DESC LIMIT :window'
+        ') ORDER BY score DESC, rowid DESC LIMIT :limit OFFSET :offset'
+    ), {'query': query, 'window': RANK_WINDOW, 'limit': limit, 'offset': offset}).all()
+
+
+def _mysql_matches(user_id, words, limit, offset):
+    query = f'+owner{int(user_id)} ' + ' '.join(f'+{word}' for word in words)
+    # user_id is re-checked because a note could contain another user's owner token
+    return db.session.execute(db.text(
+        'SELECT id, score FROM ('
+        '  SELECT id, MATCH (owner, label, notes, other_source) AGAINST (:query IN BOOLEAN MODE) AS score'
+        '  FROM search_documents'
+        '  WHERE MATCH (owner, label, notes, other_source) AGAINST (:query IN BOOLEAN MODE) AND user_id = :user_id'
+        '  ORDER BY id DESC LIMIT :window'
+        ') AS recent ORDER BY score DESC, id DESC LIMIT :limit OFFSET :offset'
+    ), {'query': query, 'user_id': int(user_id), 'window': RANK_WINDOW, 'limit': limit, 'offset': offset}).all()
+
+
+_MATCHES = {'sqlite': _sqlite_matches, 'mysql': _mysql_matches}
+
+
+def search(user_id, text, limit, offset=0):
+    """Ranked matches as ([(kind, row, score)], more). Raises SearchUnavailable."""
+    matches = _MATCHES.get(db.engine.dialect.name)
+    if matches is None:
+        raise SearchUnavailable(f'Full-text search is not supported on {db.engine.dialect.name}')
+    words = terms(text)
+    if not words or offset >= RANK_WINDOW:
+        return [], False
+    limit = min(limit, RANK_WINDOW - offset)
+
+    found = matches(user_id, words, limit + 1, offset)
+    more = len(found) > limit
+    found = found[:limit]
+
+    ids = {kind: [] for kind in _TABLES}
+    for document, _ in found:
+        ids[_KINDS[document % 2]].append(document // 2)
+    rows = {}
+    for kind, kind_ids in ids.items():
+        if kind_ids:
+            # Primary-key lookups; with user_id in the WHERE clause SQLite may scan the user's index instead
+            model = _MODELS[kind]
+            rows.update({(kind, row.id): row for row in model.query.filter(model.id.in_(kind_ids))
+                         if row.user_id == int(user_id)})
+
+    hits = []
+    for document, score in found:
+        key = (_KINDS[document % 2], document // 2)
+        if key in rows:
+            hits.append((key[0], rows[key], float(score)))
+    return hits, more
+
+
+def encode_offset(offset):
+    return base64.urlsafe_b64encode(json.dumps([offset]).encode()).decode().rstrip('=')
+
+
+def decode_offset(cursor):
+    """Return the offset in a search cursor token. Raises ValueError if it is malformed."""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        (offset,) = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(offset, int) or offset < 0:
+            raise ValueError(offset)
+        return offset
+    except (TypeError, ValueError, UnicodeDecodeError) as e:
+        raise ValueError('Invalid cursor') from e
+
+
+search_cli = AppGroup('search', help='Maintain the full-text search index.')
+
+
+@search_cli.command('rebuild')
+def rebuild_command():
+    """Re-index all transactions and incomes."""
+    try:
+        count = rebuild()
+    except SearchUnavailable as e:
+        raise click.ClickException(str(e))
+    click.echo(f'Indexed {count} documents.')
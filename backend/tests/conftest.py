@@ -0,0 +1,100 @@
+"""Shared fixtures: the app on a throwaway SQLite database and a signed-up user.
+
+Run from ``backend/`` with ``python -m pytest -q``.
+"""
+import os
+import sys
+import tempfile
+
+_TMP = tempfile.mkdtemp(prefix='spendsmart-tests-')
+
+# Config is read from the environment when ``config`` is imported, so set it first
+os.environ.update({
+    'SQLALCHEMY_DATABASE_URI': f"sqlite:///{os.path.join(_TMP, 'test.db')}",
+    'JWT_SECRET_KEY': 'test-only-secret-key-test-only-secret-key',
+    'RESPONSE_CACHE_BACKEND': 'none',
+    'USER_PROFILE_CACHE_TTL': '0',
+    'JOB_WORKER_THREADS': '0',
+    'BCRYPT_LOG_ROUNDS': '4',
+    'UPLOAD_FOLDER': os.path.join(_TMP, 'uploads'),
+})
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest  # noqa: E402
+
+from app import create_app  # noqa: E402
+from extensions import db  # noqa: E402
+from models import User  # noqa: E402
+import balances  # noqa: E402
+import rollups  # noqa: E402
+
+EMAIL = 'tester@example.com'
+PASSWORD = 'correct horse'
+
+
+@pytest.fixture(scope='session')
+def app():
+    return create_app()
+
+
+@pytest.fixture(autouse=True)
+def database(app):
+    """A fresh schema for every test, inside an app context."""
+    with app.app_context():
+        db.drop_all()
+        db.create_all()
+        yield
+        db.session.remove()
+
+
+class Api:
+    """Test client calls as the signed-up user."""
+
+    def __init__(self, client, headers, user_id):
+        self.client = client
+        self.headers = headers
+        self.user_id = user_id
+
+    def get(self, url, **kwargs):
+        return self.client.get(url, headers=self.headers, **kwargs)
+
+    def post(self, url, **kwargs):
+        return self.client.post(url, headers=self.headers, **kwargs)
+
+    def put(self, url, **kwargs):
+        return self.client.put(url, headers=self.headers, **kwargs)
+
+    def delete(self, url, **kwargs):
+        return self.client.delete(url, headers=self.headers, **kwargs)
+
+    def add_expense(self, day, amount=10, category='Food', payment_method='Cash'):
+        response = self.post('/api/add-expense', json={
+            'category': category, 'amount': amount, 'date': day.isoformat(), 'paymentMethod': payment_method})
+        assert response.status_code == 200, response.get_json()
+
+    def add_income(self, day, amount=10, source='Salary'):
+        response = self.post('/api/add-income', json={'source': source, 'amount': amount, 'date': day.isoformat()})
+        assert response.status_code == 200, response.get_json()
+
+    def badges(self):
+        return {a['badge_type'] for a in self.get('/api/achievements').get_json()['achievements']}
+
+
+@pytest.fixture
+def api(app):
+    client = app.test_client()
+    client.post('/api/signup', json={'username': 'tester', 'fullName': 'Test User', 'email': EMAIL,
+                                     'password': PASSWORD})
+    token = client.post('/api/login', json={'email': EMAIL, 'password': PASSWORD}).get_json()['token']
+    user_id = User.query.filter_by(email=EMAIL).one().id
+    return Api(client, {'Authorization': f'Bearer {token}'}, user_id)
+
+
+@pytest.fixture
+def assert_in_sync():
+    """Check that a user's rollups and stored balance match a full recompute."""
+    def check(user_id):
+        db.session.expire_all()
+        assert rollups.verify(user_id) == []
+        assert balances.reconcile(user_id, repair=False) == []
+    return check
@@ -0,0 +1,105 @@
+"""Achievement rules, fed by the write routes."""
+import random
+from datetime import date, timedelta
+
+from models import Transaction
+
+# Far enough back that the streak tests never touch the current month's rules
+BASE = date.today() - timedelta(days=60)
+
+
+def _day(n):
+    return BASE + timedelta(days=n)
+
+
+def test_streak_counts_days_in_any_order(api):
+    order = [3, 0, 6, 1, 5, 2, 4]
+    for n in order[:-1]:
+        api.add_expense(_day(n))
+        assert 'streak_master' not in api.badges()
+    api.add_expense(_day(order[-1]))
+    assert 'streak_master' in api.badges()
+
+
+def test_streak_backfilled_gap(api):
+    for n in (0, 1, 2, 4, 5, 6):
+        api.add_expense(_day(n))
+    assert 'streak_master' not in api.badges()
+    api.add_expense(_day(3))
+    assert 'streak_master' in api.badges()
+
+
+def test_streak_survives_far_future_entry(api):
+    for n in range(6):
+        api.add_expense(_day(n))
+    api.add_expense(_day(200))
+    api.add_expense(_day(6))
+    assert 'streak_master' in api.badges()
+
+
+def test_streak_after_delete(api):
+    for n in range(6):
+        api.add_expense(_day(n))
+    deleted = Transaction.query.filter_by(date=_day(3)).one()
+    assert api.delete(f'/api/transactions/{deleted.id}').status_code == 200
+    api.add_expense(_day(6))
+    assert 'streak_master' not in api.badges()
+    api.add_expense(_day(3))
+    assert 'streak_master' in api.badges()
+
+
+def test_streak_from_one_batch(api):
+    days = list(range(7))
+    random.Random(0).shuffle(days)
+    response = api.post('/api/transactions/batch', json={'operations': [
+        {'op': 'create', 'data': {'category': 'Food', 'amount': 1, 'date': _day(n).isoformat(), 'paymentMethod': 'Cash'}}
+        for n in days
+    ]})
+    assert response.status_code == 200
+    assert 'streak_master' in api.badges()
+
+
+def test_budget_master_when_every_budget_is_kept(api):
+    today = date.today()
+    api.add_expense(today, 150, category='Food')
+    api.post('/api/budgets', json={'category': 'Food', 'amount': 100, 'month': today.month, 'year': today.year})
+    assert 'budget_master' not in api.badges()
+
+    expense = Transaction.query.filter_by(category='Food').one()
+    assert api.put(f'/api/transactions/{expense.id}', json={'amount': 80}).status_code == 200
+    assert 'budget_master' in api.badges()
+
+
+def test_budget_master_needs_a_budget(api):
+    api.add_expense(date.today(), 5)
+    assert 'budget_master' not in api.badges()
+
+
+def test_perfect_month(api):
+    today = date.today()
+    api.add_expense(today, 50)
+    api.add_income(today, 30)
+    assert 'perfect_month' not in api.badges()
+    api.add_income(today, 30)
+    assert 'perfect_month' in api.badges()
+
+
+def test_perfect_month_ignores_other_months(api):
+    api.add_income(date.today().replace(day=1) - timedelta(days=1), 100)
+    assert 'perfect_month' not in api.badges()
+
+
+def test_goal_achiever(api):
+    goal = api.post('/api/saving-goals', json={'title': 'Bike', 'target_amount': 100,
+                                               'target_date': (date.today() + timedelta(days=90)).isoformat()})
+    goal_id = goal.get_json()['id']
+    assert 'saving_goal_achieved' not in api.badges()
+    api.put(f'/api/saving-goals/{goal_id}', json={'current_amount': 100})
+    assert 'saving_goal_achieved' in api.badges()
+
+
+def test_badges_are_awarded_once(api):
+    for n in range(8):
+        api.add_expense(_day(n))
+    types = [a['badge_type'] for a in api.get('/api/achievements').get_json()['achievements']]
+    assert types.count('streak_master') == 1
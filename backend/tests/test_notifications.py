@@ -0,0 +1,34 @@
+"""Notification outbox dedup and repeated budget alerts."""
+from datetime import date
+
+from models import Notification
+from notifications import outbox
+import budgets
+
+
+def test_flush_counts_only_inserted_rows(api):
+    outbox.add(api.user_id, 'Hello', 'info', dedup_key='greeting')
+    outbox.add(api.user_id, 'Hello again', 'info', dedup_key='greeting')  # merged in the outbox
+    assert outbox.flush() == 1
+    outbox.add(api.user_id, 'Hello', 'info', dedup_key='greeting')
+    assert outbox.flush() == 0
+    assert Notification.query.filter_by(type='info').count() == 1
+
+
+def _budget_alerts():
+    return Notification.query.filter(Notification.type.in_(['budget_warning', 'budget_exceeded'])).count()
+
+
+def test_repeated_budget_alerts_are_stored_once(api):
+    today = date.today()
+    api.post('/api/budgets', json={'category': 'Food', 'amount': 100, 'month': today.month, 'year': today.year})
+    api.add_expense(today, 95)
+
+    budgets.send_alerts(api.user_id, today.year, today.month)
+    budgets.send_alerts(api.user_id, today.year, today.month)
+    assert _budget_alerts() == 1
+
+    api.add_expense(today, 10)  # now over budget: the exceeded alert is a new notification
+    budgets.send_alerts(api.user_id, today.year, today.month)
+    budgets.send_alerts(api.user_id, today.year, today.month)
+    assert _budget_alerts() == 2
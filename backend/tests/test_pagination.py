@@ -0,0 +1,44 @@
+"""Keyset pagination of the history lists."""
+from datetime import date, timedelta
+
+
+def _walk(api, url, key, limit):
+    rows, cursor = [], None
+    while True:
+        page = api.get(url, query_string={'limit': limit, **({'cursor': cursor} if cursor else {})}).get_json()
+        rows += page[key]
+        cursor = page['next_cursor']
+        if cursor is None:
+            return rows
+
+
+def test_cursor_walk_across_ties_in_date(api):
+    today = date.today()
+    days = [today] * 7 + [today - timedelta(days=1)] * 2 + [today - timedelta(days=30)] * 4
+    for amount, day in enumerate(days, start=1):
+        api.add_expense(day, amount)
+
+    rows = _walk(api, '/api/get-user-expenses', 'recentExpenses', limit=3)
+    assert len(rows) == len(days)
+    assert len({row['id'] for row in rows}) == len(days)
+    assert [(row['date'], row['id']) for row in rows] == sorted(
+        ((row['date'], row['id']) for row in rows), reverse=True)
+
+
+def test_totals_only_on_the_first_page(api):
+    today = date.today()
+    for amount in (10, 20, 30):
+        api.add_expense(today, amount, category='Food' if amount < 30 else 'Rent')
+
+    first = api.get('/api/get-user-expenses', query_string={'limit': 2}).get_json()
+    assert first['categoryTotals'] == {'Food': 30.0, 'Rent': 30.0}
+    assert first['totalExpenses'] == 60.0
+    second = api.get('/api/get-user-expenses', query_string={'limit': 2, 'cursor': first['next_cursor']}).get_json()
+    assert 'categoryTotals' not in second
+    assert second['next_cursor'] is None
+
+
+def test_invalid_cursor_and_filters_are_rejected(api):
+    assert api.get('/api/get-user-income', query_string={'cursor': 'nope'}).status_code == 400
+    assert api.get('/api/transactions/filter', query_string={'min_amount': 'abc'}).status_code == 400
+    assert api.get('/api/incomes/filter', query_string={'start_date': '2026-13-01'}).status_code == 400
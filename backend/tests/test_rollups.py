@@ -0,0 +1,123 @@
+"""Rollups and balances stay equal to a full recompute after every kind of write."""
+import io
+from datetime import date, timedelta
+
+from extensions import db
+from models import Transaction, Income, RecurringRule
+import recurring
+
+
+def test_create_update_delete(api, assert_in_sync):
+    today = date.today()
+    last_month = today.replace(day=1) - timedelta(days=1)
+    api.add_expense(today, 25, 'Food')
+    api.add_expense(last_month, 40, 'Rent')
+    api.add_income(today, 100)
+    assert_in_sync(api.user_id)
+
+    expense = Transaction.query.filter_by(category='Food').one()
+    response = api.put(f'/api/transactions/{expense.id}',
+                       json={'amount': 30.5, 'category': 'Travel', 'date': last_month.isoformat()})
+    assert response.status_code == 200
+    income = Income.query.one()
+    assert api.put(f'/api/incomes/{income.id}', json={'amount': 80, 'date': last_month.isoformat()}).status_code == 200
+    assert_in_sync(api.user_id)
+
+    assert api.delete(f'/api/transactions/{expense.id}').status_code == 200
+    assert api.delete(f'/api/incomes/{income.id}').status_code == 200
+    assert_in_sync(api.user_id)
+
+
+def test_batch(api, assert_in_sync):
+    today = date.today()
+    api.add_expense(today, 10)
+    api.add_expense(today, 20)
+    first, second = (t.id for t in Transaction.query.order_by(Transaction.id))
+
+    response = api.post('/api/transactions/batch', json={'operations': [
+        {'op': 'create', 'client_id': 'a', 'data': {'category': 'Food', 'amount': 5, 'date': today.isoformat(),
+                                                    'paymentMethod': 'Card'}},
+        {'op': 'create', 'client_id': 'b', 'data': {'category': 'Fuel', 'amount': 7, 'date': today.isoformat(),
+                                                    'paymentMethod': 'Cash'}},
+        {'op': 'update', 'id': first, 'data': {'amount': 12, 'date': (today - timedelta(days=40)).isoformat()}},
+        {'op': 'delete', 'id': second},
+        {'op': 'create', 'data': {'category': '', 'amount': 1, 'date': today.isoformat()}},
+    ]})
+    assert response.status_code == 200
+    results = response.get_json()['results']
+    assert [r['status'] for r in results] == ['created', 'created', 'updated', 'deleted', 'error']
+    created = {r['client_id']: r['id'] for r in results[:2]}
+    assert db.session.get(Transaction, created['a']).category == 'Food'
+    assert db.session.get(Transaction, created['b']).category == 'Fuel'
+    assert_in_sync(api.user_id)
+
+    response = api.post('/api/incomes/batch', json={'operations': [
+        {'op': 'create', 'data': {'source': 'Salary', 'amount': 300, 'date': today.isoformat()}},
+    ]})
+    assert response.get_json()['applied']
+    assert_in_sync(api.user_id)
+
+
+def test_atomic_batch_with_an_invalid_item_changes_nothing(api, assert_in_sync):
+    today = date.today()
+    response = api.post('/api/transactions/batch', json={'atomic': True, 'operations': [
+        {'op': 'create', 'data': {'category': 'Food', 'amount': 5, 'date': today.isoformat(), 'paymentMethod': 'Card'}},
+        {'op': 'delete', 'id': 999},
+    ]})
+    assert response.status_code == 400
+    assert Transaction.query.count() == 0
+    assert_in_sync(api.user_id)
+
+
+def test_import(api, assert_in_sync):
+    csv_text = 'date,amount,category,source,notes\n' \
+               '2026-01-03,-12.50,Food,,lunch\n' \
+               '2026-01-04,2000,,Salary,january\n' \
+               '2026-02-10,-99.99,Rent,,\n' \
+               '2026-01-03,-12.50,Food,,lunch\n' \
+               'not-a-date,-1,Food,,\n'
+    response = api.post('/api/import', data={'file': (io.BytesIO(csv_text.encode()), 'statement.csv')},
+                        content_type='multipart/form-data')
+    assert response.status_code == 200
+    assert response.get_json()['summary'] == {'imported': 3, 'duplicate': 1, 'error': 1, 'failed': 0}
+    assert_in_sync(api.user_id)
+
+
+def test_recurring_materialization(api, assert_in_sync):
+    start = date.today() - timedelta(days=9)
+    response = api.post('/api/recurring-rules', json={
+        'kind': 'expense', 'category': 'Subscriptions', 'amount': 3.25, 'paymentMethod': 'Card',
+        'frequency': 'daily', 'start_date': start.isoformat()})
+    assert response.status_code == 201
+    api.post('/api/recurring-rules', json={
+        'kind': 'income', 'source': 'Rent received', 'amount': 500, 'frequency': 'weekly',
+        'start_date': start.isoformat()})
+
+    assert recurring.materialize() == 10 + 2
+    assert recurring.materialize() == 0  # each occurrence is created once
+    assert RecurringRule.query.count() == 2
+    assert_in_sync(api.user_id)
+
+
+def test_import_reports_the_failed_chunk(api, assert_in_sync, monkeypatch):
+    import importer
+    flush, calls = importer._flush, []
+
+    def failing_second_chunk(user_id, pending):
+        calls.append(1)
+        if len(calls) == 2:
+            raise RuntimeError('disk full')
+        flush(user_id, pending)
+
+    monkeypatch.setattr(importer, 'CHUNK_SIZE', 2)
+    monkeypatch.setattr(importer, '_flush', failing_second_chunk)
+    csv_text = 'date,amount,category\n' + ''.join(f'2026-01-0{n},-{n},Food\n' for n in range(1, 6))
+    response = api.post('/api/import', data={'file': (io.BytesIO(csv_text.encode()), 'statement.csv')},
+                        content_type='multipart/form-data')
+    body = response.get_json()
+    assert response.status_code == 500
+    assert body['summary'] == {'imported': 2, 'duplicate': 0, 'error': 0, 'failed': 2}
+    assert body['failed_rows'] == [3, 4]
+    assert [r['status'] for r in body['results']] == ['imported', 'imported', 'failed', 'failed']
+    assert Transaction.query.count() == 2
+    assert_in_sync(api.user_id)
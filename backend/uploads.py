@@ -0,0 +1,150 @@
+"""Profile image uploads, stored content-addressed and served from /media.
+
+``update_profile`` streams the upload to disk in chunks while hashing it
+and moves it into UPLOAD_FOLDER as ``<sha256>.<ext>``, so identical
+images are stored once and a name never changes content. The type comes
+from the file's first bytes, not its name: only JPEG, PNG, GIF and WebP
+are accepted. The ``uploads.make_thumbnails`` job then writes square
+``<sha256>-<size>.<ext>`` thumbnails (needs Pillow) on the worker pool.
+
+``/media/<name>`` serves these files without touching the database, with
+a year-long ``immutable`` Cache-Control. A thumbnail that is not ready yet
+falls back to the original with a short max-age.
+"""
+import hashlib
+import os
+import re
+import uuid
+
+from flask import Blueprint, abort, current_app, send_from_directory
+
+from jobs import task
+
+CHUNK_SIZE = 64 * 1024
+THUMBNAIL_SIZES = (96, 256)  # 2x the 48px sidebar and 100px profile avatars
+MEDIA_MAX_AGE = 365 * 24 * 3600
+FALLBACK_MAX_AGE = 60
+MEDIA_PREFIX = 'media/'
+
+_NAME = re.compile(r'^(?P<digest>[0-9a-f]{64})(?:-(?P<size>\d+))?\.(?P<ext>jpg|png|gif|webp)$')
+
+
+def folder():
+    """UPLOAD_FOLDER as an absolute path (relative paths are relative to the app, like ``static``)."""
+    return os.path.join(current_app.root_path, current_app.config['UPLOAD_FOLDER'])
+
+
+def _extension(head):
+    if head.startswith(b'\xff\xd8\xff'):
+        return 'jpg'
+    if head.startswith(b'\x89PNG\r\n\x1a\n'):
+        return 'png'
+    if head[:6] in (b'GIF87a', b'GIF89a'):
+        return 'gif'
+    if head[:4] == b'RIFF' and head[8:12] == b'WEBP':
+        return 'webp'
+    return None
+
+
+def store(file):
+    """Stream an uploaded image into UPLOAD_FOLDER under its content hash. Returns the stored name.
+
+    Raises ValueError if the file is empty or not a supported image.
+    """
+    incoming = os.path.join(folder(), 'incoming')
+    os.makedirs(incoming, exist_ok=True)
+    staged_path = os.path.join(incoming, f'{uuid.uuid4().hex}.part')
+
+    digest = hashlib.sha256()
+    head = file.stream.read(CHUNK_SIZE)
+    extension = _extension(head)
+    if extension is None:
+        raise ValueError('profileImage must be a JPEG, PNG, GIF or WebP image')
+    try:
+        with open(staged_path, 'wb') as staged:
+            chunk = head
+            while chunk:
+                digest.update(chunk)
+                staged.write(chunk)
+                chunk = file.stream.read(CHUNK_SIZE)
+
+        name = f'{digest.hexdigest()}.{extension}'
+        final_path = os.path.join(folder(), name)
+        if os.path.exists(final_path):
+            os.remove(staged_path)  # Same bytes already stored
+        else:
+            os.replace(staged_path, final_path)
+    except BaseException:
+        if os.path.exists(staged_path):
+            os.remove(staged_path)
+        raise
+    return name
+
+
+def _thumbnail_name(name, size):
+    stem, extension = name.rsplit('.', 1)
+    return f'{stem}-{size}.{extension}'
+
+
+def pending_thumbnails(name):
+    return [size for size in THUMBNAIL_SIZES if not os.path.exists(os.path.join(folder(), _thumbnail_name(name, size)))]
+
+
+def url(name):
+    """The ``profile_pic`` value for a stored name; the frontend prefixes it with the API host."""
+    return MEDIA_PREFIX + name
+
+
+def thumbnails(profile_pic):
+    """{size: url} of a profile picture's thumbnails ({} for pictures stored before /media)."""
+    if not profile_pic or not profile_pic.startswith(MEDIA_PREFIX):
+        return {}
+    name = profile_pic[len(MEDIA_PREFIX):]
+    return {str(size): url(_thumbnail_name(name, size)) for size in THUMBNAIL_SIZES}
+
+
+@task('uploads.make_thumbnails')
+def make_thumbnails(name):
+    try:
+        from PIL import Image, ImageOps
+    except ImportError:
+        current_app.logger.warning('Pillow is not installed; serving %s without thumbnails', name)
+        return
+
+    sizes = pending_thumbnails(name)
+    if not sizes:
+        return
+    try:
+        with Image.open(os.path.join(folder(), name)) as original:
+            image = ImageOps.exif_transpose(original)
+            image_format = original.format
+            if image_format == 'JPEG' and image.mode not in ('RGB', 'L'):
+                image = image.convert('RGB')
+            for size in sizes:
+                # Written under a temporary name first: the final name is served as immutable
+                path = os.path.join(folder(), _thumbnail_name(name, size))
+                partial = f'{path}.{uuid.uuid4().hex}.part'
+                ImageOps.fit(image, (size, size)).save(partial, format=image_format)
+                os.replace(partial, path)
+    except (OSError, Image.DecompressionBombError) as e:
+        # Not decodable; retrying will not help and the original is served instead
+        current_app.logger.warning('Cannot make thumbnails of %s: %s', name, e)
+
+
+media_bp = Blueprint('media', __name__)
+
+
+@media_bp.route('/media/<name>', methods=['GET'])
+def serve_media(name):
+    match = _NAME.match(name)
+    if not match:
+        abort(404)
+
+    max_age, immutable = MEDIA_MAX_AGE, True
+    if match['size'] and not os.path.exists(os.path.join(folder(), name)):
+        name, max_age, immutable = f"{match['digest']}.{match['ext']}", FALLBACK_MAX_AGE, False
+
+    response = send_from_directory(folder(), name, max_age=max_age)
+    response.cache_control.public = True
+    response.cache_control.immutable = immutable
+    return response
@@ -25,6 +25,7 @@ import {
     Clear as ClearIcon,
     MoneyOff as ExpenseIcon
 } from '@mui/icons-material';
+import { fetchAllPages } from "../utils/apiUtils";
 
 const ExpenseForm = ({ onSuccess }) => {
     const [expense, setExpense] = useState({
@@ -85,12 +86,8 @@ const ExpenseForm = ({ onSuccess }) => {
     const fetchUserExpenses = async () => {
         const token = localStorage.getItem("token");
         try {
-            const response = await fetch("http://127.0.0.1:5000/api/get-user-expenses", {
-                method: "GET",
-                headers: { Authorization: `Bearer ${token}` },
-            });
-            if (!response.ok) throw new Error("Failed to fetch expenses");
-            const data = await response.json();
+            // The table filters the whole history client-side, so load every page
+            const data = await fetchAllPages("http://127.0.0.1:5000/api/get-user-expenses", "recentExpenses", token);
             setOriginalExpenses(data.recentExpenses);
             setRecentExpenses(data.recentExpenses);
             setTotalMonthlyExpense(data.totalMonthlyExpenses);
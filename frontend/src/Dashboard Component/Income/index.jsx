@@ -30,6 +30,7 @@ import {
     DateRange as DateIcon,
     Description as NoteIcon
 } from '@mui/icons-material';
+import { fetchAllPages } from '../utils/apiUtils';
 
 const IncomeForm = ({ onSuccess }) => {
     const [income, setIncome] = useState({
@@ -106,17 +107,8 @@ const IncomeForm = ({ onSuccess }) => {
     const fetchUserIncome = async () => {
         try {
             const token = localStorage.getItem('token');
-            const response = await fetch('http://127.0.0.1:5000/api/get-user-income', {
-                method: 'GET',
-                headers: {
-                    'Authorization': `Bearer ${token}`,
-                    'Content-Type': 'application/json'
-                }
-            });
-
-            if (!response.ok) throw new Error('Failed to fetch income data');
-
-            const data = await response.json();
+            // The table filters the whole history client-side, so load every page
+            const data = await fetchAllPages('http://127.0.0.1:5000/api/get-user-income', 'recentIncome', token);
             setOriginalIncome(data.recentIncome);
             setRecentIncome(data.recentIncome);
             setTotalMonthlyIncome(data.totalMonthlyIncome);
@@ -29,30 +29,16 @@ const CATEGORY_COLORS = [
 function CategoriesSection() {
     const { expenseData, incomeData } = useAppContext();
 
-    const expenses = expenseData?.recentExpenses || [];
-    const incomes = incomeData?.recentIncome || [];
-
-    // Aggregate expenses by category
-    const expenseByCategory = {};
-    let totalExpenses = 0;
-    expenses.forEach((exp) => {
-        const cat = exp.category || 'Other';
-        expenseByCategory[cat] = (expenseByCategory[cat] || 0) + exp.amount;
-        totalExpenses += exp.amount;
-    });
+    // All-time totals per category and source come from the server; the rows are only the latest page
+    const expenseByCategory = expenseData?.categoryTotals || {};
+    const totalExpenses = Object.values(expenseByCategory).reduce((sum, amount) => sum + amount, 0);
 
     const expenseCategories = Object.keys(expenseByCategory).sort(
         (a, b) => expenseByCategory[b] - expenseByCategory[a]
     );
 
-    // Aggregate income by source
-    const incomeBySource = {};
-    let totalIncome = 0;
-    incomes.forEach((inc) => {
-        const src = inc.source || 'Other';
-        incomeBySource[src] = (incomeBySource[src] || 0) + inc.amount;
-        totalIncome += inc.amount;
-    });
+    const incomeBySource = incomeData?.categoryTotals || {};
+    const totalIncome = Object.values(incomeBySource).reduce((sum, amount) => sum + amount, 0);
 
     const incomeSources = Object.keys(incomeBySource).sort(
         (a, b) => incomeBySource[b] - incomeBySource[a]
@@ -24,17 +24,9 @@ ChartJS.register(CategoryScale, LinearScale, BarElement, ArcElement, Title, Tool
 const DashboardOverview = ({ incomeData, expenseData }) => {
   const theme = useTheme();
 
-  // Helper function to process data
-  const aggregateData = (data, categoryKey, amountKey = 'amount') => {
-    return (data || []).reduce((acc, item) => {
-      const key = item[categoryKey];
-      if (key) acc[key] = (acc[key] || 0) + item[amountKey];
-      return acc;
-    }, {});
-  };
-
-  const incomeCategories = aggregateData(incomeData?.recentIncome, 'source');
-  const expenseCategories = aggregateData(expenseData?.recentExpenses, 'category');
+  // All-time totals per source/category come from the server; the rows are only the latest page
+  const incomeCategories = incomeData?.categoryTotals || {};
+  const expenseCategories = expenseData?.categoryTotals || {};
 
   const chartColors = [
     '#2E3B55', '#10B981', '#3B82F6', '#F59E0B', '#EF4444', '#8B5CF6', '#EC4899', '#6366F1'
@@ -13,7 +13,7 @@ const EditProfileSection = ({ userData, onUpdateProfile, onCancel }) => {
   });
   const [profileImage, setProfileImage] = useState(null);
   const [previewUrl, setPreviewUrl] = useState(
-    userData?.profilePic ? `http://127.0.0.1:5000/${userData.profilePic}` : null
+    userData?.profilePic ? `http://127.0.0.1:5000/${userData.profilePicThumbnails?.['256'] || userData.profilePic}` : null
   );
   const [loading, setLoading] = useState(false);
   const [error, setError] = useState('');
@@ -60,7 +60,7 @@ const ProfileSection = ({ userData, onEditProfile }) => {
         }}
       >
         <Avatar
-          src={userData.profilePic ? `http://127.0.0.1:5000/${userData.profilePic}` : undefined}
+          src={userData.profilePic ? `http://127.0.0.1:5000/${userData.profilePicThumbnails?.['256'] || userData.profilePic}` : undefined}
           sx={{ width: 100, height: 100, fontSize: 40, bgcolor: 'primary.main' }}
         >
           {userData.fullName?.charAt(0)}
@@ -593,22 +593,38 @@ export const AppProvider = ({ children }) => {
     }
   };
 
+  // Fetch every dashboard section in a single request
+  const fetchDashboard = async () => {
+    if (!token) return;
+
+    const response = await fetch('http://127.0.0.1:5000/api/dashboard', {
+      headers: { 'Authorization': `Bearer ${token}` }
+    });
+
+    if (!response.ok) {
+      throw new Error('Failed to fetch dashboard');
+    }
+
+    const data = await response.json();
+    setUserData(data.user_data);
+    setIncomeData(data.income);
+    setExpenseData(data.expenses);
+    setBudgets(data.budgets);
+    setSavingGoals(data.saving_goals);
+    setNotifications(data.notifications);
+    setUnreadNotifications(data.notifications.filter(notification => !notification.read).length);
+    setAchievements(data.achievements);
+    setInsights(data.insights);
+    setPaymentMethodAnalysis(data.payment_method_analysis);
+    setBudgetAnalysis(data.budget_analysis);
+  };
+
   // Load all data on initial render
   useEffect(() => {
     const loadAllData = async () => {
       setLoading(true);
       try {
-        await Promise.all([
-          fetchUserData(),
-          fetchFinancialData(),
-          fetchBudgets(),
-          fetchSavingGoals(),
-          fetchNotifications(),
-          fetchAchievements(),
-          fetchInsights(),
-          fetchPaymentMethodAnalysis(),
-          fetchBudgetAnalysis()
-        ]);
+        await fetchDashboard();
       } catch (error) {
         console.error('Error loading data:', error);
         setError('Failed to load data');
@@ -649,6 +665,7 @@ export const AppProvider = ({ children }) => {
     unreadNotifications,
     loading,
     error,
+    fetchDashboard,
     fetchUserData,
     fetchFinancialData,
     fetchBudgets,
@@ -11,36 +11,6 @@ const useDashboardData = () => {
   const [isLoading, setIsLoading] = useState(true);
   const [error, setError] = useState(null);
 
-  const fetchUserData = async () => {
-    const token = localStorage.getItem('token');
-    if (!token) {
-      console.error("No token found. Please log in.");
-      setError("No token found. Please log in.");
-      setIsLoading(false);
-      return;
-    }
-
-    try {
-      const response = await fetch('http://127.0.0.1:5000/api/user-data', {
-        method: 'GET',
-        headers: {
-          'Authorization': `Bearer ${token}`,
-          'Content-Type': 'application/json'
-        },
-      });
-      
-      if (!response.ok) {
-        throw new Error('Failed to fetch user data');
-      }
-      
-      const data = await response.json();
-      setUserData(data);
-    } catch (error) {
-      console.error('Error fetching user data ', error);
-      setError('Failed to load user data. Please try again later.');
-    }
-  };
-
   const fetchDashboardData = async () => {
     const token = localStorage.getItem('token');
     if (!token) {
@@ -51,20 +21,19 @@ const useDashboardData = () => {
     }
 
     try {
-      // Fetch income data
-      const incomeResponse = await fetch('http://127.0.0.1:5000/api/get-user-income', {
+      // User summary, income and expenses in a single round trip
+      const response = await fetch('http://127.0.0.1:5000/api/dashboard?sections=summary,income,expenses', {
         headers: { Authorization: `Bearer ${token}` }
       });
-      const income = await incomeResponse.json();
 
-      // Fetch expense data
-      const expenseResponse = await fetch('http://127.0.0.1:5000/api/get-user-expenses', {
-        headers: { Authorization: `Bearer ${token}` }
-      });
-      const expense = await expenseResponse.json();
+      if (!response.ok) {
+        throw new Error('Failed to fetch dashboard data');
+      }
 
-      setIncomeData(income);
-      setExpenseData(expense);
+      const data = await response.json();
+      setUserData(data.user_data);
+      setIncomeData(data.income);
+      setExpenseData(data.expenses);
     } catch (error) {
       console.error('Error fetching data:', error);
       setError('Failed to load dashboard data. Please try again later.');
@@ -80,14 +49,7 @@ const useDashboardData = () => {
 
   useEffect(() => {
     setIsLoading(true);
-    Promise.all([fetchUserData(), fetchDashboardData()])
-      .catch(error => {
-        console.error('Error loading dashboard data:', error);
-        setError('Failed to load dashboard data. Please try again later.');
-      })
-      .finally(() => {
-        setIsLoading(false);
-      });
+    fetchDashboardData();
   }, []);
 
   return {
@@ -99,8 +61,7 @@ const useDashboardData = () => {
     updateUserData,
     refreshData: () => {
       setIsLoading(true);
-      Promise.all([fetchUserData(), fetchDashboardData()])
-        .finally(() => setIsLoading(false));
+      fetchDashboardData();
     }
   };
 };
@@ -97,7 +97,7 @@ function DashboardContent() {
       <Divider />
       <Box sx={{ p: 2, display: 'flex', alignItems: 'center', gap: 2 }}>
         <Avatar
-          src={userData?.profilePic ? `http://127.0.0.1:5000/${userData.profilePic}` : undefined}
+          src={userData?.profilePic ? `http://127.0.0.1:5000/${userData.profilePicThumbnails?.['96'] || userData.profilePic}` : undefined}
           sx={{ width: 48, height: 48 }}
         >
           {userData?.fullName?.charAt(0)}
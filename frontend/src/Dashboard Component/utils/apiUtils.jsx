@@ -0,0 +1,34 @@
+/**
+ * Utility functions for talking to the API
+ */
+
+// Largest page the list endpoints return
+const PAGE_SIZE = 500;
+
+/**
+ * Fetches every page of a cursor-paginated list endpoint by following next_cursor
+ * @param {string} url - The list endpoint URL
+ * @param {string} itemsKey - Response key holding each page's rows (e.g. 'recentExpenses')
+ * @param {string} token - The user's JWT
+ * @returns {Object} The first page's response, with the rows of all pages under itemsKey
+ */
+export const fetchAllPages = async (url, itemsKey, token) => {
+  const headers = { Authorization: `Bearer ${token}` };
+  const fetchPage = async (cursor) => {
+    const query = new URLSearchParams({ limit: PAGE_SIZE });
+    if (cursor) query.append('cursor', cursor);
+    const response = await fetch(`${url}?${query}`, { headers });
+    if (!response.ok) throw new Error(`Failed to fetch ${url}`);
+    return response.json();
+  };
+
+  const first = await fetchPage(null);
+  const items = [...first[itemsKey]];
+  let cursor = first.next_cursor;
+  while (cursor) {
+    const page = await fetchPage(cursor);
+    items.push(...page[itemsKey]);
+    cursor = page.next_cursor;
+  }
+  return { ...first, [itemsKey]: items, next_cursor: null };
+};
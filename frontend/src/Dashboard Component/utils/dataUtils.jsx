@@ -24,9 +24,10 @@ export const aggregateIncomeByCategory = (incomeData) => {
     return acc;
   }, {});
 
-  incomeData?.recentIncome.forEach((income) => {
-    if (income.source && categoryTotals.hasOwnProperty(income.source)) {
-      categoryTotals[income.source] += income.amount;
+  // All-time totals from the server; recentIncome is only the latest page
+  Object.entries(incomeData?.categoryTotals || {}).forEach(([source, total]) => {
+    if (categoryTotals.hasOwnProperty(source)) {
+      categoryTotals[source] += total;
     }
   });
 
@@ -55,9 +56,10 @@ export const aggregateExpensesByCategory = (expenseData) => {
     return acc;
   }, {});
 
-  expenseData?.recentExpenses.forEach((expense) => {
-    if (expense.category && categoryTotals.hasOwnProperty(expense.category)) {
-      categoryTotals[expense.category] += expense.amount;
+  // All-time totals from the server; recentExpenses is only the latest page
+  Object.entries(expenseData?.categoryTotals || {}).forEach(([category, total]) => {
+    if (categoryTotals.hasOwnProperty(category)) {
+      categoryTotals[category] += total;
     }
   });
 